@@ -0,0 +1,82 @@
+#! /usr/bin/env python2.4
+
+# Checkpoints of a running simulation: the whole object graph of the
+# simulator (its event queue and handlers, the machine, the scheduler with its
+# CpuSnapshot and waiting lists, the jobs) is pickled to a gzip compressed
+# file, with the global event counter, so a long run that dies can continue
+# from its last checkpoint with the same results.
+#
+# Objects that hold what can't be pickled define __getstate__ and
+# __setstate__: the simulator keeps the position in its job stream instead of
+# the stream (see Simulator.resume_stream), and the SwfWriter the name and
+# offset of its output file, which it truncates there when it's restored.
+#
+# gzip and signal are imported only when needed, gzip imports the time module
+# (see the end of run_simulator.py).
+
+import os
+import cPickle
+import copy_reg
+import types
+
+from prototype import JobEvent
+
+def _reduce_method(method):
+    "bound methods (e.g. the event queue's handlers) are pickled as their object and name"
+    return getattr, (method.im_self, method.im_func.__name__)
+
+copy_reg.pickle(types.MethodType, _reduce_method)
+
+def save_checkpoint(file_name, state, context=None):
+    """
+    pickles state (e.g. a Simulator) and context (e.g. the options of the
+    run) to file_name. The file is replaced only when the new checkpoint is
+    complete, a crash while saving leaves the previous one.
+    """
+    import gzip
+    temp_file_name = file_name + ".tmp"
+    output_file = gzip.open(temp_file_name, "wb")
+    try:
+        cPickle.dump((JobEvent.global_event_counter, state, context), output_file, cPickle.HIGHEST_PROTOCOL)
+    finally:
+        output_file.close()
+    os.rename(temp_file_name, file_name)
+
+def load_checkpoint(file_name):
+    "returns the (state, context) saved by save_checkpoint(), and restores the event counter"
+    import gzip
+    input_file = gzip.open(file_name, "rb")
+    try:
+        counter, state, context = cPickle.load(input_file)
+    finally:
+        input_file.close()
+    JobEvent.global_event_counter = counter
+    return state, context
+
+class Checkpointer(object):
+    """
+    Saves checkpoints to file_name every interval events (if interval is
+    given), and after the event being handled when the process receives
+    signal_number (if given, e.g. signal.SIGUSR1). Simulator.run() calls
+    event_handled() after every event.
+    """
+    def __init__(self, file_name, interval=None, signal_number=None, context=None):
+        assert interval is None or interval > 0
+        self.file_name = file_name
+        self.interval = interval
+        self.context = context
+        self.num_events = 0
+        self.requested = False
+        if signal_number is not None:
+            import signal
+            signal.signal(signal_number, self._request)
+
+    def _request(self, signal_number, frame):
+        # only set a flag, the state may be in the middle of an event
+        self.requested = True
+
+    def event_handled(self, state):
+        self.num_events += 1
+        if self.requested or (self.interval is not None and self.num_events % self.interval == 0):
+            self.requested = False
+            save_checkpoint(self.file_name, state, self.context)
@@ -1,4 +1,16 @@
 from simple_heap import Heap
+import simple_heap
+import lazy_heap
+import indexed_heap
+import radix_heap
+
+# the heap implementations EventQueue can use, by name
+HEAP_CLASSES = {
+    "simple"    : simple_heap.Heap,
+    "lazy"      : lazy_heap.Heap,
+    "indexed"   : indexed_heap.Heap,
+    "radix"     : radix_heap.Heap,
+}
 
 class EventQueue(object):
     """
@@ -22,27 +34,79 @@ class EventQueue(object):
 
       queue.advance() # JobSubmissionEvent reached, handler2 and handler1 called
       queue.advance() # JobTerminationEvent reached, handler1 called
+
+    heap_class is the heap implementation (see HEAP_CLASSES): simple_heap's
+    heapq is the default, lazy_heap defers heapifying until the first pop,
+    indexed_heap removes events in O(log n), and radix_heap buckets events by
+    timestamp, relying on the clock going only forward.
+
+    Events that were superseded (e.g. a job's start event, when the job is
+    rescheduled) can be cancelled in O(1) with cancel_event(): their keys are
+    kept as tombstones and they're skipped when they're reached. When the
+    cancelled events are half of the heap they're dropped from it, so the heap
+    is at most twice the number of live events.
     """
-    def __init__(self):
-        self._events_heap = Heap()
-        self._handlers = {}
+    def __init__(self, heap_class=Heap):
+        self._events_heap = heap_class()
+        self._handlers = {} # event type -> tuple of handlers, looked up once per event
         self._latest_handled_timestamp = -1
+        self._latest_key = None # of the last event popped
+        self._cancelled_keys = set()
+        if __debug__:
+            # the _eq_tuples of the queued events, for asserting in O(1) that
+            # an event isn't queued twice
+            self._queued_events = set()
+
+    def _heap_item(self, event):
+        "the heap item of the event or of an event equal to it, or None"
+        item = (event.key, event)
+        if item in self._events_heap: # O(1) in an indexed heap
+            if item[0] in self._cancelled_keys:
+                return None
+            return item
+        for item in self._events_heap: # an equal event, not the same one
+            if item[1] == event and item[0] not in self._cancelled_keys:
+                return item
+        return None
 
     def add_event(self, event):
-        assert (event.timestamp, event) not in self._events_heap # TODO: slow assert, disable for production
+        if __debug__:
+            assert event._eq_tuple not in self._queued_events
+            self._queued_events.add(event._eq_tuple)
         assert event.timestamp >= self._latest_handled_timestamp
 
-        # insert into heap
-        self._events_heap.push( (event.timestamp, event) )
+        # insert into heap, the keys are unique so the events are never compared
+        self._events_heap.push( (event.key, event) )
 
     def remove_event(self, event):
-        assert (event.timestamp, event) in self._events_heap
-        self._events_heap.remove( (event.timestamp, event) )
+        assert event._eq_tuple in self._queued_events
+        item = self._heap_item(event)
+        self._events_heap.remove(item)
+        if __debug__:
+            self._queued_events.remove(event._eq_tuple)
+
+    def cancel_event(self, event):
+        """
+        cancels the queued event, it won't be handled. Cancelling an event that
+        was already handled does nothing.
+        """
+        if self._latest_key is not None and event.key <= self._latest_key:
+            return # already reached
+        assert event._eq_tuple in self._queued_events
+        assert event.key not in self._cancelled_keys
+        self._cancelled_keys.add(event.key)
+        if __debug__:
+            self._queued_events.remove(event._eq_tuple)
+
+        if 2 * len(self._cancelled_keys) > len(self._events_heap):
+            self._events_heap.discard_keys(self._cancelled_keys)
+            self._cancelled_keys = set()
 
     @property
     def events(self):
         "All events, used for testing"
-        return set(event for (timestamp, event) in self._events_heap)
+        cancelled_keys = self._cancelled_keys
+        return set(event for (key, event) in self._events_heap if key not in cancelled_keys)
 
     @property
     def sorted_events(self):
@@ -54,31 +118,144 @@ class EventQueue(object):
         return len(self) == 0
 
     def __len__(self):
-        return len(self._events_heap)
+        return len(self._events_heap) - len(self._cancelled_keys)
 
     def pop(self):
         assert not self.is_empty
-        timestamp, event = self._events_heap.pop()
+        pop = self._events_heap.pop
+        cancelled_keys = self._cancelled_keys
+        key, event = pop()
+        while key in cancelled_keys:
+            cancelled_keys.remove(key)
+            key, event = pop()
+        self._latest_key = key
+        if __debug__:
+            self._queued_events.remove(event._eq_tuple)
         return event
 
+    def peek(self):
+        "the next event, without popping it, or None if the queue is empty"
+        heap = self._events_heap
+        cancelled_keys = self._cancelled_keys
+        while len(heap) > 0:
+            key, event = heap.peek()
+            if key not in cancelled_keys:
+                return event
+            heap.pop() # a tombstone, drop it now
+            cancelled_keys.remove(key)
+        return None
+
     def _get_event_handlers(self, event_type):
-        if event_type in self._handlers:
-            return self._handlers[event_type]
-        else:
-            return []
+        return self._handlers.get(event_type, ())
 
     def advance(self):
         "pop and handle the next event in the queue"
 
         assert not self.is_empty
-        event = self.pop()
-        for handler in self._get_event_handlers( type(event) ):
+        # pop(), inlined
+        pop = self._events_heap.pop
+        cancelled_keys = self._cancelled_keys
+        key, event = pop()
+        while key in cancelled_keys:
+            cancelled_keys.remove(key)
+            key, event = pop()
+        self._latest_key = key
+        if __debug__:
+            self._queued_events.remove(event._eq_tuple)
+
+        for handler in self._handlers.get(type(event), ()):
             handler(event)
         self._latest_handled_timestamp = event.timestamp
 
+    def dispatch_event(self, event):
+        """
+        Handles the event right away if it's the next event anyway, i.e. no
+        queued event comes before it, and otherwise adds it. Returns true if
+        the event was handled.
+
+        Meant to be called last by a handler, for an event it creates at its
+        own timestamp (e.g. a job start), since it's handled before the
+        handler (or the other handlers of the same event) returns. Saves the
+        heap push and pop, and the event is handled in the same order.
+        """
+        next_event = self.peek()
+        if next_event is not None and next_event.key < event.key:
+            self.add_event(event)
+            return False
+        assert event.timestamp >= self._latest_handled_timestamp
+        assert self._latest_key is None or event.key > self._latest_key
+        self._latest_key = event.key
+        for handler in self._handlers.get(type(event), ()):
+            handler(event)
+        self._latest_handled_timestamp = event.timestamp
+        return True
+
+    def has_handler(self, event_type):
+        "true if events of event_type are handled, an event that isn't needn't be added"
+        return event_type in self._handlers
+
     def add_handler(self, event_type, handler):
-        self._handlers.setdefault(event_type, [])
-        self._handlers[event_type].append(handler)
+        self._handlers[event_type] = self._get_event_handlers(event_type) + (handler,)
+
+    def remove_handler(self, event_type, handler):
+        handlers = tuple(h for h in self._get_event_handlers(event_type) if h != handler)
+        if handlers:
+            self._handlers[event_type] = handlers
+        else:
+            del self._handlers[event_type] # see has_handler()
 
     def __str__(self):
         return "EventQueue<num_events=%s>" % len(self)
+
+    def __setstate__(self, state):
+        "a checkpoint (see checkpoint.py) saved by python -O has no _queued_events"
+        self.__dict__.update(state)
+        if __debug__ and not hasattr(self, "_queued_events"):
+            self._queued_events = set(event._eq_tuple for event in self.events)
+
+def _measure_performance(num_events=1000000, heap_class=Heap):
+    import sys
+    import time
+    from prototype import JobSubmissionEvent, JobTerminationEvent
+
+    queue = EventQueue(heap_class)
+    handled = [0]
+    def handler(event):
+        handled[0] += 1
+    queue.add_handler(JobSubmissionEvent, handler)
+    queue.add_handler(JobTerminationEvent, handler)
+
+    event_types = (JobSubmissionEvent, JobTerminationEvent)
+    start_time = time.time()
+    for i in xrange(num_events):
+        # the timestamps go back and forth, like the events of overlapping jobs
+        queue.add_event(event_types[i % 2](i // 2 + (i % 7) * 100, None))
+    push_time = time.time() - start_time
+
+    # an event's object, its attributes dict if it has one, its key, its heap
+    # item and its share of the heap's index if it has one
+    key, event = iter(queue._events_heap).next()
+    bytes_per_event = sys.getsizeof(event) + sys.getsizeof(key) + sys.getsizeof((key, event))
+    if hasattr(event, "__dict__"):
+        bytes_per_event += sys.getsizeof(event.__dict__)
+    if hasattr(queue._events_heap, "positions"):
+        bytes_per_event += sys.getsizeof(queue._events_heap.positions) // num_events
+
+    start_time = time.time()
+    while not queue.is_empty:
+        queue.advance()
+    advance_time = time.time() - start_time
+
+    assert handled[0] == num_events
+    print "heap:", heap_class.__module__
+    print "no. of events:", num_events
+    print "bytes per queued event:", bytes_per_event
+    print "microseconds per event, add_event: %.2f, advance: %.2f" % (
+        push_time * 1e6 / num_events, advance_time * 1e6 / num_events)
+
+if __name__ == "__main__":
+    if __debug__:
+        print "add_event asserts the event is new in O(n), run with python -O"
+    else:
+        for name in sorted(HEAP_CLASSES):
+            _measure_performance(heap_class=HEAP_CLASSES[name])
@@ -1,19 +1,156 @@
 #!/usr/bin/env python2.4
-# receives swf input on stdin, prints it back to stdout minus the lines that
-# raise asserts in the simulator
-import fileinput
-import workload_parser
-import prototype
+# receives swf input on stdin (or a file), prints it back to stdout minus the
+# jobs the simulator can't run, and with the fields _job_input_to_job would
+# have to guess filled in. The number of jobs each rule dropped or modified
+# is printed to stderr.
+#
+# The rules are applied to whole JobTable columns at once, no Job is created.
+# The input is loaded raw (see JobTable), so the requested processors filled in
+# from the allocated ones are counted like the other fields.
+
 import sys
+import math
+from array import array
+from itertools import izip
+
+from workload_parser import read_lines, WorkloadHeader
+from workload_table import FIELD_NAMES, load_table_parallel, load_table
+from swf_writer import SwfWriter
+
+# jobs matching these are dropped, each job is counted by the first rule it matches
+def _negative_submit_time(table, total_num_processors):
+    return [s < 0 for s in table.submit_time]
+
+def _no_run_time(table, total_num_processors):
+    return [r <= 0 for r in table.run_time]
+
+def _no_processors(table, total_num_processors):
+    return [a <= 0 and r <= 0 for (a, r) in izip(table.num_allocated_processors, table.num_requested_processors)]
+
+def _too_many_processors(table, total_num_processors):
+    "the larger of the two counts, since the fix rules fill a missing one in from the other"
+    if total_num_processors is None:
+        return [False] * len(table)
+    return [max(a, r) > total_num_processors for (a, r) in izip(table.num_allocated_processors, table.num_requested_processors)]
+
+DROP_RULES = (
+    ("negative submit time",    _negative_submit_time),
+    ("no run time",             _no_run_time),
+    ("no processors",           _no_processors),
+    ("too many processors",     _too_many_processors),
+)
+
+# jobs matching these are kept with the given field replaced, in this order
+def _fix_requested_processors(table):
+    "a missing number of requested processors is the allocated number, like JobInput.num_requested_processors"
+    column = table.num_requested_processors
+    fixed = [r <= 0 for r in column]
+    table.num_requested_processors = array(column.typecode, [
+        f and a or r for (f, r, a) in izip(fixed, column, table.num_allocated_processors)
+    ])
+    return fixed
+
+def _fix_allocated_processors(table):
+    "a missing number of allocated processors is taken from the requested number"
+    column = table.num_allocated_processors
+    fixed = [a <= 0 for a in column]
+    table.num_allocated_processors = array(column.typecode, [
+        f and r or a for (f, a, r) in izip(fixed, column, table.num_requested_processors)
+    ])
+    return fixed
+
+def _fix_requested_time(table):
+    "a missing requested time is the run time (rounded up), like _job_input_to_job's estimate"
+    column = table.requested_time
+    fixed = [q <= 0 for q in column]
+    table.requested_time = array(column.typecode, [
+        f and max(int(math.ceil(r)), 1) or q for (f, q, r) in izip(fixed, column, table.run_time)
+    ])
+    return fixed
+
+def _fix_run_time(table):
+    "jobs that ran longer than requested were killed at the requested time"
+    column = table.run_time
+    fixed = [r > q for (r, q) in izip(column, table.requested_time)]
+    table.run_time = array(column.typecode, [
+        f and float(q) or r for (f, r, q) in izip(fixed, column, table.requested_time)
+    ])
+    return fixed
+
+FIX_RULES = (
+    ("missing requested processors",    _fix_requested_processors),
+    ("missing allocated processors",    _fix_allocated_processors),
+    ("missing requested time",          _fix_requested_time),
+    ("run time over requested time",    _fix_run_time),
+)
 
-from prototype import _job_input_to_job
+def sanitize(table, total_num_processors=None):
+    """
+    Returns (cleaned JobTable, {rule name: no. of jobs dropped or modified}).
+    The table must have all the fields. If total_num_processors is None jobs
+    aren't checked against the machine size.
 
-for line in fileinput.input():
-    if line.lstrip().startswith(';'):
-        sys.stdout.write(line)
+    The table should be loaded raw (see JobTable), or the missing requested
+    processors are already filled in and aren't counted.
+    """
+    assert table.fields == FIELD_NAMES
+    counts = {}
+
+    keep = [True] * len(table)
+    for name, rule in DROP_RULES:
+        matches = rule(table, total_num_processors)
+        counts[name] = len([True for (k, m) in izip(keep, matches) if k and m])
+        keep = [k and not m for (k, m) in izip(keep, matches)]
+
+    result = table.select(keep)
+
+    for name, rule in FIX_RULES:
+        counts[name] = len([True for fixed in rule(result) if fixed])
+
+    return result, counts
+
+def header_lines(header, num_jobs):
+    "the header's lines, with MaxJobs and MaxRecords set to num_jobs"
+    result = []
+    for line in header.lines:
+        key = line.lstrip(" ;").split(":", 1)[0].strip()
+        if key in ("MaxJobs", "MaxRecords"):
+            line = "; %s: %d" % (key, num_jobs)
+        result.append(line)
+    return result
+
+def main():
+    import optparse
+    parser = optparse.OptionParser(usage="%prog [options] [input file] > output file")
+    parser.add_option("--num-processors", type="int", \
+                      help="drop jobs larger than this, defaults to MaxProcs (or MaxNodes) from the input file header")
+    parser.add_option("--parse-processes", type="int", default=1, \
+                      help="parse the input file in this many processes, 0 means one per cpu (default 1)")
+    options, args = parser.parse_args()
+    if len(args) > 1:
+        parser.error("unknown extra arguments: %s" % args[1:])
+
+    header = WorkloadHeader()
+    if not args or args[0] == "-":
+        table = load_table(read_lines(sys.stdin), header=header, raw=True)
     else:
-        job_input = workload_parser.JobInput(line)
-        try: job = _job_input_to_job(job_input)
-        except AssertionError: continue
-        sys.stdout.write(line)
+        table = load_table_parallel(args[0], num_processes=options.parse_processes or None, header=header, raw=True)
+
+    if options.num_processors is None:
+        options.num_processors = header.num_processors
+
+    cleaned, counts = sanitize(table, options.num_processors)
+
+    writer = SwfWriter(sys.stdout)
+    writer.write_header(header_lines(header, len(cleaned)))
+    writer.write_table(cleaned)
+    writer.flush()
+
+    print >> sys.stderr, "jobs read: %d, written: %d" % (len(table), len(cleaned))
+    for name, rule in DROP_RULES:
+        print >> sys.stderr, "dropped, %s: %d" % (name, counts[name])
+    for name, rule in FIX_RULES:
+        print >> sys.stderr, "modified, %s: %d" % (name, counts[name])
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import heapq
+
+class Heap(object):
+    """
+    An addressable heap, with the interface of simple_heap.Heap.
+
+    The items are (key, value) pairs ordered by key, and the keys must be
+    unique and hashable (e.g. JobEvent.key). A map from every key to its
+    position in the heap list makes membership O(1), and removing any item
+    O(log n) instead of a linear search and a heapify.
+    """
+    def __init__(self):
+        self.contents = []
+        self.positions = {} # key -> index in contents
+
+    def push(self, item):
+        assert item[0] not in self.positions
+        contents = self.contents
+        contents.append(item)
+        self._sift_up(len(contents) - 1, item)
+
+    def pop(self):
+        contents = self.contents
+        last = contents.pop()
+        if not contents:
+            del self.positions[last[0]]
+            return last
+        result = contents[0]
+        del self.positions[result[0]]
+        self._sift_down(0, last)
+        return result
+
+    def peek(self):
+        return self.contents[0]
+
+    def remove(self, item):
+        self.remove_key(item[0])
+
+    def remove_key(self, key):
+        "removes the item with the given key, raises KeyError if there's none"
+        index = self.positions.pop(key)
+        contents = self.contents
+        last = contents.pop()
+        if index == len(contents):
+            return # it was the last one
+        # the last item takes the removed item's place, and moves whichever way it has to
+        if index > 0 and last[0] < contents[(index - 1) >> 1][0]:
+            self._sift_up(index, last)
+        else:
+            self._sift_down(index, last)
+
+    def discard_keys(self, keys):
+        "removes the items whose key is in keys, rebuilding the heap in O(n)"
+        self.contents = [item for item in self.contents if item[0] not in keys]
+        heapq.heapify(self.contents)
+        self.positions = dict((item[0], index) for (index, item) in enumerate(self.contents))
+
+    def _sift_up(self, index, item):
+        "puts item at index or above it, moving down the parents that are larger"
+        contents = self.contents
+        positions = self.positions
+        key = item[0]
+        while index > 0:
+            parent_index = (index - 1) >> 1
+            parent = contents[parent_index]
+            if parent[0] <= key:
+                break
+            contents[index] = parent
+            positions[parent[0]] = index
+            index = parent_index
+        contents[index] = item
+        positions[key] = index
+
+    def _sift_down(self, index, item):
+        "puts item at index or below it, moving up the smaller children"
+        contents = self.contents
+        positions = self.positions
+        key = item[0]
+        size = len(contents)
+        child_index = 2 * index + 1
+        while child_index < size:
+            right_index = child_index + 1
+            if right_index < size and contents[right_index][0] < contents[child_index][0]:
+                child_index = right_index
+            child = contents[child_index]
+            if key <= child[0]:
+                break
+            contents[index] = child
+            positions[child[0]] = index
+            index = child_index
+            child_index = 2 * index + 1
+        contents[index] = item
+        positions[key] = index
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __contains__(self, item):
+        return item[0] in self.positions
+
+    def contains_key(self, key):
+        return key in self.positions
+
+    def __iter__(self):
+        return iter(self.contents)
@@ -3,22 +3,35 @@ import simple_heap
 class Heap(simple_heap.Heap):
     """
     Like the simple heap, but append instead of heappush on push (constant
-    time) and lazily heapify on pop
+    time) and lazily heapify on the first pop or peek, after which it's a
+    simple heap.
+    Suits loading many items (e.g. all the submissions) before popping.
     """
-    def _push_breaking_heap(self, item):
-        self.pop = self._pop_broken_heap
-        self.push = self._push_broken_heap
-        self._push_broken_heap(item)
-
     def _push_broken_heap(self, item):
         self.contents.append(item)
 
     def _pop_legal_heap(self):
         return heapq.heappop(self.contents)
     def _pop_broken_heap(self):
+        self._make_legal()
+        return self._pop_legal_heap()
+
+    def _peek_broken_heap(self):
+        self._make_legal()
+        return self.contents[0]
+
+    def _make_legal(self):
         heapq.heapify(self.contents)
         self.pop = self._pop_legal_heap
-        return self._pop_legal_heap()
+        self.push = self._push_legal_heap # keep the heap legal from now on
+        self.peek = self._peek_legal_heap
+
+    def _peek_legal_heap(self):
+        return self.contents[0]
+
+    def _push_legal_heap(self, item):
+        heapq.heappush(self.contents, item)
 
     push = _push_broken_heap
     pop = _pop_broken_heap
+    peek = _peek_broken_heap
@@ -2,7 +2,18 @@
 
 import sys
 
+# An event's key packs its _cmp_tuple (timestamp, type order, counter) into one
+# integer, computed once when the event is created, so the event queue orders
+# events by comparing integers instead of calling __cmp__. Timestamps must be
+# integers; types not in EVENTS_ORDER get the largest type order.
+COUNTER_BITS = 40
+TYPE_ORDER_BITS = 3
+MAX_TYPE_ORDER = (1 << TYPE_ORDER_BITS) - 1
+_TIMESTAMP_SHIFT = COUNTER_BITS + TYPE_ORDER_BITS
+
 class JobEvent(object):
+    # events are many and short lived, slots keep them small
+    __slots__ = ("timestamp", "counter", "job", "key")
 
     global_event_counter = 0
     @classmethod
@@ -14,12 +25,20 @@ class JobEvent(object):
         self.timestamp = timestamp
         self.counter   = JobEvent.next_counter()
         self.job = job
+        self.key = self.make_key(timestamp, self._type_order, self.counter)
+
+    @staticmethod
+    def make_key(timestamp, type_order, counter):
+        assert counter < 1 << COUNTER_BITS
+        if type_order > MAX_TYPE_ORDER:
+            type_order = MAX_TYPE_ORDER
+        return (timestamp << _TIMESTAMP_SHIFT) | (type_order << COUNTER_BITS) | counter
 
     def __repr__(self):
-        return type(self).__name__ + "<timestamp=%(timestamp)s, job=%(job)s>" % vars(self)
+        return type(self).__name__ + "<timestamp=%s, job=%s>" % (self.timestamp, self.job)
 
     def __cmp__(self, other):
-        return cmp(self._cmp_tuple, other._cmp_tuple)
+        return cmp(self.key, other.key)
 
     @property
     def _cmp_tuple(self):
@@ -43,13 +62,14 @@ class JobEvent(object):
 
     EVENTS_ORDER = []
 
-class JobSubmissionEvent(JobEvent): pass
-class JobStartEvent(JobEvent): pass
-class JobTerminationEvent(JobEvent): pass
-class JobPredictionIsOverEvent(JobEvent):pass
+class JobSubmissionEvent(JobEvent): __slots__ = ()
+class JobStartEvent(JobEvent): __slots__ = ()
+class JobTerminationEvent(JobEvent): __slots__ = ()
+class JobPredictionIsOverEvent(JobEvent): __slots__ = ()
 
 # tie break rule order for events occuring at the same time 
 JobEvent.EVENTS_ORDER = [JobPredictionIsOverEvent, JobSubmissionEvent, JobTerminationEvent, JobStartEvent]
+assert len(JobEvent.EVENTS_ORDER) <= MAX_TYPE_ORDER # the last order is for the other types
 
 class Job(object):
     def __init__(self, id, user_estimated_run_time, actual_run_time, num_required_processors, \
@@ -116,7 +136,11 @@ class StupidScheduler(object):
         return []
 
 class Machine(object):
-    "Represents the actual parallel machine ('cluster')"
+    """
+    Represents the actual parallel machine ('cluster'). A job's
+    JobPredictionIsOverEvent is created only if the event queue has a
+    handler for it (e.g. the scheduler is EASY++).
+    """
     def __init__(self, event_queue):
         self.event_queue = event_queue
         self.event_queue.add_handler(JobStartEvent, self._start_job_handler)
@@ -124,8 +148,8 @@ class Machine(object):
     def _start_job_handler(self, event):
         assert type(event) == JobStartEvent
         if event.job.start_to_run_at_time not in (-1, event.timestamp):
-            # outdated job start event, ignore
-            # TODO: remove the possibility for outdated events
+            # outdated job start event, ignore (the simulator cancels the
+            # start events schedulers supersede, other queue users may not)
             return
         self._add_job(event.job, event.timestamp)
 
@@ -133,7 +157,7 @@ class Machine(object):
         assert job.actual_run_time  <= job.user_estimated_run_time
         
         self.event_queue.add_event(JobTerminationEvent(job=job, timestamp=current_timestamp+job.actual_run_time))
-        if job.predicted_run_time < job.actual_run_time:
+        if job.predicted_run_time < job.actual_run_time and self.event_queue.has_handler(JobPredictionIsOverEvent):
              self.event_queue.add_event(JobPredictionIsOverEvent(job=job, timestamp=current_timestamp+job.predicted_run_time))
             
             
@@ -0,0 +1,109 @@
+import heapq
+
+class Heap(object):
+    """
+    A monotone radix heap, with the interface of simple_heap.Heap.
+
+    The items are (key, value) pairs of integer keys, and like the
+    simulation clock the keys popped must never decrease. The heap keeps
+    the radix of the last key popped (the key shifted right by radix_shift),
+    and puts every item in the bucket of the highest bit in which its radix
+    differs from it. Popping takes the items of the lowest non empty bucket
+    and spreads them over the lower buckets, so every item moves down at most
+    once per bit, instead of being compared O(log n) times.
+
+    Bucket 0 holds the items whose radix is at most the last one (the same
+    timestamp, or an earlier one pushed out of order), as a heapq ordered by
+    the whole key, so an out of order push is still popped in order.
+
+    The default radix_shift drops the type order and counter bits of JobEvent
+    keys, so the radix is the timestamp and the events of one timestamp share
+    bucket 0.
+
+    Requires python 2.7 (int.bit_length).
+    """
+    def __init__(self, radix_shift=None):
+        if radix_shift is None:
+            from prototype import COUNTER_BITS, TYPE_ORDER_BITS
+            radix_shift = COUNTER_BITS + TYPE_ORDER_BITS
+        self.radix_shift = radix_shift
+        self.last_radix = 0
+        self.buckets = [[]]
+        self.size = 0
+
+    def _bucket_index(self, key):
+        radix = key >> self.radix_shift
+        if radix <= self.last_radix:
+            return 0
+        return (radix ^ self.last_radix).bit_length()
+
+    def push(self, item):
+        index = self._bucket_index(item[0])
+        if index == 0:
+            heapq.heappush(self.buckets[0], item)
+        else:
+            buckets = self.buckets
+            while len(buckets) <= index:
+                buckets.append([])
+            buckets[index].append(item)
+        self.size += 1
+
+    def pop(self):
+        buckets = self.buckets
+        if not buckets[0]:
+            self._refill()
+        self.size -= 1
+        return heapq.heappop(buckets[0])
+
+    def peek(self):
+        if not self.buckets[0]:
+            self._refill()
+        return self.buckets[0][0]
+
+    def _refill(self):
+        "moves the items with the smallest radix to bucket 0, and spreads the rest of their bucket down"
+        buckets = self.buckets
+        for index in xrange(1, len(buckets)):
+            if buckets[index]:
+                break
+        else:
+            raise IndexError("pop from empty heap")
+
+        items = buckets[index]
+        buckets[index] = []
+        shift = self.radix_shift
+        self.last_radix = last_radix = min(items)[0] >> shift
+
+        first = buckets[0]
+        for item in items:
+            radix = item[0] >> shift
+            if radix == last_radix:
+                first.append(item)
+            else:
+                buckets[(radix ^ last_radix).bit_length()].append(item)
+        heapq.heapify(first)
+
+    def remove(self, item):
+        index = self._bucket_index(item[0])
+        self.buckets[index].remove(item)
+        if index == 0:
+            heapq.heapify(self.buckets[0])
+        self.size -= 1
+
+    def discard_keys(self, keys):
+        "removes the items whose key is in keys, O(n)"
+        for index, bucket in enumerate(self.buckets):
+            self.buckets[index] = [item for item in bucket if item[0] not in keys]
+        heapq.heapify(self.buckets[0])
+        self.size = sum(len(bucket) for bucket in self.buckets)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, item):
+        return item in self.buckets[self._bucket_index(item[0])]
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            for item in bucket:
+                yield item
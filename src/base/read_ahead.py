@@ -0,0 +1,132 @@
+#! /usr/bin/env python2.4
+
+# Reads ahead of the simulation: a producer thread (or process) iterates over
+# e.g. the parsed chunks of a workload, and puts them in batches on a bounded
+# queue, while the simulator takes them off it. This overlaps reading,
+# decompressing and parsing the input with the simulation, and the bound
+# keeps the producer from reading the whole input into memory.
+#
+# A thread overlaps only the waiting for I/O (and decompression that releases
+# the interpreter lock), a process overlaps the parsing too but the batches
+# are pickled on their way back, so it suits batches of a few large objects
+# (JobTables) rather than many small ones (Jobs).
+#
+# threading and multiprocessing are imported only when needed, importing them
+# imports the time module (see the end of run_simulator.py).
+
+import sys
+
+# the producer waits while this many batches wait to be consumed
+MAX_BATCHES = 4
+
+_BATCH = "batch"
+_END = "end"
+_ERROR = "error"
+
+def _batches(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _produce(iterable, batch_size, queue, stopped, in_process):
+    try:
+        for batch in _batches(iterable, batch_size):
+            if stopped():
+                return
+            queue.put((_BATCH, batch))
+        queue.put((_END, None))
+    except:
+        if in_process:
+            # the traceback can't be pickled, send its text instead
+            import traceback
+            queue.put((_ERROR, "".join(traceback.format_exception(*sys.exc_info()))))
+        else:
+            queue.put((_ERROR, sys.exc_info()))
+
+class ReadAheadError(Exception):
+    "the producer process failed, the message is its traceback"
+
+class ReadAhead(object):
+    """
+    An iterator of the items of iterable, which is iterated by a producer
+    thread (or, if use_process is true, a forked process) up to max_batches
+    batches of batch_size items ahead of the consumer. An exception raised by
+    the iterable is raised by next() when its batch is reached (as a
+    ReadAheadError if it was raised in a process).
+
+    In a process the iterable is iterated by the process' copy of it, so it
+    mustn't depend on the consumer's state; note that multiprocessing closes
+    the process' stdin.
+    """
+    def __init__(self, iterable, batch_size=1, max_batches=MAX_BATCHES, use_process=False):
+        assert batch_size > 0 and max_batches > 0
+        self.use_process = use_process
+        if use_process:
+            import multiprocessing
+            self._queue = multiprocessing.Queue(max_batches)
+            self._stop = multiprocessing.Event()
+            self._producer = multiprocessing.Process(target=_produce,
+                args=(iterable, batch_size, self._queue, self._stop.is_set, True))
+            self._producer.daemon = True
+        else:
+            import threading
+            import Queue
+            self._queue = Queue.Queue(max_batches)
+            self._stop = threading.Event()
+            self._producer = threading.Thread(target=_produce,
+                args=(iter(iterable), batch_size, self._queue, self._stop.isSet, False))
+            self._producer.setDaemon(True)
+        self._batch = iter(())
+        self._done = False
+        self._producer.start()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while True:
+            try:
+                return self._batch.next()
+            except StopIteration:
+                pass
+
+            if self._done:
+                raise StopIteration
+
+            kind, value = self._queue.get()
+            if kind == _BATCH:
+                self._batch = iter(value)
+            elif kind == _END:
+                self._done = True
+                self._producer.join()
+            else:
+                self._done = True
+                self._producer.join()
+                if self.use_process:
+                    raise ReadAheadError(value)
+                raise value[0], value[1], value[2]
+
+    def close(self):
+        "stops the producer, for when the rest of the items aren't needed"
+        if self._done:
+            return
+        self._done = True
+        self._batch = iter(())
+        self._stop.set()
+        if self.use_process:
+            self._producer.terminate()
+            self._producer.join()
+        else:
+            # make room for the batch the producer may be waiting to put, it
+            # stops before putting the next one
+            import Queue
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except Queue.Empty:
+                pass
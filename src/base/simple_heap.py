@@ -9,11 +9,20 @@ class Heap(object):
     def pop(self):
         return heapq.heappop(self.contents)
 
+    def peek(self):
+        "the smallest item, without popping it"
+        return self.contents[0]
+
     def remove(self, item):
         # warning: inefficient, O(n)
         self.contents.remove(item)
         heapq.heapify(self.contents)
 
+    def discard_keys(self, keys):
+        "removes the items whose key (first element) is in keys, O(n)"
+        self.contents = [item for item in self.contents if item[0] not in keys]
+        heapq.heapify(self.contents)
+
     def __len__(self):
         return len(self.contents)
 
@@ -0,0 +1,102 @@
+#! /usr/bin/env python2.4
+
+# Writes workloads in the Standard Workload Format, see workload_parser.
+
+from itertools import izip
+
+from workload_table import FIELDS, FIELD_NAMES
+
+# lines kept in memory before writing them out
+BUFFER_SIZE = 10000
+
+def format_number(value):
+    "integral values are written as integers, the others with 2 decimal places like the archive"
+    if value == int(value):
+        return "%d" % value
+    return "%.2f" % value
+
+def format_fields(fields):
+    "returns the SWF line (without the newline) of the 18 given field values"
+    assert len(fields) == len(FIELD_NAMES)
+    return " ".join([format_number(value) for value in fields])
+
+class SwfWriter(object):
+    """
+    Writes SWF lines to output_file, buffer_size lines at a time.
+    Call flush() (or close()) when done.
+    """
+    def __init__(self, output_file, buffer_size=BUFFER_SIZE):
+        self.output_file = output_file
+        self.buffer_size = buffer_size
+        self.num_jobs = 0
+        self._lines = []
+
+    def write_line(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= self.buffer_size:
+            self.flush()
+
+    def write_header(self, header_lines):
+        "writes comment lines, e.g. WorkloadHeader.lines"
+        for line in header_lines:
+            if not line.lstrip().startswith(';'):
+                line = "; " + line
+            self.write_line(line)
+
+    def write_fields(self, fields):
+        self.write_line(format_fields(fields))
+        self.num_jobs += 1
+
+    def write_job(self, job):
+        """
+        writes a simulated job: its wait time (field 3) is the time from its
+        submission to its start, and it ran on the processors it requested
+        """
+        self.write_line("%s %d %d %d %d -1 -1 %d %d -1 1 %s -1 -1 -1 -1 -1 -1" % (
+            job.id, job.submit_time, job.start_to_run_at_time - job.submit_time, job.actual_run_time,
+            job.num_required_processors, job.num_required_processors, job.user_estimated_run_time,
+            job.user_id,
+        ))
+        self.num_jobs += 1
+
+    def write_table(self, table):
+        "writes every row of a JobTable that has all the fields"
+        assert table.fields == FIELD_NAMES
+        # formatting buffer_size rows a column at a time is much faster
+        for start in xrange(0, len(table), self.buffer_size):
+            end = start + self.buffer_size
+            columns = []
+            for name, typecode in FIELDS:
+                if typecode == 'd':
+                    columns.append(map(format_number, getattr(table, name)[start:end]))
+                else:
+                    columns.append(map(str, getattr(table, name)[start:end]))
+            for fields in izip(*columns):
+                self.write_line(" ".join(fields))
+            self.num_jobs += len(columns[0])
+
+    def flush(self):
+        if self._lines:
+            self.output_file.write("\n".join(self._lines) + "\n")
+            self._lines = []
+        self.output_file.flush()
+
+    def close(self):
+        self.flush()
+        self.output_file.close()
+
+    def __getstate__(self):
+        "for checkpoints: flushes the lines, and keeps the output file's name and offset instead of the file"
+        self.flush()
+        state = self.__dict__.copy()
+        state["output_file"] = (self.output_file.name, self.output_file.tell())
+        return state
+
+    def __setstate__(self, state):
+        "reopens the output file, without what was written after the checkpoint"
+        file_name, offset = state["output_file"]
+        output_file = open(file_name, "r+")
+        output_file.seek(offset)
+        output_file.truncate()
+        self.__dict__.update(state)
+        self.output_file = output_file
@@ -1,12 +1,28 @@
 #!/usr/bin/env python2.4
 from unittest import TestCase
 
+import os
 import random
 
 import prototype
 
 from event_queue import EventQueue
+import indexed_heap
+import lazy_heap
+import radix_heap
 import workload_parser
+import workload_table
+import workload_cache
+import workload_index
+import workload_transform
+import workload_merge
+import swf_writer
+import filter
+import workload_generator
+import read_ahead
+import workload_dependencies
+import workload_profile
+import checkpoint
 
 def _gen_random_timestamp_events():
     return [
@@ -59,6 +75,26 @@ class test_JobEvent(TestCase):
         sorted_events = sorted(random_events, key=lambda x:x._cmp_tuple)
         self.assertEqual( sorted_events, sorted(random_events) )
 
+    def test_slots(self):
+        event = prototype.JobStartEvent(timestamp=10, job="abc")
+        self.failIf( hasattr(event, "__dict__") )
+        self.assertEqual( "JobStartEvent<timestamp=10, job=abc>", repr(event) )
+
+    def test_key_order(self):
+        event_types = prototype.JobEvent.EVENTS_ORDER + [prototype.JobEvent]
+        random_events = [
+            random.choice(event_types)(timestamp=random.randrange(-10, 10), job=str(i))
+            for i in xrange(100)
+        ]
+        by_key = sorted(random_events, key=lambda x:x.key)
+        self.assertEqual( sorted(random_events, key=lambda x:x._cmp_tuple), by_key )
+        self.assertEqual( by_key, sorted(random_events) )
+
+    def test_key_large_timestamp(self):
+        e1 = prototype.JobStartEvent(timestamp=2**40, job="abc")
+        e2 = prototype.JobSubmissionEvent(timestamp=2**40 + 1, job="abc")
+        self.failUnless( e1.key < e2.key )
+
 class test_EventQueue(TestCase):
     def setUp(self):
         self.queue = EventQueue()
@@ -154,6 +190,17 @@ class test_EventQueue(TestCase):
             1, len(self.queue._get_event_handlers( prototype.JobEvent ))
         )
 
+    def test_remove_handler(self):
+        other_handler = _create_handler()
+        self.queue.add_handler(prototype.JobEvent, self.handler)
+        self.queue.add_handler(prototype.JobEvent, other_handler)
+        self.queue.remove_handler(prototype.JobEvent, self.handler)
+        self._add_event_and_advance(self.event)
+        self.failIf( self.handler.called )
+        self.failUnless( other_handler.called )
+        self.queue.remove_handler(prototype.JobEvent, other_handler)
+        self.failIf( self.queue.has_handler(prototype.JobEvent) )
+
     def test_advance_empty_queue(self):
         self.assertRaises(AssertionError, self.queue.advance)
 
@@ -218,6 +265,80 @@ class test_EventQueue(TestCase):
         self.queue.add_event(event)
         self.queue.advance()
 
+    def test_cancel_event(self):
+        for event in self.events:
+            self.queue.add_event(event)
+        self.queue.cancel_event(self.events[0])
+        self.queue.cancel_event(self.events[5])
+        self.assertEqual( len(self.events) - 2, len(self.queue) )
+        self.assertEqual( self.events[1:5] + self.events[6:], self.queue.sorted_events )
+        self.failUnless( self.queue.pop() is self.events[1] )
+
+    def test_cancelled_event_not_handled(self):
+        self.queue.add_handler(prototype.JobEvent, self.handler)
+        self.queue.add_event(self.event)
+        self.queue.cancel_event(self.event)
+        self.failUnless( self.queue.is_empty )
+        self._add_event_and_advance(prototype.JobStartEvent(timestamp=0, job=None))
+        self.failIf( self.handler.called )
+
+    def test_cancel_handled_event(self):
+        self.queue.add_event(self.events[0])
+        self.queue.add_event(self.events[1])
+        self.queue.advance()
+        self.queue.cancel_event(self.events[0]) # does nothing
+        self.assertEqual( 1, len(self.queue) )
+
+    def test_cancel_compacts(self):
+        for event in self.events:
+            self.queue.add_event(event)
+        for event in self.events[:6]:
+            self.queue.cancel_event(event)
+        self.assertEqual( 4, len(self.queue._events_heap) )
+        self.assertEqual( self.events[6:], [self.queue.pop() for i in xrange(4)] )
+
+    def test_readd_after_cancel(self):
+        self.queue.add_event(self.event)
+        self.queue.cancel_event(self.event)
+        event = prototype.JobEvent(timestamp=0, job=None) # equal to the cancelled event
+        self.queue.add_event(event)
+        self.failUnless( self.queue.pop() is event )
+
+    def test_peek(self):
+        self.failUnless( self.queue.peek() is None )
+        for event in self.events:
+            self.queue.add_event(event)
+        self.failUnless( self.queue.peek() is self.events[0] )
+        self.assertEqual( len(self.events), len(self.queue) )
+        self.queue.cancel_event(self.events[0])
+        self.failUnless( self.queue.peek() is self.events[1] )
+        self.failUnless( self.queue.pop() is self.events[1] )
+        event = prototype.JobEvent(timestamp=1, job=None) # pushed after a peek
+        self.queue.add_event(event)
+        self.failUnless( self.queue.peek() is event )
+        self.failUnless( self.queue.pop() is event )
+        self.failUnless( self.queue.peek() is self.events[2] )
+
+    def test_dispatch_event(self):
+        self.queue.add_handler(prototype.JobStartEvent, self.handler)
+        later = prototype.JobSubmissionEvent(timestamp=1, job=None)
+        self.queue.add_event(later)
+        self.failUnless( self.queue.dispatch_event(prototype.JobStartEvent(timestamp=0, job=None)) )
+        self.failUnless( self.handler.called )
+        self.assertEqual( [later], self.queue.sorted_events )
+
+    def test_dispatch_event_after_queued_event(self):
+        self.queue.add_handler(prototype.JobStartEvent, self.handler)
+        earlier = prototype.JobSubmissionEvent(timestamp=0, job=None) # comes before a start at 0
+        self.queue.add_event(earlier)
+        start = prototype.JobStartEvent(timestamp=0, job=None)
+        self.failIf( self.queue.dispatch_event(start) )
+        self.failIf( self.handler.called )
+        self.assertEqual( [earlier, start], self.queue.sorted_events )
+        self.queue.advance()
+        self.queue.advance()
+        self.failUnless( self.handler.called )
+
 # taken from LANL-CM5-1994-3.1-cln.swf
 SAMPLE_JOB_INPUT = """
     5     4009      7   3039  128   2605  1812  128   3600  3200  1   9   8   6  1 -1 -1 -1
@@ -237,6 +358,105 @@ SAMPLE_JOB_INPUT = """
    19     7307      3    441  128 392.00  7148  128    480  8192  1  11  10   7  1 -1 -1 -1
 """.strip().splitlines()
 
+class test_EventQueue_indexed_heap(test_EventQueue):
+    def setUp(self):
+        test_EventQueue.setUp(self)
+        self.queue = EventQueue(indexed_heap.Heap)
+
+class test_EventQueue_lazy_heap(test_EventQueue):
+    def setUp(self):
+        test_EventQueue.setUp(self)
+        self.queue = EventQueue(lazy_heap.Heap)
+
+class test_EventQueue_radix_heap(test_EventQueue):
+    def setUp(self):
+        test_EventQueue.setUp(self)
+        self.queue = EventQueue(radix_heap.Heap)
+
+class test_lazy_heap(TestCase):
+    def test_push_after_pop(self):
+        heap = lazy_heap.Heap()
+        for key in [5, 3, 8]:
+            heap.push((key, None))
+        self.assertEqual( 3, heap.pop()[0] )
+        heap.push((9, None))
+        heap.push((4, None))
+        self.assertEqual( [4, 5, 8, 9], [heap.pop()[0] for i in xrange(4)] )
+
+    def test_push_after_peek(self):
+        heap = lazy_heap.Heap()
+        for key in [5, 3, 8]:
+            heap.push((key, None))
+        self.assertEqual( 3, heap.peek()[0] )
+        heap.push((1, None))
+        self.assertEqual( 1, heap.peek()[0] )
+        self.assertEqual( [1, 3, 5, 8], [heap.pop()[0] for i in xrange(4)] )
+
+class test_radix_heap(TestCase):
+    def test_monotone(self):
+        heap = radix_heap.Heap(radix_shift=0)
+        current = 0
+        popped = []
+        for i in xrange(2000):
+            heap.push((current + random.randrange(1, 1000) * 1000 + i, None))
+            if random.random() < 0.4:
+                current = heap.pop()[0]
+                popped.append(current)
+        while heap:
+            popped.append(heap.pop()[0])
+        self.assertEqual( 2000, len(popped) )
+        self.assertEqual( sorted(popped), popped )
+
+    def test_out_of_order_push(self):
+        heap = radix_heap.Heap(radix_shift=0)
+        for key in [10, 20, 30]:
+            heap.push((key, None))
+        self.assertEqual( 10, heap.pop()[0] )
+        heap.push((5, None)) # before the last key popped
+        heap.push((-1, None))
+        self.assertEqual( [-1, 5, 20, 30], [heap.pop()[0] for i in xrange(4)] )
+        self.assertRaises( IndexError, heap.pop )
+
+    def test_event_keys_by_timestamp(self):
+        heap = radix_heap.Heap()
+        events = [prototype.JobStartEvent(timestamp=t, job=None) for t in (7, 3, 3, 1000000)]
+        for event in events:
+            heap.push((event.key, event))
+        self.failUnless( (events[3].key, events[3]) in heap )
+        heap.remove((events[3].key, events[3]))
+        self.assertEqual( [events[1], events[2], events[0]], [heap.pop()[1] for i in xrange(3)] )
+        self.assertEqual( 0, len(heap) )
+
+class test_indexed_heap(TestCase):
+    def test_random(self):
+        heap = indexed_heap.Heap()
+        keys = random.sample(xrange(1000), 200)
+        for key in keys:
+            heap.push((key, str(key)))
+        removed = keys[::3]
+        for key in removed:
+            self.failUnless( (key, str(key)) in heap )
+            heap.remove((key, str(key)))
+            self.failIf( heap.contains_key(key) )
+        expected = sorted(set(keys) - set(removed))
+        self.assertEqual( len(expected), len(heap) )
+        self.assertEqual( expected, [heap.pop()[0] for i in xrange(len(expected))] )
+        self.assertEqual( {}, heap.positions )
+
+    def test_positions(self):
+        heap = indexed_heap.Heap()
+        for key in [5, 3, 8, 1, 9, 2]:
+            heap.push((key, None))
+        heap.remove_key(3)
+        heap.pop()
+        for key, index in heap.positions.iteritems():
+            self.assertEqual( key, heap.contents[index][0] )
+
+    def test_remove_missing(self):
+        heap = indexed_heap.Heap()
+        heap.push((1, None))
+        self.assertRaises( KeyError, heap.remove_key, 2 )
+
 class test_Simulator(TestCase):
     def setUp(self):
         self.jobs = list(prototype._job_inputs_to_jobs(workload_parser.parse_lines(SAMPLE_JOB_INPUT), 1000))
@@ -282,6 +502,968 @@ class test_Simulator(TestCase):
         self.assertEqual( job.actual_run_time, job_input.run_time )
         self.assertEqual( job.num_required_processors, job_input.num_requested_processors )
 
+class test_JobTable(TestCase):
+    def setUp(self):
+        self.table = workload_table.load_table(SAMPLE_JOB_INPUT)
+
+    def tearDown(self):
+        del self.table
+
+    def test_len(self):
+        self.assertEqual( len(SAMPLE_JOB_INPUT), len(self.table) )
+
+    def test_columns_match_job_inputs(self):
+        job_inputs = list(workload_parser.parse_lines(SAMPLE_JOB_INPUT))
+        for name in workload_table.FIELD_NAMES:
+            if name == "average_cpu_time_used":
+                continue # JobInput can't convert '476.00'
+            self.assertEqual(
+                [getattr(job_input, name) for job_input in job_inputs],
+                list(getattr(self.table, name)),
+            )
+
+    def test_skips_comments_and_empty_lines(self):
+        table = workload_table.load_table(["; MaxProcs: 128", ""] + SAMPLE_JOB_INPUT + ["  "])
+        self.assertEqual( len(SAMPLE_JOB_INPUT), len(table) )
+
+    def test_chunks(self):
+        table = workload_table.load_table(SAMPLE_JOB_INPUT, chunk_size=4)
+        self.assertEqual( list(self.table.submit_time), list(table.submit_time) )
+
+    def test_float_integer_field(self):
+        table = workload_table.load_table([SAMPLE_JOB_INPUT[0].replace(" 1812 ", " 1812.00 ")])
+        self.assertEqual( 1812, table.used_memory[0] )
+
+    def _assert_same_jobs(self, jobs1, jobs2):
+        attributes = ("id", "submit_time", "user_estimated_run_time", "actual_run_time", "num_required_processors", "user_id")
+        self.assertEqual(
+            [tuple(getattr(job, name) for name in attributes) for job in jobs1],
+            [tuple(getattr(job, name) for name in attributes) for job in jobs2],
+        )
+
+    def test_jobs_match_job_input_to_job(self):
+        for total_num_processors in (1000, 100, 32):
+            self._assert_same_jobs(
+                prototype._job_inputs_to_jobs(workload_parser.parse_lines(SAMPLE_JOB_INPUT), total_num_processors),
+                self.table.jobs(total_num_processors),
+            )
+
+    def test_jobs_match_job_input_to_job_problematic(self):
+        lines = [
+            "1 -5 0 100 4 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # negative submit time
+            "2 10 0  -1 4 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # missing run time
+            "3 10 0 100 -1 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # missing processors
+            "4 10 0 300 4 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # ran longer than requested
+            "5 10 0 0.5 4 -1 -1 -1 -1 -1 1 1 -1 -1 -1 -1 -1 -1", # sub-second run time
+        ]
+        self._assert_same_jobs(
+            prototype._job_inputs_to_jobs(workload_parser.parse_lines(lines), 2),
+            workload_table.load_table(lines).jobs(2),
+        )
+
+    def test_job_fields_only(self):
+        table = workload_table.load_table(SAMPLE_JOB_INPUT, workload_table.JOB_FIELDS)
+        self.assertEqual( None, table.used_memory )
+        self._assert_same_jobs( self.table.jobs(1000), table.jobs(1000) )
+
+    def test_jobs_lazy(self):
+        jobs = self.table.jobs(1000)
+        self.assertEqual( 5, jobs.next().id )
+
+class test_compressed_input(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.text = "; MaxProcs: 1024\n" + "\n".join(SAMPLE_JOB_INPUT) + "\n"
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, open_function):
+        file_name = os.path.join(self.directory, name)
+        output_file = open_function(file_name, "wb")
+        output_file.write(self.text)
+        output_file.close()
+        return file_name
+
+    def _assert_parses_sample(self, file_name):
+        self.assertEqual(
+            [job_input.fields for job_input in workload_parser.parse_lines(SAMPLE_JOB_INPUT)],
+            [job_input.fields for job_input in workload_parser.parse_lines(file_name)],
+        )
+
+    def test_plain(self):
+        self._assert_parses_sample(self._write("plain.swf", open))
+
+    def test_gzip(self):
+        import gzip
+        self._assert_parses_sample(self._write("trace.swf.gz", gzip.open))
+
+    def test_bzip2(self):
+        import bz2
+        self._assert_parses_sample(self._write("trace.swf.bz2", bz2.BZ2File))
+
+    def test_detected_by_content(self):
+        import gzip
+        self._assert_parses_sample(self._write("no_suffix", gzip.open))
+
+    def test_process_output(self):
+        file_name = self._write("plain.swf", open)
+        self.assertEqual( self.text.splitlines(), list(workload_parser.read_lines(workload_parser._ProcessOutput(["cat", file_name]), 7)) )
+
+    def test_failed_process_output(self):
+        # like a truncated file, the output so far is read and then the failure raised
+        output = workload_parser._ProcessOutput(["sh", "-c", "echo 1; exit 3"])
+        self.assertRaises( IOError, list, workload_parser.read_lines(output) )
+        self.assertRaises( IOError, workload_parser._ProcessOutput, ["no-such-decompressor"] )
+
+    def test_process_output_closed_early(self):
+        output = workload_parser._ProcessOutput(["yes"])
+        self.assertEqual( "y\n", output.read(2) )
+        output.close()
+
+    def test_read_lines_chunks(self):
+        from StringIO import StringIO
+        for chunk_size in (1, 7, 100, len(self.text), 10 * len(self.text)):
+            self.assertEqual(
+                self.text.splitlines(),
+                list(workload_parser.read_lines(StringIO(self.text), chunk_size)),
+            )
+
+    def test_read_lines_no_trailing_newline(self):
+        from StringIO import StringIO
+        self.assertEqual( ["a", "b"], list(workload_parser.read_lines(StringIO("a\nb"), 3)) )
+
+    def test_cached_table_of_compressed_file(self):
+        import gzip
+        file_name = self._write("trace.swf.gz", gzip.open)
+        table = workload_cache.load_cached_table(file_name)
+        self.assertEqual( len(SAMPLE_JOB_INPUT), len(table) )
+        cached = workload_cache.read_cache(workload_cache.cache_file_name(file_name), file_name)
+        self.assertEqual( list(table.submit_time), list(cached.submit_time) )
+
+class test_workload_cache(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.input_file_name = os.path.join(self.directory, "input.swf")
+        self._write_input(SAMPLE_JOB_INPUT)
+        self.cache_file_name = workload_cache.cache_file_name(self.input_file_name)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _write_input(self, lines):
+        input_file = open(self.input_file_name, "w")
+        input_file.write("\n".join(lines) + "\n")
+        input_file.close()
+
+    def _assert_same_table(self, table1, table2):
+        for name in table1.fields:
+            self.assertEqual( list(getattr(table1, name)), list(getattr(table2, name)) )
+
+    def test_writes_cache(self):
+        table = workload_cache.load_cached_table(self.input_file_name)
+        self.failUnless( os.path.exists(self.cache_file_name) )
+        self._assert_same_table( workload_table.load_table(SAMPLE_JOB_INPUT), table )
+
+    def test_reads_cache(self):
+        table = workload_cache.load_cached_table(self.input_file_name)
+        cached = workload_cache.read_cache(self.cache_file_name, self.input_file_name)
+        self.failIf( cached is None )
+        self._assert_same_table( table, cached )
+
+    def test_reads_cache_subset_of_fields(self):
+        table = workload_cache.load_cached_table(self.input_file_name)
+        cached = workload_cache.read_cache(self.cache_file_name, self.input_file_name, workload_table.JOB_FIELDS)
+        self.assertEqual( workload_table.JOB_FIELDS, cached.fields )
+        self.assertEqual( list(table.requested_time), list(cached.requested_time) )
+
+    def test_missing_fields_not_cached(self):
+        workload_cache.load_cached_table(self.input_file_name, workload_table.JOB_FIELDS)
+        self.assertEqual( None, workload_cache.read_cache(self.cache_file_name, self.input_file_name) )
+        table = workload_cache.load_cached_table(self.input_file_name)
+        self.assertEqual( workload_table.FIELD_NAMES, table.fields )
+
+    def test_modified_input_invalidates_cache(self):
+        workload_cache.load_cached_table(self.input_file_name)
+        self._write_input(SAMPLE_JOB_INPUT[:5])
+        self.assertEqual( None, workload_cache.read_cache(self.cache_file_name, self.input_file_name) )
+        self.assertEqual( 5, len(workload_cache.load_cached_table(self.input_file_name)) )
+
+    def test_touched_input_keeps_cache(self):
+        workload_cache.load_cached_table(self.input_file_name)
+        stat = os.stat(self.input_file_name)
+        os.utime(self.input_file_name, (stat.st_atime, stat.st_mtime + 10))
+        self.failIf( workload_cache.read_cache(self.cache_file_name, self.input_file_name) is None )
+
+    def test_touched_input_updates_cached_mtime(self):
+        workload_cache.load_cached_table(self.input_file_name)
+        stat = os.stat(self.input_file_name)
+        os.utime(self.input_file_name, (stat.st_atime, stat.st_mtime + 10))
+        workload_cache.read_cache(self.cache_file_name, self.input_file_name)
+
+        hashed = []
+        original_file_md5 = workload_cache._file_md5
+        def file_md5(file_name):
+            hashed.append(file_name)
+            return original_file_md5(file_name)
+        workload_cache._file_md5 = file_md5
+        try:
+            self.failIf( workload_cache.read_cache(self.cache_file_name, self.input_file_name) is None )
+        finally:
+            workload_cache._file_md5 = original_file_md5
+        self.assertEqual( [], hashed )
+
+    def test_cached_columns_are_arrays(self):
+        from array import array
+        table = workload_table.load_table(SAMPLE_JOB_INPUT)
+        workload_cache.load_cached_table(self.input_file_name)
+        cached = workload_cache.read_cache(self.cache_file_name, self.input_file_name)
+        for name in table.fields:
+            self.failUnless( isinstance(getattr(cached, name), array) )
+            self.assertEqual( getattr(table, name), getattr(cached, name) )
+
+    def test_same_size_modified_input_invalidates_cache(self):
+        workload_cache.load_cached_table(self.input_file_name)
+        stat = os.stat(self.input_file_name)
+        self._write_input([SAMPLE_JOB_INPUT[0].replace("4009", "4010")] + SAMPLE_JOB_INPUT[1:])
+        os.utime(self.input_file_name, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual( None, workload_cache.read_cache(self.cache_file_name, self.input_file_name) )
+
+class test_WorkloadHeader(TestCase):
+    HEADER = [
+        "; Version: 2.2",
+        "; Computer: IBM SP2",
+        ";   MaxJobs: %d" % len(SAMPLE_JOB_INPUT),
+        "; MaxRecords: %d" % len(SAMPLE_JOB_INPUT),
+        "; UnixStartTime: 815011200",
+        "; MaxNodes: 128",
+        "; MaxProcs: 1024",
+        "; Note: the header lines can contain: colons",
+    ]
+
+    def test_fields(self):
+        header = workload_parser.WorkloadHeader()
+        for line in self.HEADER:
+            header.add_line(line)
+        self.assertEqual( 1024, header.num_processors )
+        self.assertEqual( len(SAMPLE_JOB_INPUT), header.num_records )
+        self.assertEqual( 815011200, header.unix_start_time )
+        self.assertEqual( "IBM SP2", header.fields["Computer"] )
+        self.assertEqual( "the header lines can contain: colons", header.fields["Note"] )
+        self.assertEqual( self.HEADER, header.lines )
+
+    def test_missing_fields(self):
+        header = workload_parser.WorkloadHeader()
+        header.add_line("; MaxProcs: -1")
+        header.add_line("; MaxNodes: 64")
+        header.add_line("; MaxJobs: unknown")
+        self.assertEqual( 64, header.num_processors )
+        self.assertEqual( None, header.num_records )
+        self.assertEqual( None, header.unix_start_time )
+
+    def test_parse_lines_fills_header(self):
+        header = workload_parser.WorkloadHeader()
+        job_inputs = list(workload_parser.parse_lines(self.HEADER + SAMPLE_JOB_INPUT, header))
+        self.assertEqual( len(SAMPLE_JOB_INPUT), len(job_inputs) )
+        self.assertEqual( 1024, header.num_processors )
+
+    def test_load_table_fills_header(self):
+        header = workload_parser.WorkloadHeader()
+        table = workload_table.load_table(self.HEADER + SAMPLE_JOB_INPUT, chunk_size=4, header=header)
+        self.assertEqual( 1024, header.num_processors )
+        self.assertEqual( [], workload_table.header_mismatches(header, table) )
+        self.assertEqual(
+            list(workload_table.load_table(SAMPLE_JOB_INPUT).submit_time),
+            list(table.submit_time),
+        )
+
+    def test_load_table_wrong_num_records(self):
+        for num_records in (3, 1000):
+            header = workload_parser.WorkloadHeader()
+            table = workload_table.load_table(["; MaxJobs: %d" % num_records] + SAMPLE_JOB_INPUT, chunk_size=4, header=header)
+            self.assertEqual( len(SAMPLE_JOB_INPUT), len(table) )
+            self.assertEqual( len(SAMPLE_JOB_INPUT), len(table.number) )
+            self.assertEqual( 1, len(workload_table.header_mismatches(header, table)) )
+
+    def test_too_many_processors_mismatch(self):
+        header = workload_parser.WorkloadHeader()
+        table = workload_table.load_table(["; MaxProcs: 16"] + SAMPLE_JOB_INPUT, header=header)
+        mismatches = workload_table.header_mismatches(header, table)
+        self.assertEqual( 2, len(mismatches) )
+        self.failUnless( "allocated processors" in mismatches[0] )
+
+    def test_cached_header(self):
+        import tempfile, shutil
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, "input.swf")
+            input_file = open(file_name, "w")
+            input_file.write("\n".join(self.HEADER + SAMPLE_JOB_INPUT) + "\n")
+            input_file.close()
+
+            workload_cache.load_cached_table(file_name)
+            header = workload_parser.WorkloadHeader()
+            cached = workload_cache.read_cache(workload_cache.cache_file_name(file_name), file_name, workload_header=header)
+            self.failIf( cached is None )
+            self.assertEqual( self.HEADER, header.lines )
+            self.assertEqual( 1024, header.num_processors )
+        finally:
+            shutil.rmtree(directory)
+
+class test_load_table_parallel(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.lines = ["; MaxProcs: 1024"] + SAMPLE_JOB_INPUT * 10
+        self.lines.insert(50, "; a comment in the middle")
+        self.lines.insert(70, "")
+        self.file_name = os.path.join(self.directory, "input.swf")
+        input_file = open(self.file_name, "w")
+        input_file.write("\n".join(self.lines) + "\n")
+        input_file.close()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _assert_same_table(self, table1, table2):
+        self.assertEqual( table1.fields, table2.fields )
+        self.assertEqual( len(table1), len(table2) )
+        for name in table1.fields:
+            self.assertEqual( list(getattr(table1, name)), list(getattr(table2, name)) )
+
+    def test_split_offsets_at_line_starts(self):
+        text = open(self.file_name).read()
+        for num_parts in (1, 2, 7, 100, 10 * len(text)):
+            offsets = workload_table._split_offsets(self.file_name, num_parts)
+            self.assertEqual( 0, offsets[0] )
+            self.assertEqual( len(text), offsets[-1] )
+            self.assertEqual( sorted(set(offsets)), offsets )
+            for offset in offsets[1:-1]:
+                self.assertEqual( "\n", text[offset - 1] )
+
+    def test_same_as_sequential(self):
+        for num_processes in (1, 2, 3):
+            header = workload_parser.WorkloadHeader()
+            table = workload_table.load_table_parallel(self.file_name, num_processes=num_processes, header=header)
+            self._assert_same_table( workload_table.load_table(self.lines), table )
+            self.assertEqual( 1024, header.num_processors )
+            self.assertEqual( ["; MaxProcs: 1024", "; a comment in the middle"], header.lines )
+
+    def test_jobs_same_as_parse_lines(self):
+        attributes = ("id", "submit_time", "user_estimated_run_time", "actual_run_time", "num_required_processors", "user_id")
+        table = workload_table.load_table_parallel(self.file_name, workload_table.JOB_FIELDS, num_processes=2)
+        self.assertEqual(
+            [tuple(getattr(job, name) for name in attributes)
+                for job in prototype._job_inputs_to_jobs(workload_parser.parse_lines(self.file_name), 100)],
+            [tuple(getattr(job, name) for name in attributes) for job in table.jobs(100)],
+        )
+
+    def test_compressed_file_loaded_sequentially(self):
+        import gzip
+        file_name = self.file_name + ".gz"
+        output_file = gzip.open(file_name, "wb")
+        output_file.write(open(self.file_name).read())
+        output_file.close()
+        self._assert_same_table(
+            workload_table.load_table(self.lines),
+            workload_table.load_table_parallel(file_name, num_processes=2),
+        )
+
+class test_workload_index(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "input.swf")
+        self.lines = ["; MaxProcs: 1024", "; UnixStartTime: 1000000"] + SAMPLE_JOB_INPUT
+        self._write_input(self.lines)
+        self.table = workload_table.load_table(SAMPLE_JOB_INPUT)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _write_input(self, lines):
+        input_file = open(self.file_name, "w")
+        input_file.write("\n".join(lines) + "\n")
+        input_file.close()
+
+    def _expected_window(self, start_time, end_time, max_jobs=None):
+        result = [
+            (n, s - (start_time or 0)) for (n, s) in zip(self.table.number, self.table.submit_time)
+            if (start_time is None or s >= start_time) and (end_time is None or s < end_time)
+        ]
+        return result[:max_jobs]
+
+    def _window(self, input, start_time, end_time, max_jobs=None):
+        table = workload_index.load_window(input, start_time=start_time, end_time=end_time, max_jobs=max_jobs)
+        return zip(table.number, table.submit_time)
+
+    def test_index_offsets_at_job_lines(self):
+        text = open(self.file_name).read()
+        index = workload_index.build_index(self.file_name, 4)
+        self.assertEqual( 4, len(index) ) # 15 jobs
+        self.assertEqual( [5, 9, 13, 17], [int(text[offset:].split()[0]) for offset in index.offsets] )
+        self.assertEqual( [4009, 4684, 6063, 7071], list(index.min_submit_times) )
+        self.assertEqual( [4393, 5999, 6955, 7307], list(index.max_submit_times) )
+
+    def test_time_window_offsets(self):
+        index = workload_index.build_index(self.file_name, 4)
+        self.assertEqual( (index.offsets[0], index.file_size), index.time_window_offsets() )
+        self.assertEqual( (index.offsets[1], index.offsets[2]), index.time_window_offsets(4500, 6000) )
+        self.assertEqual( (index.offsets[2], index.offsets[3]), index.time_window_offsets(6000, 7000) )
+        self.assertEqual( (index.file_size, index.file_size), index.time_window_offsets(8000, None) )
+
+    def test_job_offset(self):
+        index = workload_index.build_index(self.file_name, 4)
+        self.assertEqual( index.offsets[0], index.job_offset(5) )
+        self.assertEqual( index.offsets[2], index.job_offset(13) )
+        self.assertEqual( index.offsets[2], index.job_offset(16) )
+
+    def test_index_file(self):
+        index = workload_index.load_index(self.file_name, 4)
+        index_file_name = workload_index.index_file_name(self.file_name)
+        self.failUnless( os.path.exists(index_file_name) )
+        cached = workload_index.read_index(index_file_name, self.file_name)
+        for name in workload_index.WorkloadIndex.COLUMNS:
+            self.assertEqual( list(getattr(index, name)), list(getattr(cached, name)) )
+
+        self._write_input(self.lines[:-1])
+        self.assertEqual( None, workload_index.read_index(index_file_name, self.file_name) )
+
+    def test_load_window(self):
+        for start_time, end_time in [(None, None), (4500, 6000), (6000, 7000), (4000, None), (None, 4400), (9000, None)]:
+            self.assertEqual(
+                self._expected_window(start_time, end_time),
+                self._window(self.file_name, start_time, end_time),
+            )
+
+    def test_load_window_unsorted(self):
+        lines = SAMPLE_JOB_INPUT[:]
+        lines.reverse()
+        self._write_input(lines)
+        workload_index.load_index(self.file_name, 2)
+        self.assertEqual(
+            sorted(self._expected_window(4500, 6000)),
+            sorted(self._window(self.file_name, 4500, 6000)),
+        )
+
+    def test_load_window_max_jobs(self):
+        self.assertEqual( self._expected_window(4500, None, 3), self._window(self.file_name, 4500, None, 3) )
+        self.assertEqual( self._expected_window(None, None, 3), self._window(self.file_name, None, None, 3) )
+
+    def test_load_window_of_lines(self):
+        self.assertEqual( self._expected_window(4500, 6000), self._window(self.lines, 4500, 6000) )
+
+    def test_load_window_of_compressed_file(self):
+        import gzip
+        file_name = self.file_name + ".gz"
+        output_file = gzip.open(file_name, "wb")
+        output_file.write(open(self.file_name).read())
+        output_file.close()
+        self.assertEqual( self._expected_window(4500, 6000), self._window(file_name, 4500, 6000) )
+        self.failIf( os.path.exists(workload_index.index_file_name(file_name)) )
+
+    def test_load_window_header(self):
+        header = workload_parser.WorkloadHeader()
+        workload_index.load_window(self.file_name, start_time=6000, header=header)
+        self.assertEqual( 1024, header.num_processors )
+        self.assertEqual( 1006000, header.unix_start_time )
+        self.assertEqual( self.lines[:2], header.lines )
+
+class test_workload_transform(TestCase):
+    def setUp(self):
+        self.table = workload_table.load_table(SAMPLE_JOB_INPUT)
+
+    def test_scale_load(self):
+        scaled = workload_transform.scale_load(self.table, 2)
+        self.assertEqual(
+            [4009 + (s - 4009) // 2 for s in self.table.submit_time],
+            list(scaled.submit_time),
+        )
+        self.assertEqual( list(self.table.run_time), list(scaled.run_time) )
+
+    def test_scale_load_doesnt_change_original(self):
+        submit_times = list(self.table.submit_time)
+        workload_transform.scale_load(self.table, 3)
+        self.assertEqual( submit_times, list(self.table.submit_time) )
+
+    def test_unchanged_columns_shared(self):
+        scaled = workload_transform.scale_load(self.table, 2)
+        self.failUnless( scaled.run_time is self.table.run_time )
+
+    def test_scale_processors(self):
+        scaled = workload_transform.scale_processors(self.table, 512, 128)
+        self.assertEqual(
+            [max(1, n // 4) for n in self.table.num_allocated_processors],
+            list(scaled.num_allocated_processors),
+        )
+        self.assertEqual( list(scaled.num_allocated_processors), list(scaled.num_requested_processors) )
+
+    def test_scale_processors_bounds(self):
+        table = workload_table.load_table(["1 0 0 10 -1 -1 -1 3 10 -1 1 1 -1 -1 -1 -1 -1 -1", "2 0 0 10 100 -1 -1 100 10 -1 1 1 -1 -1 -1 -1 -1 -1"])
+        scaled = workload_transform.scale_processors(table, 100, 10)
+        self.assertEqual( [-1, 10], list(scaled.num_allocated_processors) )
+        self.assertEqual( [1, 10], list(scaled.num_requested_processors) )
+
+    def test_shift_time_and_users(self):
+        table = workload_transform.transform(self.table, time_shift=100, user_shift=1000)
+        self.assertEqual( [s + 100 for s in self.table.submit_time], list(table.submit_time) )
+        self.assertEqual( [u + 1000 for u in self.table.user_id], list(table.user_id) )
+
+    def test_transform_nothing(self):
+        self.failUnless( workload_transform.transform(self.table, load_factor=1) is self.table )
+
+    def test_job_fields_only(self):
+        table = workload_table.load_table(SAMPLE_JOB_INPUT, workload_table.JOB_FIELDS)
+        transformed = workload_transform.transform(table, 1.5, 1024, 256)
+        self.assertEqual( len(table), len(list(transformed.jobs(256))) )
+
+class test_workload_merge(TestCase):
+    def _job_inputs(self, lines):
+        return list(workload_parser.parse_lines(lines))
+
+    def test_merged_by_submit_time(self):
+        inputs = [SAMPLE_JOB_INPUT[0::3], SAMPLE_JOB_INPUT[1::3], SAMPLE_JOB_INPUT[2::3]]
+        merged = list(workload_merge.merge_job_inputs([workload_parser.parse_lines(lines) for lines in inputs]))
+        self.assertEqual(
+            [job_input.submit_time for job_input in self._job_inputs(SAMPLE_JOB_INPUT)],
+            [job_input.submit_time for job_input in merged],
+        )
+
+    def test_renumbered_unique(self):
+        inputs = [SAMPLE_JOB_INPUT, SAMPLE_JOB_INPUT, SAMPLE_JOB_INPUT[:3]]
+        merged = list(workload_merge.merge_job_inputs([workload_parser.parse_lines(lines) for lines in inputs]))
+        numbers = [job_input.number for job_input in merged]
+        self.assertEqual( 2 * len(SAMPLE_JOB_INPUT) + 3, len(set(numbers)) )
+        self.assertEqual( [13, 14, 15], numbers[:3] ) # job 5 of each input
+
+    def test_same_time_in_input_order(self):
+        merged = list(workload_merge.merge_job_inputs([
+            workload_parser.parse_lines(["1 10 0 1 1 -1 -1 1 1 -1 1 1 -1 -1 -1 -1 -1 -1"]),
+            workload_parser.parse_lines(["1 10 0 1 1 -1 -1 1 1 -1 1 2 -1 -1 -1 -1 -1 -1"]),
+        ]))
+        self.assertEqual( [1, 2], [job_input.user_id for job_input in merged] )
+
+    def test_single_input_not_renumbered(self):
+        merged = list(workload_merge.merge_job_inputs([workload_parser.parse_lines(SAMPLE_JOB_INPUT)]))
+        self.assertEqual( range(5, 20), [job_input.number for job_input in merged] )
+
+    def test_preceding_job_renumbered(self):
+        merged = list(workload_merge.merge_job_inputs([
+            workload_parser.parse_lines(["1 10 0 1 1 -1 -1 1 1 -1 1 1 -1 -1 -1 -1 -1 -1"]),
+            workload_parser.parse_lines(["1 10 0 1 1 -1 -1 1 1 -1 1 1 -1 -1 -1 -1 -1 -1", "2 20 0 1 1 -1 -1 1 1 -1 1 1 -1 -1 -1 -1 1 5"]),
+        ]))
+        self.assertEqual( [1, 2, 4], [job_input.number for job_input in merged] )
+        self.assertEqual( 2, merged[2].preceding_job_number )
+
+    def test_streaming(self):
+        consumed = []
+        def job_inputs(lines):
+            for job_input in workload_parser.parse_lines(lines):
+                consumed.append(job_input.number)
+                yield job_input
+        merged = workload_merge.merge_job_inputs([job_inputs(SAMPLE_JOB_INPUT[:5]), job_inputs(SAMPLE_JOB_INPUT[5:])])
+        merged.next()
+        self.assertEqual( [5, 10], consumed ) # one job of each input
+        merged.next()
+        self.assertEqual( [5, 10, 6], consumed )
+
+class _Counter(object):
+    "an event handler object, for pickling bound methods"
+    def __init__(self):
+        self.count = 0
+    def handle(self, event):
+        self.count += 1
+
+class test_checkpoint(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "checkpoint")
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def test_save_load(self):
+        queue = EventQueue()
+        counter = _Counter()
+        queue.add_handler(prototype.JobSubmissionEvent, counter.handle)
+        for timestamp in (3, 1, 2):
+            queue.add_event(prototype.JobSubmissionEvent(timestamp, None))
+        queue.advance()
+        checkpoint.save_checkpoint(self.file_name, (queue, counter), "context")
+        last_counter = prototype.JobEvent.global_event_counter
+        prototype.JobEvent(0, None)
+
+        (queue, counter), context = checkpoint.load_checkpoint(self.file_name)
+        self.assertEqual( "context", context )
+        self.assertEqual( last_counter, prototype.JobEvent.global_event_counter )
+        self.assertEqual( [2, 3], [event.timestamp for event in queue.sorted_events] )
+        while not queue.is_empty:
+            queue.advance()
+        self.assertEqual( 3, counter.count ) # the handler is the loaded counter's method
+        self.failIf( os.path.exists(self.file_name + ".tmp") )
+
+    def test_swf_writer(self):
+        output_name = os.path.join(self.directory, "output.swf")
+        writer = swf_writer.SwfWriter(open(output_name, "w"))
+        writer.write_line("first")
+        checkpoint.save_checkpoint(self.file_name, writer)
+        writer.write_line("after the checkpoint")
+        writer.close()
+
+        writer, context = checkpoint.load_checkpoint(self.file_name)
+        writer.write_line("second")
+        writer.close()
+        self.assertEqual( "first\nsecond\n", open(output_name).read() )
+
+    def test_checkpointer_interval(self):
+        checkpointer = checkpoint.Checkpointer(self.file_name, interval=2)
+        checkpointer.event_handled("one")
+        self.failIf( os.path.exists(self.file_name) )
+        checkpointer.event_handled("two")
+        self.assertEqual( ("two", None), checkpoint.load_checkpoint(self.file_name) )
+
+    def test_checkpointer_signal(self):
+        import signal
+        previous_handler = signal.getsignal(signal.SIGUSR1)
+        try:
+            checkpointer = checkpoint.Checkpointer(self.file_name, signal_number=signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            checkpointer.event_handled("state")
+            self.assertEqual( ("state", None), checkpoint.load_checkpoint(self.file_name) )
+        finally:
+            signal.signal(signal.SIGUSR1, previous_handler)
+
+class test_ReadAhead(TestCase):
+    def test_same_items(self):
+        self.assertEqual( range(100), list(read_ahead.ReadAhead(xrange(100), batch_size=7, max_batches=2)) )
+        self.assertEqual( [], list(read_ahead.ReadAhead([])) )
+
+    def test_process(self):
+        self.assertEqual( range(100), list(read_ahead.ReadAhead(xrange(100), batch_size=7, use_process=True)) )
+
+    def test_bounded(self):
+        produced = []
+        def items():
+            for i in xrange(100):
+                produced.append(i)
+                yield i
+        items_read_ahead = read_ahead.ReadAhead(items(), batch_size=1, max_batches=2)
+        self.assertEqual( 0, items_read_ahead.next() )
+        import time
+        time.sleep(0.1)
+        # the consumer's batch, the queued ones and the one waiting to be put
+        self.failUnless( len(produced) <= 4 )
+        items_read_ahead.close()
+        self.assertEqual( [], list(items_read_ahead) )
+
+    def test_exception_reraised(self):
+        def items():
+            yield 1
+            raise ValueError("bad line")
+        items_read_ahead = read_ahead.ReadAhead(items())
+        self.assertEqual( 1, items_read_ahead.next() )
+        self.assertRaises( ValueError, items_read_ahead.next )
+        self.assertRaises( StopIteration, items_read_ahead.next )
+
+    def test_exception_in_process(self):
+        def items():
+            raise ValueError("bad line")
+            yield 1
+        self.assertRaises( read_ahead.ReadAheadError, list, read_ahead.ReadAhead(items(), use_process=True) )
+
+    def test_table_chunks(self):
+        tables = read_ahead.ReadAhead(workload_table.load_table_chunks(SAMPLE_JOB_INPUT, chunk_size=4), use_process=True)
+        jobs = list(workload_table.jobs_of_tables(tables, 100))
+        self.assertEqual( range(5, 20), [job.id for job in jobs] )
+        self.assertEqual(
+            [job.submit_time for job in workload_table.load_table(SAMPLE_JOB_INPUT).jobs(100)],
+            [job.submit_time for job in jobs],
+        )
+
+class test_workload_dependencies(TestCase):
+    def _table(self, lines):
+        return workload_table.load_table(lines, workload_table.JOB_FIELDS + workload_dependencies.DEPENDENCY_FIELDS)
+
+    def test_table_dependencies(self):
+        dependencies = workload_dependencies.table_dependencies(self._table([
+            "1 0 0 10 1 -1 -1 1 10 -1 1 1 -1 -1 -1 -1 -1 -1",
+            "2 0 0 10 1 -1 -1 1 10 -1 1 1 -1 -1 -1 -1  1 30",
+            "3 0 0 10 1 -1 -1 1 10 -1 1 1 -1 -1 -1 -1  1 -1",
+            "4 0 0 10 1 -1 -1 1 10 -1 1 1 -1 -1 -1 -1  5 10", # later job
+            "5 0 0 10 1 -1 -1 1 10 -1 1 1 -1 -1 -1 -1  0 10", # missing job
+        ]))
+        self.assertEqual( 2, len(dependencies) )
+        self.failUnless( dependencies.is_dependent(2) )
+        self.failIf( dependencies.is_dependent(1) )
+        self.failIf( dependencies.is_dependent(4) )
+        self.assertEqual( [(2, 30), (3, 0)], dependencies.release(1) )
+        self.assertEqual( [], dependencies.release(1) )
+
+    def test_no_dependencies(self):
+        self.assertEqual( 0, len(workload_dependencies.table_dependencies(self._table(SAMPLE_JOB_INPUT))) )
+
+class test_workload_profile(TestCase):
+    def test_log2_bin(self):
+        self.assertEqual( [1, 1, 2, 4, 4, 8, 2**29, 2**30], map(workload_profile.log2_bin, [0, 1, 2, 3, 4, 4.5, 2**29, 2**29 + 1]) )
+
+    def test_log2_histogram(self):
+        self.assertEqual( {1: 2, 4: 2, 32: 1}, workload_profile.log2_histogram([1, 1, 3, 4, 17]) )
+
+    def test_profile(self):
+        table = workload_table.load_table([
+            "1   0 0 100 10 -1 -1 10 100 -1 1 1 -1 -1 -1 -1 -1 -1",
+            "2   0 0 100 10 -1 -1 10 400 -1 1 1 -1 -1 -1 -1 -1 -1",
+            "3 200 0 100  5 -1 -1  5 100 -1 1 1 -1 -1 -1 -1 -1 -1",
+        ], workload_table.JOB_FIELDS)
+        profile = workload_profile.WorkloadProfile(table, 10)
+        self.assertEqual( 3, profile.num_jobs )
+        self.assertEqual( 9, profile.num_events )
+        self.assertEqual( 200, profile.duration )
+        self.assertEqual( 2500.0 / 2000, profile.offered_load )
+        self.assertEqual( {8: 1, 16: 2}, profile.size_histogram )
+        self.assertEqual( {1: 2, 4: 1}, profile.estimate_histogram )
+        # the second job waits for the first, the third job finds the machine free
+        self.assertEqual( 100.0 / 3, profile.mean_wait )
+        self.assertEqual( 0.5, profile.mean_queue_depth )
+        self.assertEqual( 2, profile.num_long_jobs ) # the ones that run as estimated
+        self.assertEqual( 9, profile.estimated_cost("FcfsScheduler") )
+        self.assertEqual( 9 * 1.5, profile.estimated_cost("EasyBackfillScheduler") )
+        self.assertEqual( 3 * (3 + 0.5 + 0.5 * 1.5), profile.estimated_cost("ConservativeScheduler") )
+        self.assertEqual( 9 * 1.5 + 2, profile.estimated_cost("EasyPlusPlusScheduler") )
+        self.failUnless( "offered load: 1.250" in profile.report_lines() )
+        self.failUnless( "estimated cost with FcfsScheduler: 9" in profile.report_lines(["FcfsScheduler"]) )
+
+    def test_empty(self):
+        profile = workload_profile.WorkloadProfile(workload_table.load_table([], workload_table.JOB_FIELDS), 10)
+        self.assertEqual( 0, profile.estimated_cost("ConservativeScheduler") )
+        self.assertEqual( None, profile.offered_load )
+
+    def _profile(self, num_jobs, interval, run_time):
+        "a profile of num_jobs jobs of the whole machine, submitted every interval, that run as estimated"
+        line = "%d %d 0 %d 10 -1 -1 10 %d -1 1 1 -1 -1 -1 -1 -1 -1"
+        return workload_profile.WorkloadProfile(workload_table.load_table([
+            line % (i + 1, i * interval, run_time, run_time) for i in range(num_jobs)
+        ], workload_table.JOB_FIELDS), 10)
+
+    def test_prediction_events(self):
+        profile = self._profile(4, 100, 10)
+        self.assertEqual( 4, profile.num_long_jobs )
+        self.assertEqual( 12, profile.num_scheduler_events("EasyBackfillScheduler") )
+        self.assertEqual( 16, profile.num_scheduler_events("ShrinkingEasyScheduler") )
+        self.assertEqual( 16, profile.estimated_cost("EasyPlusPlusScheduler") )
+
+    def test_scheduler_classes(self):
+        class EasyBackfillScheduler(object):
+            handled_event_types = (prototype.JobSubmissionEvent, prototype.JobTerminationEvent)
+        class PredictingScheduler(EasyBackfillScheduler):
+            handled_event_types = EasyBackfillScheduler.handled_event_types + (prototype.JobPredictionIsOverEvent,)
+        self.assertEqual( (workload_profile.BACKFILL_SCAN, False), workload_profile.scheduler_cost_model(EasyBackfillScheduler) )
+        self.assertEqual( (workload_profile.BACKFILL_SCAN, True), workload_profile.scheduler_cost_model(PredictingScheduler) )
+        self.assertEqual( (workload_profile.BACKFILL_SCAN, True), workload_profile.scheduler_cost_model(PredictingScheduler()) )
+        self.assertRaises( ValueError, workload_profile.scheduler_cost_model, object )
+        self.assertRaises( ValueError, workload_profile.scheduler_cost_model, "NoSuchScheduler" )
+
+    def test_longest_first(self):
+        many_short_jobs = self._profile(20, 100, 10) # nothing waits
+        few_long_jobs = self._profile(6, 100, 1000) # every job waits
+        self.assertEqual(
+            [("many", "FcfsScheduler"), ("few", "FcfsScheduler")],
+            workload_profile.longest_first([("few", few_long_jobs), ("many", many_short_jobs)], ["FcfsScheduler"])
+        )
+        self.assertEqual(
+            [("few", "ConservativeScheduler"), ("many", "ConservativeScheduler")],
+            workload_profile.longest_first([("few", few_long_jobs), ("many", many_short_jobs)], ["ConservativeScheduler"])
+        )
+        self.assertEqual(
+            [("few", "ConservativeScheduler"), ("many", "FcfsScheduler"), ("many", "ConservativeScheduler"), ("few", "FcfsScheduler")],
+            workload_profile.longest_first([("few", few_long_jobs), ("many", many_short_jobs)], ["FcfsScheduler", "ConservativeScheduler"])
+        )
+
+class test_SwfWriter(TestCase):
+    def test_format_number(self):
+        self.assertEqual( "-1", swf_writer.format_number(-1) )
+        self.assertEqual( "3039", swf_writer.format_number(3039.0) )
+        self.assertEqual( "476.50", swf_writer.format_number(476.5) )
+
+    def test_format_fields(self):
+        self.assertEqual( " ".join(["1"] * 18), swf_writer.format_fields([1] * 18) )
+
+    def _written_table(self, table, buffer_size):
+        from StringIO import StringIO
+        output_file = StringIO()
+        writer = swf_writer.SwfWriter(output_file, buffer_size)
+        writer.write_header(["; MaxProcs: 1024", "a comment"])
+        writer.write_table(table)
+        writer.flush()
+        self.assertEqual( len(table), writer.num_jobs )
+        header = workload_parser.WorkloadHeader()
+        result = workload_table.load_table(output_file.getvalue().splitlines(), header=header)
+        self.assertEqual( ["; MaxProcs: 1024", "; a comment"], header.lines )
+        return result
+
+    def test_write_table(self):
+        table = workload_table.load_table(SAMPLE_JOB_INPUT)
+        for buffer_size in (1, 4, 1000):
+            written = self._written_table(table, buffer_size)
+            for name in workload_table.FIELD_NAMES:
+                self.assertEqual( list(getattr(table, name)), list(getattr(written, name)) )
+
+    def test_buffered(self):
+        from StringIO import StringIO
+        output_file = StringIO()
+        writer = swf_writer.SwfWriter(output_file, 3)
+        writer.write_fields([1] * 18)
+        writer.write_fields([2] * 18)
+        self.assertEqual( "", output_file.getvalue() )
+        writer.write_fields([3] * 18)
+        self.assertEqual( 3, len(output_file.getvalue().splitlines()) )
+
+    def test_write_job(self):
+        from StringIO import StringIO
+        job = prototype.Job(id=7, user_estimated_run_time=300, actual_run_time=120, num_required_processors=16, submit_time=1000, user_id=3)
+        job.start_to_run_at_time = 1250
+        output_file = StringIO()
+        writer = swf_writer.SwfWriter(output_file)
+        writer.write_job(job)
+        writer.flush()
+        self.assertEqual( 1, writer.num_jobs )
+        table = workload_table.load_table(output_file.getvalue().splitlines())
+        self.assertEqual( [7, 1000, 250, 120.0, 16, 16, 300, 1, 3], [
+            getattr(table, name)[0] for name in ("number", "submit_time", "wait_time", "run_time",
+                "num_allocated_processors", "num_requested_processors", "requested_time", "status", "user_id")
+        ])
+
+class test_filter(TestCase):
+    LINES = SAMPLE_JOB_INPUT + [
+        "20 -5 0 100 4 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # negative submit time
+        "21 10 0 0 4 -1 -1 -1 200 -1 5 1 -1 -1 -1 -1 -1 -1", # cancelled, never ran
+        "22 10 0 100 -1 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # no processors
+        "23 10 0 100 2048 -1 -1 -1 200 -1 1 1 -1 -1 -1 -1 -1 -1", # too many processors
+        "24 10 0 100 -1 -1 -1 4 200 -1 1 1 -1 -1 -1 -1 -1 -1", # only requested processors
+        "25 10 0 7.5 4 -1 -1 -1 -1 -1 1 1 -1 -1 -1 -1 -1 -1", # no requested time
+        "26 10 0 100 -1 -1 -1 2048 200 -1 1 1 -1 -1 -1 -1 -1 -1", # too many requested processors
+    ]
+
+    def setUp(self):
+        self.table = workload_table.load_table(self.LINES, raw=True)
+        self.cleaned, self.counts = filter.sanitize(self.table, 1024)
+
+    def test_counts(self):
+        self.assertEqual( {
+                "negative submit time"          : 1,
+                "no run time"                   : 1,
+                "no processors"                 : 1,
+                "too many processors"           : 2, # jobs 23, 26
+                "missing requested processors"  : 1, # job 25
+                "missing allocated processors"  : 1,
+                "missing requested time"        : 1,
+                "run time over requested time"  : 3, # jobs 6, 7, 11
+            },
+            self.counts,
+        )
+
+    def test_dropped(self):
+        self.assertEqual( range(5, 20) + [24, 25], list(self.cleaned.number) )
+
+    def test_modified(self):
+        self.assertEqual( 4, self.cleaned.num_allocated_processors[-2] )
+        self.assertEqual( 4, self.cleaned.num_requested_processors[-1] ) # job 25's -1
+        self.assertEqual( -1, self.table.num_requested_processors[-2] ) # job 25, loaded raw
+        self.assertEqual( 8, self.cleaned.requested_time[-1] )
+        self.assertEqual( 21600, self.cleaned.run_time[6] )
+        self.assertEqual( 21600, list(self.cleaned.jobs(1024))[6].user_estimated_run_time )
+
+    def test_no_machine_size(self):
+        cleaned, counts = filter.sanitize(self.table)
+        self.assertEqual( 0, counts["too many processors"] )
+        self.failUnless( 23 in cleaned.number )
+        self.assertEqual( 2048, cleaned.num_allocated_processors[-1] ) # job 26's, from the requested number
+
+    def test_jobs_unchanged(self):
+        # but jobs that ran longer than requested are now estimated at the requested time
+        attributes = ("id", "submit_time", "actual_run_time", "num_required_processors", "user_id")
+        self.assertEqual(
+            [tuple(getattr(job, name) for name in attributes)
+                for job in prototype._job_inputs_to_jobs(workload_parser.parse_lines(SAMPLE_JOB_INPUT), 1024)],
+            [tuple(getattr(job, name) for name in attributes) for job in self.cleaned.jobs(1024)][:len(SAMPLE_JOB_INPUT)],
+        )
+
+    def test_header_lines(self):
+        header = workload_parser.WorkloadHeader()
+        for line in ["; MaxJobs: 100", "; MaxRecords: 100", ";  MaxProcs: 1024"]:
+            header.add_line(line)
+        self.assertEqual(
+            ["; MaxJobs: 17", "; MaxRecords: 17", ";  MaxProcs: 1024"],
+            filter.header_lines(header, len(self.cleaned)),
+        )
+
+class test_WorkloadGenerator(TestCase):
+    def _columns(self, table):
+        return [list(getattr(table, name)) for name in workload_table.FIELD_NAMES]
+
+    def test_same_seed_same_workload(self):
+        table1 = workload_generator.WorkloadGenerator(1024, seed=5).batch(500)
+        table2 = workload_generator.WorkloadGenerator(1024, seed=5).batch(500)
+        self.assertEqual( self._columns(table1), self._columns(table2) )
+
+    def test_different_seed_different_workload(self):
+        table1 = workload_generator.WorkloadGenerator(1024, seed=5).batch(500)
+        table2 = workload_generator.WorkloadGenerator(1024, seed=6).batch(500)
+        self.assertNotEqual( list(table1.run_time), list(table2.run_time) )
+
+    def test_batch_size_doesnt_matter(self):
+        table = workload_generator.WorkloadGenerator(1024, seed=5).batch(500)
+        tables = list(workload_generator.WorkloadGenerator(1024, seed=5).batches(500, 7))
+        self.assertEqual( 72, len(tables) )
+        for name in workload_table.FIELD_NAMES:
+            self.assertEqual(
+                list(getattr(table, name)),
+                sum([list(getattr(t, name)) for t in tables], []),
+            )
+
+    def test_valid_jobs(self):
+        generator = workload_generator.WorkloadGenerator(1000, seed=1)
+        table = generator.batch(2000)
+        self.assertEqual( range(1, 2001), list(table.number) )
+        self.assertEqual( sorted(table.submit_time), list(table.submit_time) )
+        for size, run_time, estimate in zip(table.num_allocated_processors, table.run_time, table.requested_time):
+            self.failUnless( 1 <= size <= 1000 )
+            self.failUnless( 1 <= run_time <= estimate <= generator.max_run_time )
+        cleaned, counts = filter.sanitize(table, 1000)
+        self.assertEqual( 0, sum(counts.values()) )
+
+    def test_power_of_two_emphasis(self):
+        table = workload_generator.WorkloadGenerator(1024, seed=1).batch(2000)
+        powers_of_two = [size for size in table.num_allocated_processors if size & (size - 1) == 0]
+        self.failUnless( len(powers_of_two) > 0.7 * len(table) )
+
+    def test_jobs(self):
+        jobs = list(workload_generator.WorkloadGenerator(64, seed=2).jobs(30, batch_size=8))
+        table = workload_generator.WorkloadGenerator(64, seed=2).batch(30)
+        self.assertEqual( list(table.number), [job.id for job in jobs] )
+        self.assertEqual( list(table.requested_time), [job.user_estimated_run_time for job in jobs] )
+
+    def test_write_swf(self):
+        from StringIO import StringIO
+        output_file = StringIO()
+        workload_generator.WorkloadGenerator(64, seed=2).write_swf(output_file, 30, batch_size=8)
+        header = workload_parser.WorkloadHeader()
+        written = workload_table.load_table(output_file.getvalue().splitlines(), header=header)
+        self.assertEqual( 64, header.num_processors )
+        self.assertEqual( 30, header.num_records )
+        self.assertEqual(
+            self._columns(workload_generator.WorkloadGenerator(64, seed=2).batch(30)),
+            self._columns(written),
+        )
+
 class test_simple_job_generator(TestCase):
     def test_unique_id(self):
         previously_seen = set()
@@ -326,6 +1508,22 @@ class test_ValidatingMachine(TestCase):
         self.machine._add_job(job, current_timestamp=0)
         assert job in self.machine.jobs
 
+    def test_add_job_prediction_event_unhandled(self):
+        job = self._unique_job()
+        job.predicted_run_time = 30
+        self.machine._add_job(job, current_timestamp=0)
+        self.assertEqual( [prototype.JobTerminationEvent], [type(event) for event in self.event_queue.sorted_events] )
+
+    def test_add_job_prediction_event_handled(self):
+        self.event_queue.add_handler(prototype.JobPredictionIsOverEvent, _create_handler())
+        job = self._unique_job()
+        job.predicted_run_time = 30
+        self.machine._add_job(job, current_timestamp=0)
+        self.assertEqual(
+            [prototype.JobPredictionIsOverEvent(30, job), prototype.JobTerminationEvent(60, job)],
+            self.event_queue.sorted_events,
+        )
+
     def test_add_several_jobs_success(self):
         for i in xrange(5):
             self.machine._add_job( self._unique_job(num_required_processors=5), current_timestamp=0 )
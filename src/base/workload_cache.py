@@ -0,0 +1,206 @@
+#! /usr/bin/env python2.4
+
+# A binary sidecar cache for parsed workloads.
+#
+# The first time a workload file is loaded its JobTable columns are written
+# next to it (<input file>.cache): a fixed size header followed by the raw
+# bytes of every column. Later loads map the cache file and copy the columns
+# straight into arrays (array.fromstring on the mapping), skipping the text
+# parsing. Simulations running in parallel on the same trace share the file's
+# pages in the page cache, but each has its own copy of the columns: the copy
+# is deliberate, python 2 has no typed view of a buffer, so a column that
+# stayed in the mapping would unpack every element it's asked for in python,
+# and JobTable users index and iterate the columns all the time.
+#
+# The header records the size, mtime and md5 of the source file; a cache whose
+# source changed is ignored and rewritten, and one whose source was only
+# touched gets the new mtime, so it isn't hashed again. The columns are stored
+# before the _job_input_to_job clamping, so one cache serves every
+# --num-processors.
+# The SWF header comments are stored after the columns.
+
+import os
+import sys
+import mmap
+import struct
+import warnings
+from array import array
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5 # python2.4
+
+from workload_parser import WorkloadHeader
+from workload_table import JobTable, FIELDS, FIELD_NAMES, load_table_parallel
+
+CACHE_SUFFIX = ".cache"
+
+MAGIC = "PYSSJTBL"
+VERSION = 2
+
+# magic, version, byte order, sizeof(long), fields bitmask, no. of jobs,
+# source size, source mtime, source md5, size of the SWF header comments
+HEADER_FORMAT = "=8sIBBIQQd16sI"
+HEADER_SIZE = (struct.calcsize(HEADER_FORMAT) + 7) // 8 * 8 # keep the columns aligned
+
+_BYTE_ORDERS = {"little": 1, "big": 2}
+
+# the offset and format of the source mtime in the header, see _update_mtime()
+_MTIME_OFFSET = struct.calcsize("=8sIBBIQQ")
+_MTIME_FORMAT = "=d"
+
+def cache_file_name(input_file_name):
+    return input_file_name + CACHE_SUFFIX
+
+def _fields_mask(fields):
+    mask = 0
+    for index, name in enumerate(FIELD_NAMES):
+        if name in fields:
+            mask |= 1 << index
+    return mask
+
+def _mask_fields(mask):
+    return tuple(name for index, name in enumerate(FIELD_NAMES) if mask & (1 << index))
+
+def _file_md5(file_name, block_size=1<<20):
+    digest = md5()
+    input_file = open(file_name, "rb")
+    try:
+        while True:
+            block = input_file.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    finally:
+        input_file.close()
+    return digest.digest()
+
+def write_cache(table, cache_name, source_size, source_mtime, source_md5, workload_header=None):
+    if workload_header is not None:
+        header_text = "\n".join(workload_header.lines)
+    else:
+        header_text = ""
+
+    header = struct.pack(HEADER_FORMAT,
+        MAGIC, VERSION, _BYTE_ORDERS[sys.byteorder], array('l').itemsize,
+        _fields_mask(table.fields), len(table), source_size, source_mtime, source_md5,
+        len(header_text),
+    )
+
+    # write to a temporary file and rename, so a concurrent reader never sees
+    # a partially written cache
+    temp_name = "%s.%d.tmp" % (cache_name, os.getpid())
+    output_file = open(temp_name, "wb")
+    try:
+        output_file.write(header.ljust(HEADER_SIZE, "\0"))
+        for name in table.fields:
+            getattr(table, name).tofile(output_file)
+        output_file.write(header_text)
+    finally:
+        output_file.close()
+    os.rename(temp_name, cache_name)
+
+def read_cache(cache_name, source_name, fields=FIELD_NAMES, workload_header=None):
+    """
+    Returns a JobTable with the given fields read from cache_name, or None if
+    the cache is missing, stale, or doesn't have all the given fields.
+
+    If a WorkloadHeader is given the cached SWF header lines are added to it.
+    """
+    try:
+        cache_file = open(cache_name, "rb")
+    except IOError:
+        return None
+
+    try:
+        header = cache_file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            return None
+
+        magic, version, byte_order, long_size, mask, num_jobs, source_size, source_mtime, source_md5, header_size = \
+            struct.unpack(HEADER_FORMAT, header[:struct.calcsize(HEADER_FORMAT)])
+
+        if magic != MAGIC or version != VERSION:
+            return None
+        if byte_order != _BYTE_ORDERS[sys.byteorder] or long_size != array('l').itemsize:
+            return None # written on a different architecture
+
+        cached_fields = _mask_fields(mask)
+        for name in fields:
+            if name not in cached_fields:
+                return None
+
+        stat = os.stat(source_name)
+        if stat.st_size != source_size:
+            return None
+        if stat.st_mtime != source_mtime:
+            if _file_md5(source_name) != source_md5:
+                return None # touched and modified
+            _update_mtime(cache_name, stat.st_mtime) # only touched (or a copy)
+
+        columns = {}
+        offset = HEADER_SIZE
+        mapped = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for name, typecode in FIELDS:
+                if name not in cached_fields:
+                    continue
+                size = num_jobs * array(typecode).itemsize
+                if name in fields:
+                    columns[name] = array(typecode)
+                    columns[name].fromstring(buffer(mapped, offset, size))
+                offset += size
+            header_text = mapped[offset:offset + header_size]
+        finally:
+            mapped.close()
+
+        if workload_header is not None and header_text:
+            for line in header_text.split("\n"):
+                workload_header.add_line(line)
+
+        table = JobTable(fields)
+        table.extend_columns(columns)
+        return table
+    finally:
+        cache_file.close()
+
+def _update_mtime(cache_name, source_mtime):
+    "records the new mtime of a source whose contents didn't change, if the cache is writable"
+    try:
+        cache_file = open(cache_name, "r+b")
+        try:
+            cache_file.seek(_MTIME_OFFSET)
+            cache_file.write(struct.pack(_MTIME_FORMAT, source_mtime))
+        finally:
+            cache_file.close()
+    except (IOError, OSError):
+        pass
+
+def load_cached_table(input_file_name, fields=FIELD_NAMES, workload_header=None, num_processes=1):
+    """
+    Returns the JobTable of the given SWF file, from its cache file if it's up
+    to date, else by parsing the file (in num_processes processes, see
+    load_table_parallel) and (re)writing the cache.
+
+    If a WorkloadHeader is given, the SWF header is added to it.
+    """
+    cache_name = cache_file_name(input_file_name)
+
+    table = read_cache(cache_name, input_file_name, fields, workload_header)
+    if table is not None:
+        return table
+
+    if workload_header is None:
+        workload_header = WorkloadHeader()
+
+    stat = os.stat(input_file_name)
+    source_md5 = _file_md5(input_file_name)
+    table = load_table_parallel(input_file_name, fields, num_processes, workload_header)
+
+    try:
+        write_cache(table, cache_name, stat.st_size, stat.st_mtime, source_md5, workload_header)
+    except (IOError, OSError), e:
+        warnings.warn("can't write workload cache %s: %s" % (cache_name, e))
+
+    return table
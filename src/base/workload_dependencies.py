@@ -0,0 +1,56 @@
+#! /usr/bin/env python2.4
+
+# Dependencies between the jobs of a workload: the preceding job number (SWF
+# field 17) is a job that had to terminate before this one was submitted,
+# and the think time (field 18) is how long after its termination.
+#
+# In a feedback replay a dependent job isn't submitted at its logged time but
+# at its predecessor's simulated termination plus the think time, so a
+# scheduler that delays jobs also delays the jobs the users submit after
+# them. The simulator holds the dependent jobs, and every termination
+# releases the jobs that depend on it through the index below.
+
+from itertools import izip
+
+# the JobTable fields needed by table_dependencies()
+DEPENDENCY_FIELDS = ("preceding_job_number", "think_time_from_preceding_job")
+
+class JobDependencies(object):
+    "the predecessor -> dependents index of a workload"
+    def __init__(self):
+        self.dependents = {}  # predecessor number -> [dependent numbers]
+        self.think_times = {} # dependent number -> think time
+
+    def __len__(self):
+        return len(self.think_times)
+
+    def add(self, number, preceding_job_number, think_time):
+        "a missing (negative) think time is taken as 0"
+        self.dependents.setdefault(preceding_job_number, []).append(number)
+        self.think_times[number] = max(think_time, 0)
+
+    def is_dependent(self, number):
+        return number in self.think_times
+
+    def release(self, number):
+        """
+        returns a list of (number, think time) of the jobs that depend on the
+        job 'number', which terminated. Each job is released only once.
+        """
+        think_times = self.think_times
+        return [(dependent, think_times[dependent]) for dependent in self.dependents.pop(number, ())]
+
+def table_dependencies(table):
+    """
+    returns the JobDependencies of a JobTable with the DEPENDENCY_FIELDS.
+
+    Only dependencies on an earlier job (a smaller number) that is in the
+    table are kept: a time window of a trace may not have the predecessors
+    of its first jobs, and dependencies on later jobs would never be released.
+    """
+    dependencies = JobDependencies()
+    numbers = set(table.number)
+    for number, preceding_job_number, think_time in izip(table.number, table.preceding_job_number, table.think_time_from_preceding_job):
+        if 0 < preceding_job_number < number and preceding_job_number in numbers:
+            dependencies.add(number, preceding_job_number, think_time)
+    return dependencies
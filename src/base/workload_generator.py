@@ -0,0 +1,218 @@
+#! /usr/bin/env python2.4
+
+# A synthetic workload generator for stressing the schedulers with large
+# workloads, a scalable version of prototype.simple_job_generator.
+#
+# Jobs are generated a batch at a time, one column (JobTable field) at a
+# time, and streamed either to an SWF file or to the simulator as Jobs. The
+# model:
+#
+#   arrivals    - a Poisson process (exponential inter-arrival times), by
+#                 default at the rate that gives the machine the given load
+#   sizes       - serial jobs, powers of two, and log-uniform sizes up to the
+#                 machine size, in the given proportions
+#   run times   - log-normal, clamped to [1, max_run_time]
+#   estimates   - some users estimate exactly, the others' estimates are the
+#                 run time divided by an accuracy drawn uniformly from
+#                 [min_estimate_accuracy, 1], capped by max_run_time
+#   users       - uniform over num_users
+#
+# Each column has its own random stream derived from the seed, so the same
+# seed generates the same workload regardless of the batch size.
+
+import math
+import random
+from array import array
+
+from workload_table import JobTable, FIELDS
+from swf_writer import SwfWriter
+
+# number of jobs generated at once
+BATCH_SIZE = 10000
+
+_COLUMNS = ("submit_time", "size", "run_time", "estimate", "user_id")
+
+class WorkloadGenerator(object):
+    def __init__(self, num_processors, seed=None,
+            load=0.7,
+            mean_interarrival_time=None,
+            serial_probability=0.2,
+            power_of_two_probability=0.6,
+            median_run_time=600.0,
+            run_time_sigma=2.0,
+            max_run_time=48*3600,
+            exact_estimate_probability=0.1,
+            min_estimate_accuracy=0.05,
+            num_users=100,
+        ):
+        assert num_processors > 0
+        assert serial_probability + power_of_two_probability <= 1
+        self.num_processors = num_processors
+        self.seed = seed
+        self.serial_probability = serial_probability
+        self.power_of_two_probability = power_of_two_probability
+        self.median_run_time = median_run_time
+        self.run_time_sigma = run_time_sigma
+        self.max_run_time = max_run_time
+        if mean_interarrival_time is None:
+            mean_interarrival_time = self.mean_work() / (num_processors * load)
+        self.mean_interarrival_time = mean_interarrival_time
+        self.exact_estimate_probability = exact_estimate_probability
+        self.min_estimate_accuracy = min_estimate_accuracy
+        self.num_users = num_users
+
+        seeds = random.Random(seed)
+        self._randoms = {}
+        for name in _COLUMNS:
+            self._randoms[name] = random.Random(seeds.getrandbits(64))
+
+        self._current_time = 0.0
+        self._next_number = 1
+
+    def mean_work(self):
+        "approximately the mean processors * run time of a job (ignoring the clamping)"
+        log_num_processors = math.log(self.num_processors, 2)
+        max_exponent = int(log_num_processors)
+        if self.num_processors > 1:
+            mean_log_uniform_size = (self.num_processors - 1) / math.log(self.num_processors) + 0.5
+        else:
+            mean_log_uniform_size = 1
+        mean_size = self.serial_probability + \
+            self.power_of_two_probability * (2 ** (max_exponent + 1) - 1) / (max_exponent + 1.0) + \
+            (1 - self.serial_probability - self.power_of_two_probability) * mean_log_uniform_size
+        mean_run_time = min(self.median_run_time * math.exp(self.run_time_sigma ** 2 / 2), self.max_run_time)
+        return mean_size * mean_run_time
+
+    def _submit_times(self, count):
+        rate = 1.0 / self.mean_interarrival_time
+        expovariate = self._randoms["submit_time"].expovariate
+        result = array('l')
+        time = self._current_time
+        for i in xrange(count):
+            time += expovariate(rate)
+            result.append(int(time))
+        self._current_time = time
+        return result
+
+    def _sizes(self, count):
+        rand = self._randoms["size"].random
+        log_num_processors = math.log(self.num_processors, 2)
+        max_exponent = int(log_num_processors)
+        serial = self.serial_probability
+        power_of_two = serial + self.power_of_two_probability
+
+        def size(x, y):
+            if x < serial:
+                return 1
+            if x < power_of_two:
+                return 1 << int(y * (max_exponent + 1))
+            return min(int(2 ** (y * log_num_processors)) + 1, self.num_processors)
+
+        return array('l', [size(rand(), rand()) for i in xrange(count)])
+
+    def _run_times(self, count):
+        lognormvariate = self._randoms["run_time"].lognormvariate
+        mu = math.log(self.median_run_time)
+        sigma = self.run_time_sigma
+        max_run_time = self.max_run_time
+        return array('d', [
+            float(max(1, min(max_run_time, int(lognormvariate(mu, sigma)))))
+            for i in xrange(count)
+        ])
+
+    def _estimates(self, run_times):
+        rand = self._randoms["estimate"].random
+        exact = self.exact_estimate_probability
+        min_accuracy = self.min_estimate_accuracy
+        max_run_time = self.max_run_time
+
+        def estimate(run_time, x, y):
+            if x < exact:
+                return int(run_time)
+            accuracy = min_accuracy + y * (1 - min_accuracy)
+            return min(max_run_time, int(math.ceil(run_time / accuracy)))
+
+        return array('l', [estimate(r, rand(), rand()) for r in run_times])
+
+    def _user_ids(self, count):
+        randrange = self._randoms["user_id"].randrange
+        return array('l', [randrange(self.num_users) + 1 for i in xrange(count)])
+
+    def batch(self, count):
+        "returns a JobTable of the next count jobs"
+        run_times = self._run_times(count)
+        sizes = self._sizes(count)
+        columns = {
+            "number"                    : array('l', xrange(self._next_number, self._next_number + count)),
+            "submit_time"               : self._submit_times(count),
+            "run_time"                  : run_times,
+            "num_allocated_processors"  : sizes,
+            "num_requested_processors"  : sizes,
+            "requested_time"            : self._estimates(run_times),
+            "status"                    : array('l', [1]) * count,
+            "user_id"                   : self._user_ids(count),
+        }
+        self._next_number += count
+
+        for name, typecode in FIELDS:
+            if name not in columns:
+                columns[name] = array(typecode, [-1]) * count
+        table = JobTable()
+        table.extend_columns(columns)
+        return table
+
+    def batches(self, num_jobs, batch_size=BATCH_SIZE):
+        "generates the next num_jobs jobs, as JobTables of up to batch_size jobs"
+        while num_jobs > 0:
+            count = min(num_jobs, batch_size)
+            yield self.batch(count)
+            num_jobs -= count
+
+    def jobs(self, num_jobs, batch_size=BATCH_SIZE):
+        "returns an iterator of the next num_jobs Jobs, for the simulator"
+        for table in self.batches(num_jobs, batch_size):
+            for job in table.jobs(self.num_processors):
+                yield job
+
+    def write_swf(self, output_file, num_jobs, batch_size=BATCH_SIZE):
+        "writes the next num_jobs jobs to output_file in the standard workload format"
+        writer = SwfWriter(output_file, batch_size)
+        writer.write_header([
+            "Note: synthetic workload, seed: %s" % self.seed,
+            "MaxJobs: %d" % num_jobs,
+            "MaxRecords: %d" % num_jobs,
+            "MaxProcs: %d" % self.num_processors,
+        ])
+        for table in self.batches(num_jobs, batch_size):
+            writer.write_table(table)
+        writer.flush()
+
+def _measure_performance(num_jobs=1000000):
+    import time
+    generator = WorkloadGenerator(num_processors=100000, seed=0)
+    start_time = time.time()
+    counter = 0
+    for table in generator.batches(num_jobs):
+        counter += len(table)
+    total_time = time.time() - start_time
+    print "no. of jobs:", counter
+    print "total time (seconds):", total_time
+    print "jobs per second: %3.1f" % (float(counter) / total_time)
+
+if __name__ == "__main__":
+    import sys
+    import optparse
+
+    parser = optparse.OptionParser(usage="%prog [options] > output file")
+    parser.add_option("--num-jobs", type="int", help="the number of jobs to generate")
+    parser.add_option("--num-processors", type="int", help="the size of the machine")
+    parser.add_option("--seed", type="int", help="the random seed, the same seed generates the same workload")
+    parser.add_option("--performance", action="store_true", default=False, help="measure the generation speed")
+    options, args = parser.parse_args()
+
+    if options.performance:
+        _measure_performance()
+    else:
+        if options.num_jobs is None or options.num_processors is None:
+            parser.error("missing --num-jobs or --num-processors")
+        WorkloadGenerator(options.num_processors, options.seed).write_swf(sys.stdout, options.num_jobs)
@@ -0,0 +1,251 @@
+#! /usr/bin/env python2.4
+
+# A sparse index of a workload file, for simulating a time window of a long
+# trace without parsing everything before it.
+#
+# Every INDEX_STEP job lines the byte offset of the line is recorded, along
+# with the smallest and largest submit time and the largest job number in the
+# block of lines starting there. Keeping the minimum and maximum of each block
+# means seeking is correct even for traces that aren't sorted by submit time.
+#
+# The index is kept next to the input file (<input file>.index) and is
+# rebuilt when the file's size or mtime change. Compressed files can't be
+# seeked, their windows are read from the start.
+
+import os
+import sys
+import struct
+import warnings
+from array import array
+
+from workload_parser import open_workload, read_lines, read_header, _compression_of
+from workload_table import FIELD_NAMES, load_table
+
+INDEX_SUFFIX = ".index"
+
+# number of job lines per index entry
+INDEX_STEP = 1000
+
+MAGIC = "PYSSJIDX"
+VERSION = 1
+
+# magic, version, byte order, sizeof(long), step, no. of entries, source size, source mtime
+HEADER_FORMAT = "=8sIBBIIQd"
+HEADER_SIZE = (struct.calcsize(HEADER_FORMAT) + 7) // 8 * 8
+
+_BYTE_ORDERS = {"little": 1, "big": 2}
+
+def index_file_name(input_file_name):
+    return input_file_name + INDEX_SUFFIX
+
+class WorkloadIndex(object):
+    "the index entries of one file, see the module comment"
+    COLUMNS = ("offsets", "min_submit_times", "max_submit_times", "max_numbers")
+
+    def __init__(self, file_size, step=INDEX_STEP):
+        self.file_size = file_size
+        self.step = step
+        for name in self.COLUMNS:
+            setattr(self, name, array('l'))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __str__(self):
+        return "WorkloadIndex<entries=%s, step=%s>" % (len(self), self.step)
+
+    def _offset(self, block):
+        if block < len(self):
+            return self.offsets[block]
+        return self.file_size
+
+    def add_job(self, offset, submit_time, number, job_count):
+        "called for the job_count'th job line, starting at offset"
+        if job_count % self.step == 0:
+            self.offsets.append(offset)
+            self.min_submit_times.append(submit_time)
+            self.max_submit_times.append(submit_time)
+            self.max_numbers.append(number)
+        else:
+            if submit_time < self.min_submit_times[-1]:
+                self.min_submit_times[-1] = submit_time
+            if submit_time > self.max_submit_times[-1]:
+                self.max_submit_times[-1] = submit_time
+            if number > self.max_numbers[-1]:
+                self.max_numbers[-1] = number
+
+    def time_window_offsets(self, start_time=None, end_time=None):
+        """
+        returns (start offset, end offset) such that every job submitted in
+        [start_time, end_time) is between them. None means unbounded.
+        """
+        start_block = 0
+        if start_time is not None:
+            while start_block < len(self) and self.max_submit_times[start_block] < start_time:
+                start_block += 1
+
+        end_block = len(self)
+        if end_time is not None:
+            # the first block after which no job is submitted before end_time
+            min_submit_time = None
+            for block in xrange(len(self) - 1, start_block - 1, -1):
+                if min_submit_time is None or self.min_submit_times[block] < min_submit_time:
+                    min_submit_time = self.min_submit_times[block]
+                if min_submit_time < end_time:
+                    break
+                end_block = block
+
+        return self._offset(start_block), self._offset(end_block)
+
+    def job_offset(self, number):
+        "returns the offset to read from to reach job 'number'"
+        block = 0
+        while block < len(self) and self.max_numbers[block] < number:
+            block += 1
+        return self._offset(block)
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+def build_index(file_name, step=INDEX_STEP):
+    "reads an uncompressed SWF file and returns its WorkloadIndex"
+    index = WorkloadIndex(os.path.getsize(file_name), step)
+    input_file = open(file_name, "rb")
+    try:
+        offset = job_count = 0
+        for line in read_lines(input_file):
+            fields = line.split(None, 2)
+            if fields and not fields[0].startswith(';'):
+                index.add_job(offset, _parse_int(fields[1]), _parse_int(fields[0]), job_count)
+                job_count += 1
+            offset += len(line) + 1
+    finally:
+        input_file.close()
+    return index
+
+def write_index(index, index_name, source_mtime):
+    header = struct.pack(HEADER_FORMAT,
+        MAGIC, VERSION, _BYTE_ORDERS[sys.byteorder], array('l').itemsize,
+        index.step, len(index), index.file_size, source_mtime,
+    )
+    temp_name = "%s.%d.tmp" % (index_name, os.getpid())
+    output_file = open(temp_name, "wb")
+    try:
+        output_file.write(header.ljust(HEADER_SIZE, "\0"))
+        for name in WorkloadIndex.COLUMNS:
+            getattr(index, name).tofile(output_file)
+    finally:
+        output_file.close()
+    os.rename(temp_name, index_name)
+
+def read_index(index_name, source_name):
+    "returns the WorkloadIndex in index_name, or None if it's missing or stale"
+    try:
+        index_file = open(index_name, "rb")
+    except IOError:
+        return None
+
+    try:
+        header = index_file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            return None
+
+        magic, version, byte_order, long_size, step, num_entries, source_size, source_mtime = \
+            struct.unpack(HEADER_FORMAT, header[:struct.calcsize(HEADER_FORMAT)])
+
+        if magic != MAGIC or version != VERSION:
+            return None
+        if byte_order != _BYTE_ORDERS[sys.byteorder] or long_size != array('l').itemsize:
+            return None
+
+        stat = os.stat(source_name)
+        if stat.st_size != source_size or stat.st_mtime != source_mtime:
+            return None
+
+        index = WorkloadIndex(source_size, step)
+        try:
+            for name in WorkloadIndex.COLUMNS:
+                getattr(index, name).fromfile(index_file, num_entries)
+        except EOFError:
+            return None
+        return index
+    finally:
+        index_file.close()
+
+def load_index(input_file_name, step=INDEX_STEP):
+    "returns the WorkloadIndex of the given file from its index file, building it if needed"
+    index_name = index_file_name(input_file_name)
+
+    index = read_index(index_name, input_file_name)
+    if index is not None:
+        return index
+
+    stat = os.stat(input_file_name)
+    index = build_index(input_file_name, step)
+    try:
+        write_index(index, index_name, stat.st_mtime)
+    except (IOError, OSError), e:
+        warnings.warn("can't write workload index %s: %s" % (index_name, e))
+    return index
+
+def window_lines(lines, start_time=None, end_time=None, max_jobs=None):
+    """
+    passes on the comment lines and the first max_jobs job lines submitted in
+    [start_time, end_time). None means unbounded.
+    """
+    check_times = start_time is not None or end_time is not None
+    num_jobs = 0
+    for line in lines:
+        fields = line.split(None, 2)
+        if not fields or fields[0].startswith(';'):
+            yield line
+            continue
+        if check_times:
+            submit_time = _parse_int(fields[1])
+            if start_time is not None and submit_time < start_time:
+                continue
+            if end_time is not None and submit_time >= end_time:
+                continue
+        if num_jobs == max_jobs:
+            break
+        num_jobs += 1
+        yield line
+
+def load_window(input, fields=FIELD_NAMES, start_time=None, end_time=None, max_jobs=None, header=None):
+    """
+    returns a JobTable of the first max_jobs jobs submitted in [start_time,
+    end_time) (None means unbounded), with submit times relative to
+    start_time. If a WorkloadHeader is given its UnixStartTime is moved by
+    start_time too.
+
+    input is either an iterator of lines or the name of a (possibly
+    compressed) workload file. Uncompressed files are accessed through their
+    index, so only the lines around the window are read.
+    """
+    if isinstance(input, basestring):
+        if _compression_of(input) is None and (start_time is not None or end_time is not None):
+            start, end = load_index(input).time_window_offsets(start_time, end_time)
+            if header is not None:
+                read_header(input, header)
+            input_file = open(input, "rb")
+            input_file.seek(start)
+            size, table_header = end - start, None
+        else:
+            input_file = open_workload(input)
+            size, table_header = None, header
+        try:
+            table = load_table(window_lines(read_lines(input_file, size=size), start_time, end_time, max_jobs), fields, header=table_header)
+        finally:
+            input_file.close()
+    else:
+        table = load_table(window_lines(input, start_time, end_time, max_jobs), fields, header=header)
+
+    if start_time:
+        table.submit_time = array(table.submit_time.typecode, [s - start_time for s in table.submit_time])
+        if header is not None and header.unix_start_time is not None:
+            header.unix_start_time += start_time
+
+    return table
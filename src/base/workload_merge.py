@@ -0,0 +1,55 @@
+#! /usr/bin/env python2.4
+
+# Merges several workloads, e.g. different logs or the partitions of one log,
+# into a single stream of submissions.
+#
+# The inputs must each be sorted by submit time (as SWF files are). They're
+# merged with a heap holding the next job of every input, so only one job per
+# input is in memory at a time.
+
+import heapq
+
+def renumber(job_input, input_index, num_inputs):
+    """
+    gives the job of the input_index'th of num_inputs inputs a number that's
+    unique among all the inputs: the jobs' numbers are interleaved, job n of
+    input i becomes (n - 1) * num_inputs + i + 1. The preceding job number is
+    renumbered the same way, so dependencies within an input are kept.
+    """
+    number = job_input.number
+    if number > 0:
+        job_input.fields[0] = str((number - 1) * num_inputs + input_index + 1)
+    preceding_job_number = job_input.preceding_job_number
+    if preceding_job_number > 0:
+        job_input.fields[16] = str((preceding_job_number - 1) * num_inputs + input_index + 1)
+    return job_input
+
+def merge_job_inputs(job_inputs_iterators, renumber_jobs=True):
+    """
+    returns an iterator of the JobInputs of all the given iterators (e.g. of
+    parse_lines) ordered by submit time. Jobs submitted at the same time are
+    ordered by input. If renumber_jobs is true and there's more than one
+    input, the jobs are renumbered (see renumber()).
+    """
+    num_inputs = len(job_inputs_iterators)
+    renumber_jobs = renumber_jobs and num_inputs > 1
+
+    heap = []
+    for input_index, job_inputs in enumerate(job_inputs_iterators):
+        job_inputs = iter(job_inputs)
+        for job_input in job_inputs:
+            heap.append((job_input.submit_time, input_index, job_input, job_inputs))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        submit_time, input_index, job_input, job_inputs = heap[0]
+        if renumber_jobs:
+            renumber(job_input, input_index, num_inputs)
+        yield job_input
+
+        for next_job_input in job_inputs:
+            heapq.heapreplace(heap, (next_job_input.submit_time, input_index, next_job_input, job_inputs))
+            break
+        else:
+            heapq.heappop(heap)
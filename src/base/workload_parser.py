@@ -76,8 +76,200 @@ class JobInput(object):
     def __str__(self):
         return "JobInput<number=%s>" % self.number
 
-def parse_lines(lines_iterator):
-    "returns an iterator of JobInput objects"
+class WorkloadHeader(object):
+    """
+    The header comments of an SWF file, lines like '; MaxProcs: 128'.
+
+    All 'Key: value' pairs are kept in self.fields, the standard numeric
+    fields are also available as the attributes below (None if missing).
+    """
+    NUMERIC_FIELDS = {
+        "MaxJobs"       : "max_jobs",
+        "MaxRecords"    : "max_records",
+        "MaxNodes"      : "max_nodes",
+        "MaxProcs"      : "max_procs",
+        "UnixStartTime" : "unix_start_time",
+    }
+
+    def __init__(self):
+        self.lines = []
+        self.fields = {}
+        for attribute in self.NUMERIC_FIELDS.values():
+            setattr(self, attribute, None)
+
+    def add_line(self, line):
+        self.lines.append(line.rstrip("\r\n"))
+
+        text = line.strip()[1:] # without the ';'
+        if ':' not in text:
+            return
+        key, value = text.split(':', 1)
+        key, value = key.strip(), value.strip()
+        self.fields[key] = value
+
+        if key in self.NUMERIC_FIELDS:
+            try:
+                setattr(self, self.NUMERIC_FIELDS[key], int(value))
+            except ValueError:
+                pass # e.g. '-1' is fine, but some logs have garbage here
+
+    @property
+    def num_processors(self):
+        "the size of the machine, MaxProcs or else MaxNodes"
+        if self.max_procs > 0:
+            return self.max_procs
+        if self.max_nodes > 0:
+            return self.max_nodes
+        return None
+
+    @property
+    def num_records(self):
+        "the expected number of job lines, MaxRecords or else MaxJobs"
+        if self.max_records > 0:
+            return self.max_records
+        if self.max_jobs > 0:
+            return self.max_jobs
+        return None
+
+    def __str__(self):
+        return "WorkloadHeader<num_processors=%s, num_records=%s>" % (self.num_processors, self.num_records)
+
+# the Parallel Workloads Archive distributes compressed traces
+_COMPRESSION_MAGICS = (
+    ("\x1f\x8b", "gzip"),
+    ("BZh", "bzip2"),
+    ("\xfd7zXZ\x00", "xz"),
+)
+
+# size of the blocks read by read_lines
+READ_CHUNK_SIZE = 1 << 20
+
+def _compression_of(file_name):
+    input_file = open(file_name, "rb")
+    try:
+        head = input_file.read(8)
+    finally:
+        input_file.close()
+    for magic, compression in _COMPRESSION_MAGICS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+class _ProcessOutput(object):
+    """
+    The output of a decompressing process (args), as a file to read. Reaching
+    the end waits for the process, and raises IOError if it failed, so that a
+    corrupt or truncated file (or a missing program) isn't read as a shorter
+    trace. Closing it before the end stops the process.
+    """
+    def __init__(self, args):
+        import subprocess
+        self.args = args
+        try:
+            self.process = subprocess.Popen(args, stdout=subprocess.PIPE)
+        except OSError, e:
+            raise IOError("can't run %s: %s" % (args[0], e))
+        self.done = False
+
+    def read(self, size=-1):
+        data = self.process.stdout.read(size)
+        if not data and size != 0 and not self.done:
+            self.done = True
+            self.process.stdout.close()
+            status = self.process.wait()
+            if status != 0:
+                raise IOError("%s failed, exit status %d" % (" ".join(self.args), status))
+        return data
+
+    def close(self):
+        if self.done:
+            return
+        self.done = True
+        self.process.stdout.close() # the process gets SIGPIPE if it isn't done
+        self.process.wait()
+
+def _open_xz(file_name):
+    """
+    Decompressing xz in the process needs the lzma module (python 3.3), or
+    backports.lzma on python 2. Without them the xz program decompresses the
+    file in another process, through a pipe.
+    """
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            return _ProcessOutput(["xz", "-dc", file_name])
+    return lzma.LZMAFile(file_name, "rb")
+
+def open_workload(file_name):
+    "opens a workload file for reading, decompressing gzip, bzip2 or xz files (see _open_xz)"
+    compression = _compression_of(file_name)
+    if compression == "gzip":
+        import gzip
+        return gzip.GzipFile(file_name, "rb")
+    elif compression == "bzip2":
+        import bz2
+        return bz2.BZ2File(file_name, "rb", READ_CHUNK_SIZE)
+    elif compression == "xz":
+        return _open_xz(file_name)
+    else:
+        return open(file_name)
+
+def read_lines(input_file, chunk_size=READ_CHUNK_SIZE, size=None):
+    """
+    iterate over the lines of input_file (without the newlines), reading
+    chunk_size bytes at a time. Much faster than line by line iteration over
+    the decompressing file objects.
+
+    If size is given at most size bytes are read.
+    """
+    remainder = ""
+    while size is None or size > 0:
+        if size is not None:
+            chunk = input_file.read(min(chunk_size, size))
+            size -= len(chunk)
+        else:
+            chunk = input_file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split("\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+def read_header(file_name, header):
+    "adds the comment lines before the first job in the (possibly compressed) file to header"
+    input_file = open_workload(file_name)
+    try:
+        for line in read_lines(input_file, 1 << 16):
+            fields = line.split(None, 1)
+            if fields and not fields[0].startswith(';'):
+                break
+            if fields:
+                header.add_line(line)
+    finally:
+        input_file.close()
+
+def _file_lines(file_name):
+    input_file = open_workload(file_name)
+    for line in read_lines(input_file):
+        yield line
+    input_file.close()
+
+def parse_lines(lines_iterator, header=None):
+    """
+    returns an iterator of JobInput objects. lines_iterator can also be the
+    name of a (possibly compressed) workload file.
+
+    If a WorkloadHeader is given, the comment lines are added to it as
+    they're passed.
+    """
+    if isinstance(lines_iterator, basestring):
+        lines_iterator = _file_lines(lines_iterator)
 
     def _should_skip(line): # TODO: skip if runtime, num allocated processors, submit time is problematic
         return (line.lstrip().startswith(';') or (len(line.strip()) == 0)) # comment or empty line 
@@ -85,6 +277,8 @@ def parse_lines(lines_iterator):
 
     for line in lines_iterator:
         if _should_skip(line):
+            if header is not None and line.lstrip().startswith(';'):
+                header.add_line(line)
             continue # skipping
 
         yield JobInput(line)
@@ -109,6 +303,11 @@ def _test():
     assert str(job).startswith("JobInput")
     assert job.number == 59
 
+    header = WorkloadHeader()
+    header.add_line("; MaxNodes: 128\n")
+    assert header.num_processors == 128
+    assert header.num_records is None
+
 if __name__ == "__main__":
     import optparse
 
@@ -0,0 +1,295 @@
+#! /usr/bin/env python2.4
+
+# A profile of a workload, for estimating how expensive its simulation will
+# be before running it: the offered load, log2 histograms of the job sizes,
+# run times and estimates (like the bins of orig_probabilistic_easy_scheduler),
+# the number of events the simulator will handle and the expected number of
+# waiting jobs the schedulers will scan on every event.
+#
+# The profile is computed in one pass over the file, on the JobTable columns
+# the simulator would see (JobTable.job_columns), no Job is created.
+#
+# The waiting queue is estimated with a fluid model of the machine: the work
+# (processors * run time) submitted and not yet done drains at the machine's
+# capacity, a job waits until the work before it is done, and by Little's law
+# the mean no. of waiting jobs is the arrival rate times the mean wait. This
+# ignores fragmentation and backfilling, so it's only a rough estimate of any
+# particular scheduler's queue, but it orders traces (and load factors) by
+# cost.
+#
+# How much the queue costs depends on the scheduler (see estimated_cost()):
+# FCFS only tries the head of the queue, EASY scans it for backfilling on every
+# event, and Conservative reschedules every waiting job in its cpu snapshot on
+# every termination. Schedulers that handle JobPredictionIsOverEvents (EASY++,
+# Shrinking) also get an event for every job that outlives its prediction.
+
+import math
+from itertools import izip
+
+from workload_parser import read_lines, WorkloadHeader
+from workload_table import JOB_FIELDS, load_table, load_table_parallel
+
+# the events of every job: submission, start and termination
+EVENTS_PER_JOB = 3
+
+# how a scheduler scans its waiting jobs on an event
+HEAD_SCAN = "head"               # tries to start the first waiting jobs
+BACKFILL_SCAN = "backfill"       # and then scans the rest for backfilling
+RESCHEDULE_SCAN = "reschedule"   # reassigns every waiting job on a termination
+
+# (scan, handles JobPredictionIsOverEvents) of the schedulers, by class name
+SCHEDULER_COST_MODELS = {
+    "FcfsScheduler"                             : (HEAD_SCAN, False),
+    "ConservativeScheduler"                     : (RESCHEDULE_SCAN, False),
+    "DoubleConservativeScheduler"               : (RESCHEDULE_SCAN, False),
+    "EasyBackfillScheduler"                     : (BACKFILL_SCAN, False),
+    "DoubleEasyBackfillScheduler"               : (BACKFILL_SCAN, False),
+    "GreedyEasyBackfillScheduler"               : (BACKFILL_SCAN, False),
+    "LookAheadEasyBackFillScheduler"            : (BACKFILL_SCAN, False),
+    "EasySJBFScheduler"                         : (BACKFILL_SCAN, False),
+    "HeadDoubleEasyScheduler"                   : (BACKFILL_SCAN, False),
+    "TailDoubleEasyScheduler"                   : (BACKFILL_SCAN, False),
+    "ReverseEasyScheduler"                      : (BACKFILL_SCAN, False),
+    "PerfectEasyBackfillScheduler"              : (BACKFILL_SCAN, False),
+    "DoublePerfectEasyBackfillScheduler"        : (BACKFILL_SCAN, False),
+    "MauiScheduler"                             : (BACKFILL_SCAN, False),
+    "OrigProbabilisticEasyScheduler"            : (BACKFILL_SCAN, False),
+    "OrigCommonDistProbabilisticEasyScheduler"  : (BACKFILL_SCAN, False),
+    "ShrinkingEasyScheduler"                    : (BACKFILL_SCAN, True),
+    "EasyPlusPlusScheduler"                     : (BACKFILL_SCAN, True),
+    "AlphaEasyScheduler"                        : (BACKFILL_SCAN, True),
+    "CommonDistEasyPlusPlusScheduler"           : (BACKFILL_SCAN, True),
+}
+
+def scheduler_cost_model(scheduler):
+    """
+    returns the (scan, handles predictions) of a scheduler class, instance or
+    class name. A class is looked up by the names of its base classes, and
+    handles predictions if its handled_event_types has JobPredictionIsOverEvent.
+    """
+    if isinstance(scheduler, basestring):
+        if scheduler not in SCHEDULER_COST_MODELS:
+            raise ValueError("unknown scheduler: %s" % scheduler)
+        return SCHEDULER_COST_MODELS[scheduler]
+    if not isinstance(scheduler, type):
+        scheduler = type(scheduler)
+    for klass in scheduler.__mro__:
+        if klass.__name__ in SCHEDULER_COST_MODELS:
+            break
+    else:
+        raise ValueError("unknown scheduler: %s" % scheduler.__name__)
+    # by name, the schedulers import base.prototype, which may not be our prototype
+    handles_predictions = "JobPredictionIsOverEvent" in [
+        event_type.__name__ for event_type in scheduler.handled_event_types
+    ]
+    return SCHEDULER_COST_MODELS[klass.__name__][0], handles_predictions
+
+def log2_bin(value):
+    "the smallest power of two that is at least value (and 1), see orig_probabilistic_easy_scheduler._round_time_up"
+    if value <= 1:
+        return 1
+    mantissa, exponent = math.frexp(value)
+    if mantissa == 0.5:
+        return 1 << (exponent - 1)
+    return 1 << exponent
+
+def log2_histogram(values):
+    "returns {log2 bin: no. of values}"
+    histogram = {}
+    for value in values:
+        key = log2_bin(value)
+        histogram[key] = histogram.get(key, 0) + 1
+    return histogram
+
+class WorkloadProfile(object):
+    def __init__(self, table, num_processors):
+        self.num_processors = num_processors
+        self.num_jobs = len(table)
+
+        ids, submit_times, estimated_run_times, actual_run_times, sizes, user_ids = table.job_columns(num_processors)
+
+        self.size_histogram = log2_histogram(sizes)
+        self.run_time_histogram = log2_histogram(actual_run_times)
+        # estimate / run time, 1 is an exact estimate
+        self.estimate_histogram = log2_histogram([
+            float(estimate) / run_time for (estimate, run_time) in izip(estimated_run_times, actual_run_times)
+        ])
+
+        # the jobs that outlive a prediction of half their estimate, exactly
+        # ShrinkingEasyScheduler's, and roughly the jobs the predictions from
+        # the user's previous run times (EASY++) fall short of
+        self.num_long_jobs = len([
+            None for (estimate, run_time) in izip(estimated_run_times, actual_run_times) if run_time > estimate / 2
+        ])
+
+        works = [size * run_time for (size, run_time) in izip(sizes, actual_run_times)]
+        self.total_work = sum(works)
+
+        if self.num_jobs > 0:
+            self.duration = max(submit_times) - min(submit_times)
+        else:
+            self.duration = 0
+
+        self.mean_wait = self._fluid_mean_wait(submit_times, works)
+
+    def _fluid_mean_wait(self, submit_times, works):
+        if self.num_jobs == 0:
+            return 0.0
+        capacity = float(self.num_processors)
+        backlog = 0.0 # processor-seconds of submitted work not done yet
+        sum_waits = 0.0
+        last_submit_time = None
+        for submit_time, work in sorted(izip(submit_times, works)):
+            if last_submit_time is not None:
+                backlog = max(0.0, backlog - capacity * (submit_time - last_submit_time))
+            last_submit_time = submit_time
+            sum_waits += backlog / capacity
+            backlog += work
+        return sum_waits / self.num_jobs
+
+    @property
+    def offered_load(self):
+        "the work submitted divided by the machine's capacity during the submissions"
+        if self.duration <= 0:
+            return None
+        return self.total_work / (float(self.num_processors) * self.duration)
+
+    @property
+    def num_events(self):
+        "the no. of events of the simulation, not counting JobPredictionIsOverEvents"
+        return EVENTS_PER_JOB * self.num_jobs
+
+    @property
+    def mean_queue_depth(self):
+        "the expected mean no. of waiting jobs, see the module comment"
+        if self.duration <= 0:
+            return 0.0
+        return self.mean_wait * self.num_jobs / self.duration
+
+    def num_scheduler_events(self, scheduler):
+        "the no. of events of the simulation with the scheduler (class, instance or name)"
+        if scheduler_cost_model(scheduler)[1]:
+            return self.num_events + self.num_long_jobs
+        return self.num_events
+
+    def estimated_cost(self, scheduler):
+        """
+        a relative cost of simulating the workload with the scheduler (class,
+        instance or name), in the no. of waiting jobs it looks at:
+        - FCFS tries the head of the queue on every event: events
+        - EASY also scans the queue for backfilling: events * (1 + queue depth)
+        - Conservative assigns a submitted job in a cpu snapshot of the waiting
+          jobs, and reassigns every waiting job on a termination:
+          jobs * (3 + queue depth + queue depth * (1 + queue depth))
+        A JobPredictionIsOverEvent only extends the job in the snapshot, so
+        the prediction events add 1 each.
+        """
+        scan, handles_predictions = scheduler_cost_model(scheduler)
+        depth = self.mean_queue_depth
+        if scan == HEAD_SCAN:
+            cost = self.num_events
+        elif scan == BACKFILL_SCAN:
+            cost = self.num_events * (1 + depth)
+        else:
+            cost = self.num_jobs * (3 + depth + depth * (1 + depth))
+        if handles_predictions:
+            cost += self.num_long_jobs
+        return cost
+
+    def report_lines(self, schedulers=()):
+        "the report, with the estimated cost for every scheduler (class, instance or name)"
+        offered_load = self.offered_load
+        if offered_load is None:
+            offered_load = "unknown"
+        else:
+            offered_load = "%.3f" % offered_load
+        lines = [
+            "jobs: %d" % self.num_jobs,
+            "processors: %d" % self.num_processors,
+            "submission period (seconds): %d" % self.duration,
+            "offered load: %s" % offered_load,
+            "predicted events: %d" % self.num_events,
+            "predicted jobs longer than half their estimate: %d" % self.num_long_jobs,
+            "predicted mean wait (seconds): %.1f" % self.mean_wait,
+            "predicted mean queue depth: %.1f" % self.mean_queue_depth,
+        ]
+        for scheduler in schedulers:
+            if not isinstance(scheduler, basestring):
+                scheduler = getattr(scheduler, "__name__", type(scheduler).__name__)
+            lines.append("estimated cost with %s: %.0f" % (scheduler, self.estimated_cost(scheduler)))
+        for title, histogram in (
+                ("size (processors)", self.size_histogram),
+                ("run time (seconds)", self.run_time_histogram),
+                ("estimate / run time", self.estimate_histogram),
+            ):
+            lines.append("%s histogram:" % title)
+            for key in sorted(histogram):
+                lines.append("  <= %-10d %d" % (key, histogram[key]))
+        return lines
+
+def profile_file(file_name, num_processors=None, num_processes=1):
+    """
+    returns the WorkloadProfile of a workload file ('-' is stdin). The number
+    of processors defaults to the file header's MaxProcs.
+    """
+    header = WorkloadHeader()
+    if file_name == "-":
+        import sys
+        table = load_table(read_lines(sys.stdin), JOB_FIELDS, header=header)
+    else:
+        table = load_table_parallel(file_name, JOB_FIELDS, num_processes, header)
+    if num_processors is None:
+        num_processors = header.num_processors
+    if num_processors is None:
+        raise ValueError("%s: no number of processors, and the header has no MaxProcs" % file_name)
+    return WorkloadProfile(table, num_processors)
+
+def longest_first(profiles, schedulers):
+    """
+    orders the runs of every (trace, WorkloadProfile) pair with every scheduler
+    (class, instance or name) by decreasing estimated cost, for starting the
+    longest runs first. Returns a list of (trace, scheduler) pairs.
+    """
+    costs = [
+        ((trace, scheduler), profile.estimated_cost(scheduler))
+        for (trace, profile) in profiles
+        for scheduler in schedulers
+    ]
+    return [run for (run, cost) in sorted(costs, key=lambda (run, cost): -cost)]
+
+if __name__ == "__main__":
+    import sys
+    import optparse
+
+    parser = optparse.OptionParser(usage="%prog [options] input file [input file ...]")
+    parser.add_option("--num-processors", type="int", \
+                      help="the size of the machine, defaults to MaxProcs (or MaxNodes) from each input file header")
+    parser.add_option("--parse-processes", type="int", default=1, \
+                      help="parse the input files in this many processes, 0 means one per cpu (default 1)")
+    parser.add_option("--scheduler", action="append", dest="schedulers", metavar="SCHEDULER", default=[], \
+                      help="estimate the cost with this scheduler (its class name, e.g. EasyBackfillScheduler), given several times (default EasyBackfillScheduler)")
+    parser.add_option("--order", action="store_true", default=False, \
+                      help="print only the input file and scheduler pairs, most expensive first")
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("missing input file")
+    schedulers = options.schedulers or ["EasyBackfillScheduler"]
+    for scheduler in schedulers:
+        if scheduler not in SCHEDULER_COST_MODELS:
+            parser.error("unknown scheduler: %s" % scheduler)
+
+    profiles = []
+    for file_name in args:
+        try:
+            profile = profile_file(file_name, options.num_processors, options.parse_processes or None)
+        except ValueError, e:
+            parser.error(str(e))
+        profiles.append((file_name, profile))
+        if not options.order:
+            print file_name
+            for line in profile.report_lines(schedulers):
+                print "  " + line
+
+    if options.order:
+        for file_name, scheduler in longest_first(profiles, schedulers):
+            print file_name, scheduler
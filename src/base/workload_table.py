@@ -0,0 +1,394 @@
+#! /usr/bin/env python2.4
+
+# A columnar ("struct of arrays") loader for workloads in the Standard
+# Workload Format.
+#
+# Instead of keeping a JobInput (18 split strings) per line and a Job per
+# line, the whole trace is kept as one typed array per SWF field. The
+# _job_input_to_job clamping rules are applied a column at a time, and Job
+# instances are only created while iterating over JobTable.jobs(), i.e. when
+# the consumer actually asks for the next job.
+#
+# Very large traces can be loaded by load_table_parallel, which splits the
+# file at line boundaries and loads the parts in a pool of processes.
+
+import os
+from array import array
+from itertools import izip
+
+from prototype import Job
+from workload_parser import open_workload, read_lines, _compression_of
+
+# (name, array typecode) in SWF field order, names match the JobInput properties
+FIELDS = (
+    ("number",                        'l'),
+    ("submit_time",                   'l'),
+    ("wait_time",                     'l'),
+    ("run_time",                      'd'),
+    ("num_allocated_processors",      'l'),
+    ("average_cpu_time_used",         'd'),
+    ("used_memory",                   'l'),
+    ("num_requested_processors",      'l'),
+    ("requested_time",                'l'),
+    ("requested_memory",              'l'),
+    ("status",                        'l'),
+    ("user_id",                       'l'),
+    ("group_id",                      'l'),
+    ("executable_number",             'l'),
+    ("queue_number",                  'l'),
+    ("partition_number",              'l'),
+    ("preceding_job_number",          'l'),
+    ("think_time_from_preceding_job", 'l'),
+)
+
+FIELD_NAMES = tuple(name for (name, typecode) in FIELDS)
+
+# the fields needed by JobTable.jobs(), converting only these is much faster
+JOB_FIELDS = ("number", "submit_time", "run_time", "num_allocated_processors", "requested_time", "user_id")
+
+# number of lines split and converted at once
+CHUNK_SIZE = 10000
+
+# load_table_parallel splits the file into this many parts per process, so a
+# process that got an easy part can take another one
+PARTS_PER_PROCESS = 4
+
+def _parse_ints(values):
+    try:
+        return map(int, values)
+    except ValueError:
+        # some archive traces write integer fields as e.g. '1024.00'
+        return [int(float(value)) for value in values]
+
+def _store(column, start, values):
+    "writes values into column from index start on, growing it if needed"
+    end = start + len(values)
+    if end <= len(column):
+        column[start:end] = array(column.typecode, values)
+    else:
+        del column[start:]
+        column.extend(values)
+
+class JobTable(object):
+    """
+    A parsed workload, one array per SWF field (see FIELDS). Row i of every
+    column describes the i'th job in the input.
+
+    Only the columns named in 'fields' are kept, the others are None.
+
+    A missing (non positive) num_requested_processors is replaced by the
+    allocated number, like JobInput.num_requested_processors, unless raw is
+    true (e.g. for filter.py, which counts the jobs it fills in).
+    """
+    def __init__(self, fields=FIELD_NAMES, raw=False):
+        assert "number" in fields
+        self.fields = tuple(name for name in FIELD_NAMES if name in fields)
+        self.raw = raw
+        for name, typecode in FIELDS:
+            if name in self.fields:
+                setattr(self, name, array(typecode))
+            else:
+                setattr(self, name, None)
+        self._num_rows = 0
+
+    def __len__(self):
+        return self._num_rows
+
+    def reserve(self, num_rows):
+        "preallocate the columns for num_rows rows, see trim()"
+        for name in self.fields:
+            column = getattr(self, name)
+            if len(column) < num_rows:
+                column.extend(array(column.typecode, [0]) * (num_rows - len(column)))
+
+    def trim(self):
+        "drop the preallocated rows that weren't used"
+        for name in self.fields:
+            del getattr(self, name)[self._num_rows:]
+
+    def __str__(self):
+        return "JobTable<num_jobs=%s>" % len(self)
+
+    def extend_rows(self, rows):
+        "append rows of already split SWF fields"
+        if not rows:
+            return
+        assert min(map(len, rows)) == max(map(len, rows)) == len(FIELDS)
+
+        columns = zip(*rows)
+        for (name, typecode), values in izip(FIELDS, columns):
+            if name not in self.fields or (name == "num_requested_processors" and not self.raw):
+                continue
+            if typecode == 'd':
+                _store(getattr(self, name), self._num_rows, map(float, values))
+            else:
+                _store(getattr(self, name), self._num_rows, _parse_ints(values))
+
+        if "num_requested_processors" in self.fields and not self.raw:
+            # a non positive value means this is the same as the no. of allocated processors
+            allocated = _parse_ints(columns[4])
+            requested = _parse_ints(columns[7])
+            _store(self.num_requested_processors, self._num_rows,
+                [r > 0 and r or a for (r, a) in izip(requested, allocated)]
+            )
+
+        self._num_rows += len(rows)
+
+    def extend_columns(self, columns):
+        "append whole columns, given as a dict of field name to array"
+        num_rows = len(columns["number"])
+        for name in self.fields:
+            column = getattr(self, name)
+            values = columns[name]
+            assert len(values) == num_rows
+            if len(column) == 0 and isinstance(values, array) and values.typecode == column.typecode:
+                setattr(self, name, values) # no need to copy
+            else:
+                _store(column, self._num_rows, values)
+        self._num_rows += num_rows
+
+    def select(self, keep):
+        "returns a new JobTable of the rows for which keep (a sequence of booleans) is true"
+        result = JobTable(self.fields, self.raw)
+        columns = {}
+        for name in self.fields:
+            column = getattr(self, name)
+            columns[name] = array(column.typecode, [value for (value, k) in izip(column, keep) if k])
+        result.extend_columns(columns)
+        return result
+
+    def job_columns(self, total_num_processors):
+        """
+        Returns the arrays (id, submit_time, user_estimated_run_time,
+        actual_run_time, num_required_processors, user_id) after applying the
+        rules of prototype._job_input_to_job to whole columns.
+        Requires the JOB_FIELDS columns.
+        """
+        # if job input seems to be problematic
+        problematic = [
+            r <= 0 or a <= 0 or s < 0
+            for (r, a, s) in izip(self.run_time, self.num_allocated_processors, self.submit_time)
+        ]
+
+        submit_times = array('l', [
+            p and max(s, 1) or s
+            for (p, s) in izip(problematic, self.submit_time)
+        ])
+        estimated_run_times = array('l', [
+            p and 1 or int(max(q, r, 1))
+            for (p, q, r) in izip(problematic, self.requested_time, self.run_time)
+        ])
+        actual_run_times = array('l', [
+            p and 1 or int(max(min(q, r), 1))
+            for (p, q, r) in izip(problematic, self.requested_time, self.run_time)
+        ])
+        num_processors = array('l', [
+            p and max(1, a) or max(min(a, total_num_processors), 1)
+            for (p, a) in izip(problematic, self.num_allocated_processors)
+        ])
+
+        return self.number, submit_times, estimated_run_times, actual_run_times, num_processors, self.user_id
+
+    def jobs(self, total_num_processors):
+        "returns an iterator of Job objects, each created only when reached"
+        columns = self.job_columns(total_num_processors)
+        for id, submit_time, estimated, actual, processors, user_id in izip(*columns):
+            yield Job(
+                id = id,
+                user_estimated_run_time = estimated,
+                actual_run_time = actual,
+                num_required_processors = processors,
+                submit_time = submit_time,
+                user_id = user_id,
+            )
+
+def _row_chunks(lines_iterator, chunk_size, header):
+    "the split job lines, in lists of chunk_size rows"
+    rows = []
+    for line in lines_iterator:
+        row = line.split()
+        if not row:
+            continue # empty line
+        if row[0].startswith(';'):
+            if header is not None:
+                header.add_line(line)
+            continue # comment, same as workload_parser
+
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = []
+
+    if rows:
+        yield rows
+
+def load_table(lines_iterator, fields=FIELD_NAMES, chunk_size=CHUNK_SIZE, header=None, raw=False):
+    """
+    returns a JobTable of the job lines in lines_iterator.
+
+    If a WorkloadHeader is given the comment lines are added to it, and the
+    table is presized by its MaxRecords/MaxJobs. For raw see JobTable.
+    """
+    table = JobTable(fields, raw)
+    for rows in _row_chunks(lines_iterator, chunk_size, header):
+        if len(table) == 0 and header is not None and header.num_records is not None:
+            table.reserve(header.num_records)
+        table.extend_rows(rows)
+
+    table.trim()
+    return table
+
+def load_table_chunks(lines_iterator, fields=FIELD_NAMES, chunk_size=CHUNK_SIZE, header=None):
+    """
+    like load_table, but generates a JobTable of every chunk_size job lines
+    as soon as they're read, for streaming a workload to the simulator
+    """
+    for rows in _row_chunks(lines_iterator, chunk_size, header):
+        table = JobTable(fields)
+        table.extend_rows(rows)
+        yield table
+
+def jobs_of_tables(tables, total_num_processors):
+    "returns an iterator of the Jobs of all the given JobTables, see JobTable.jobs"
+    for table in tables:
+        for job in table.jobs(total_num_processors):
+            yield job
+
+class _CommentLines(list):
+    "collects the comment lines of a file part, like a WorkloadHeader that doesn't presize"
+    num_records = None
+    add_line = list.append
+
+def _split_offsets(file_name, num_parts):
+    "returns increasing offsets of line starts in the file, from 0 to its size"
+    size = os.path.getsize(file_name)
+    offsets = [0]
+    input_file = open(file_name, "rb")
+    try:
+        for i in xrange(1, num_parts):
+            offset = size * i // num_parts
+            if offset <= offsets[-1]:
+                continue # the previous part ended with a long line
+            input_file.seek(offset - 1)
+            input_file.readline() # to the start of the next line
+            offset = input_file.tell()
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    finally:
+        input_file.close()
+    offsets.append(size)
+    return offsets
+
+def _load_part(args):
+    "loads the lines between two offsets, runs in the pool processes"
+    file_name, start, end, fields, raw = args
+    comment_lines = _CommentLines()
+    input_file = open(file_name, "rb")
+    try:
+        input_file.seek(start)
+        table = load_table(read_lines(input_file, size=end - start), fields, header=comment_lines, raw=raw)
+    finally:
+        input_file.close()
+    columns = dict((name, getattr(table, name)) for name in table.fields)
+    return columns, list(comment_lines)
+
+def load_table_parallel(file_name, fields=FIELD_NAMES, num_processes=None, header=None, raw=False):
+    """
+    returns the same JobTable as load_table for the lines of file_name,
+    loading parts of the file in a pool of num_processes processes (default:
+    one per cpu). The parts are appended to the table in file order.
+
+    Compressed files can't be split and are loaded sequentially, as is
+    everything when num_processes is 1 or there's no multiprocessing module.
+    """
+    try:
+        import multiprocessing
+    except ImportError:
+        multiprocessing = None # python2.4/2.5
+
+    if multiprocessing is None or num_processes == 1 or _compression_of(file_name) is not None:
+        input_file = open_workload(file_name)
+        try:
+            return load_table(read_lines(input_file), fields, header=header, raw=raw)
+        finally:
+            input_file.close()
+
+    if num_processes is None:
+        num_processes = multiprocessing.cpu_count()
+
+    offsets = _split_offsets(file_name, num_processes * PARTS_PER_PROCESS)
+    parts = [(file_name, start, end, fields, raw) for (start, end) in izip(offsets, offsets[1:])]
+
+    table = JobTable(fields, raw)
+    pool = multiprocessing.Pool(num_processes)
+    try:
+        for columns, comment_lines in pool.imap(_load_part, parts):
+            table.extend_columns(columns)
+            if header is not None:
+                for line in comment_lines:
+                    header.add_line(line)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return table
+
+def header_mismatches(header, table):
+    "returns messages about the ways the table's data contradicts the header"
+    result = []
+
+    if header.max_jobs > 0 and len(table) != header.max_jobs:
+        result.append("MaxJobs is %s but there are %s jobs" % (header.max_jobs, len(table)))
+
+    if header.max_records > 0 and len(table) != header.max_records:
+        result.append("MaxRecords is %s but there are %s records" % (header.max_records, len(table)))
+
+    if header.num_processors is not None and len(table) > 0:
+        for name in ("num_allocated_processors", "num_requested_processors"):
+            column = getattr(table, name)
+            if column is not None and max(column) > header.num_processors:
+                result.append("%s jobs have more %s than the %s processors in the header" % (
+                    len([x for x in column if x > header.num_processors]), name.replace("_", " ")[4:],
+                    header.num_processors,
+                ))
+
+    return result
+
+def _measure_performance(file_name=None, num_processes=None):
+    import sys
+    import time
+    start_time = time.time()
+    if file_name is None:
+        print "reading from stdin"
+        table = load_table(sys.stdin)
+    else:
+        print "reading %s in %s processes" % (file_name, num_processes or "cpu count")
+        table = load_table_parallel(file_name, num_processes=num_processes)
+    end_time = time.time()
+    total_time = end_time - start_time
+    print "no. of jobs:", len(table)
+    print "total time (seconds):", total_time
+    print "jobs per second: %3.1f" % (float(len(table)) / total_time)
+
+def _test():
+    table = load_table(["   59    26613      0    716   32     -1    -1   -1     -1    -1 -1   4   1   3  0 -1 -1 -1"])
+    assert str(table).startswith("JobTable")
+    assert len(table) == 1
+    assert table.number[0] == 59
+    assert table.num_requested_processors[0] == 32
+
+if __name__ == "__main__":
+    import optparse
+
+    parser = optparse.OptionParser(usage="%prog <test/performance> [input file] [num processes]")
+    options, args = parser.parse_args()
+    if len(args) == 0: parser.error("no action given")
+
+    action = args[0]
+
+    if action == "test":
+        _test()
+    elif action == "performance":
+        _measure_performance(*args[1:2] + map(int, args[2:3]))
+    else:
+        parser.error("unknown action '%s'" % action)
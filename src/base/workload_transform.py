@@ -0,0 +1,78 @@
+#! /usr/bin/env python2.4
+
+# Transformations of a loaded workload, applied between parsing and creating
+# the Jobs: scaling the load, rescaling the jobs to a machine of a different
+# size, and shifting times and user ids.
+#
+# Each transformation returns a new JobTable that shares the columns it
+# doesn't change with the original, so one parsed trace can be simulated at
+# several load levels without re-parsing it or writing intermediate files.
+
+from array import array
+from itertools import izip
+
+from workload_table import JobTable
+
+def _with_columns(table, columns):
+    "a copy of table with some of its columns replaced (the others are shared)"
+    result = JobTable(table.fields)
+    all_columns = dict((name, getattr(table, name)) for name in table.fields)
+    all_columns.update(columns)
+    result.extend_columns(all_columns)
+    return result
+
+def scale_load(table, load_factor):
+    """
+    multiplies the load by load_factor by dividing the inter-arrival times
+    by it, the first job is still submitted at the same time
+    """
+    assert load_factor > 0
+    if len(table) == 0:
+        return table
+    first_submit_time = min(table.submit_time)
+    return _with_columns(table, {"submit_time": array(table.submit_time.typecode, [
+        first_submit_time + int((s - first_submit_time) / load_factor) for s in table.submit_time
+    ])})
+
+def scale_processors(table, from_num_processors, to_num_processors):
+    """
+    rescales the processors of the jobs from a machine of from_num_processors
+    to one of to_num_processors, keeping every job's fraction of the machine
+    (at least one processor). Missing (non positive) values are kept.
+    """
+    ratio = float(to_num_processors) / from_num_processors
+    def scaled(n):
+        if n <= 0:
+            return n
+        return max(1, min(to_num_processors, int(round(n * ratio))))
+
+    columns = {}
+    for name in ("num_allocated_processors", "num_requested_processors"):
+        column = getattr(table, name)
+        if column is not None:
+            columns[name] = array(column.typecode, [scaled(n) for n in column])
+    return _with_columns(table, columns)
+
+def shift_time(table, offset):
+    "adds offset to every submit time"
+    return _with_columns(table, {"submit_time": array(table.submit_time.typecode, [
+        s + offset for s in table.submit_time
+    ])})
+
+def shift_users(table, offset):
+    "adds offset to every known (positive) user id, e.g. to keep the users of merged traces apart"
+    return _with_columns(table, {"user_id": array(table.user_id.typecode, [
+        u > 0 and u + offset or u for u in table.user_id
+    ])})
+
+def transform(table, load_factor=None, from_num_processors=None, to_num_processors=None, time_shift=0, user_shift=0):
+    "applies the given transformations, None (or 0) means the default of no change"
+    if load_factor is not None and load_factor != 1:
+        table = scale_load(table, load_factor)
+    if from_num_processors is not None and to_num_processors is not None and from_num_processors != to_num_processors:
+        table = scale_processors(table, from_num_processors, to_num_processors)
+    if time_shift:
+        table = shift_time(table, time_shift)
+    if user_shift:
+        table = shift_users(table, user_shift)
+    return table
@@ -1,14 +1,27 @@
 #! /usr/bin/env python2.4
 
+import os
 import sys
+import signal
 if __debug__:
     import warnings
     #warnings.warn("Running in debug mode, this will be slow... try 'python2.4 -O %s'" % sys.argv[0])
 
-from base.workload_parser import parse_lines
+from base.workload_parser import parse_lines, read_lines, read_header, open_workload, WorkloadHeader
+from base.workload_table import load_table, load_table_parallel, load_table_chunks, jobs_of_tables, header_mismatches, JOB_FIELDS, CHUNK_SIZE
+from base.workload_cache import load_cached_table
+from base.workload_index import load_window
+from base.workload_generator import WorkloadGenerator
+from base.workload_transform import transform
+from base.workload_merge import merge_job_inputs
+from base.read_ahead import ReadAhead
+from base.workload_dependencies import table_dependencies, DEPENDENCY_FIELDS
 from base.prototype import _job_inputs_to_jobs
-from schedulers.simulator import run_simulator
+from base.event_queue import HEAP_CLASSES
+from base.checkpoint import Checkpointer, load_checkpoint
+from schedulers.simulator import Simulator, run_simulator, resume_simulator, fork_simulator, UnsortedJobsError
 import optparse
+from itertools import chain
 
 from schedulers.fcfs_scheduler import FcfsScheduler
 
@@ -44,18 +57,76 @@ from schedulers.orig_probabilistic_easy_scheduler import OrigProbabilisticEasySc
 def parse_options():
     parser = optparse.OptionParser()
     parser.add_option("--num-processors", type="int", \
-                      help="the number of available processors in the simulated parallel machine")
-    parser.add_option("--input-file", \
-                      help="a file in the standard workload format: http://www.cs.huji.ac.il/labs/parallel/workload/swf.html, if '-' read from stdin")
+                      help="the number of available processors in the simulated parallel machine, defaults to MaxProcs (or MaxNodes) from the input file header")
+    parser.add_option("--input-file", action="append", dest="input_files", default=[], \
+                      help="a file in the standard workload format: http://www.cs.huji.ac.il/labs/parallel/workload/swf.html, possibly gzip/bzip2/xz compressed, if '-' read from stdin. Given several times, the files are merged by submit time (and their jobs renumbered)")
+    parser.add_option("--cache", action="store_true", default=False, \
+                      help="keep a binary copy of the parsed input file next to it (<input-file>.cache) and load it on later runs")
+    parser.add_option("--parse-processes", type="int", default=1, \
+                      help="parse the input file in this many processes, 0 means one per cpu (default 1)")
+    parser.add_option("--start-time", type="int", \
+                      help="simulate only the jobs submitted from this time on, submit times are then relative to it")
+    parser.add_option("--end-time", type="int", \
+                      help="simulate only the jobs submitted before this time")
+    parser.add_option("--max-jobs", type="int", \
+                      help="simulate at most this many jobs (after --start-time)")
+    parser.add_option("--load-factor", type="float", \
+                      help="multiply the load of the input by this, by dividing the inter-arrival times by it")
+    parser.add_option("--scale-processors", action="store_true", default=False, \
+                      help="rescale the jobs' processors from the machine in the input file header (MaxProcs) to --num-processors")
+    parser.add_option("--generate", type="int", metavar="NUM_JOBS", \
+                      help="simulate this many synthetic jobs (see base/workload_generator.py) instead of an input file")
+    parser.add_option("--seed", type="int", \
+                      help="the random seed of --generate, the same seed generates the same jobs")
+    parser.add_option("--dependencies", action="store_true", default=False, \
+                      help="submit jobs that depend on a preceding job (SWF fields 17 and 18) at its simulated termination plus the think time, instead of at their submit time")
+    parser.add_option("--read-ahead", action="store_true", default=False, \
+                      help="read and parse the input in a background process (a thread for stdin and merged inputs) while the simulation runs")
+    parser.add_option("--event-queue", type="choice", choices=sorted(HEAP_CLASSES), default="simple", \
+                      help="the event queue's heap implementation: %s (default simple)" % ", ".join(sorted(HEAP_CLASSES)))
+    parser.add_option("--batch-events", action="store_true", default=False, \
+                      help="schedule the submissions and terminations at the same time at once (FCFS, Conservative and EASY and its variants that only change the scheduling order), the schedules can differ")
+    parser.add_option("--stream-jobs", action="store_true", default=False, \
+                      help="read the jobs as the simulation reaches them, instead of queueing the submissions of all of them before it starts: the memory doesn't grow with the input, but it must be sorted by submit time")
+    parser.add_option("--checkpoint", metavar="FILE", \
+                      help="save the state of the simulation to this file when the process gets SIGUSR1, and every --checkpoint-interval events")
+    parser.add_option("--checkpoint-interval", type="int", metavar="NUM_EVENTS", \
+                      help="save a checkpoint every this many events")
+    parser.add_option("--resume", metavar="FILE", \
+                      help="continue the simulation saved in this checkpoint file, with the options of the run that saved it (the other options but --checkpoint and --checkpoint-interval are ignored)")
+    parser.add_option("--fork-at", type="int", metavar="TIME", \
+                      help="what-if runs: simulate with --scheduler until this time, then continue in a forked process with every --what-if scheduler, and print the statistics of the jobs submitted from this time on")
+    parser.add_option("--what-if", action="append", metavar="SCHEDULER", default=[], \
+                      help="a scheduler (as in --scheduler) to continue the simulation with from --fork-at, given several times")
+    parser.add_option("--output-swf", \
+                      help="write the simulated schedule to this file in the standard workload format, with the simulated wait times")
     parser.add_option("--scheduler", 
                       help="1) FcfsScheduler, 2) ConservativeScheduler, 3) DoubleConservativeScheduler, 4) EasyBackfillScheduler, 5) DoubleEasyBackfillScheduler, 6) GreedyEasyBackfillScheduler, 7) EasyPlusPlusScheduler, 8) ShrinkingEasyScheduler, 9) LookAheadEasyBackFillScheduler,  10) EasySJBFScheduler, 11) HeadDoubleEasyScheduler, 12) TailDoubleEasyScheduler, 13) OrigProbabilisticEasyScheduler, 14) ReverseEasyScheduler,  15) PerfectEasyBackfillScheduler, 16)DoublePerfectEasyBackfillScheduler, 17) ProbabilisticNodesEasyScheduler, 18) AlphaEasyScheduler, 19)DoubleAlphaEasyScheduler 20)ProbabilisticAlphaEasyScheduler")
     
     options, args = parser.parse_args()
 
-    if options.num_processors is None:
-        parser.error("missing num processors")
+    options.input_file = options.input_files and options.input_files[0] or None
 
-    if options.input_file is None:
+    if options.checkpoint_interval is not None and (options.checkpoint is None or options.checkpoint_interval <= 0):
+        parser.error("--checkpoint-interval needs --checkpoint, and a positive number of events")
+
+    if (options.fork_at is None) != (not options.what_if):
+        parser.error("--fork-at and --what-if must be used together")
+
+    if options.fork_at is not None and (options.resume is not None or options.checkpoint is not None or options.output_swf is not None):
+        parser.error("--fork-at can't be used with --resume, --checkpoint or --output-swf")
+
+    if options.resume is not None:
+        return options
+
+    if options.generate is not None:
+        if options.input_file is not None:
+            parser.error("--generate and --input-file can't be used together")
+        if options.num_processors is None:
+            parser.error("--generate needs --num-processors")
+        if options.load_factor is not None or options.scale_processors:
+            parser.error("--load-factor and --scale-processors transform input files, they can't be used with --generate")
+    elif options.input_file is None:
         parser.error("missing input file")
 
     if options.scheduler is None:
@@ -64,91 +135,311 @@ def parse_options():
     if args:
         parser.error("unknown extra arguments: %s" % args)
 
+    if _is_windowed(options) and (options.cache or options.parse_processes != 1):
+        parser.error("--cache and --parse-processes read the whole input, they can't be used with --start-time/--end-time/--max-jobs")
+
+    if len(options.input_files) > 1 and (options.cache or options.parse_processes != 1 or _is_windowed(options) \
+            or options.load_factor is not None or options.scale_processors):
+        parser.error("several input files are merged as streams, they can't be used with --cache, --parse-processes, --start-time/--end-time/--max-jobs, --load-factor or --scale-processors")
+
+    if options.read_ahead and (options.cache or options.parse_processes != 1 or _is_windowed(options) \
+            or options.load_factor is not None):
+        parser.error("--read-ahead streams the input, it can't be used with --cache, --parse-processes, --start-time/--end-time/--max-jobs or --load-factor")
+
+    if options.read_ahead and not options.stream_jobs:
+        parser.error("--read-ahead overlaps the reading with the simulation, it needs --stream-jobs (otherwise all the jobs are read before it starts)")
+
+    if options.dependencies and (options.generate is not None or len(options.input_files) > 1 or options.read_ahead):
+        parser.error("--dependencies indexes the whole input file, it can't be used with --generate, several input files or --read-ahead")
+
+    if options.checkpoint is not None and options.stream_jobs and ("-" in options.input_files or \
+            (options.generate is not None and options.seed is None)):
+        parser.error("--resume reads a streamed input again, --checkpoint with --stream-jobs can't be used with stdin or --generate without --seed")
+
+    if options.read_ahead and options.input_file == "-" and (options.num_processors is None or options.scale_processors):
+        parser.error("--read-ahead from stdin needs --num-processors, and can't be used with --scale-processors (the header is read with the jobs)")
+
     return options
 
-def main():
-    options = parse_options()
+def _is_windowed(options):
+    return options.start_time is not None or options.end_time is not None or options.max_jobs is not None
+
+def load_input(options):
+    "returns the JobTable of the input file and its WorkloadHeader, reading the file once"
+    header = WorkloadHeader()
+
+    num_processes = options.parse_processes or None # None is one per cpu
+    fields = JOB_FIELDS
+    if options.dependencies:
+        fields += DEPENDENCY_FIELDS
+
+    if _is_windowed(options):
+        if options.input_file == "-":
+            input = read_lines(sys.stdin)
+        else:
+            input = options.input_file
+        table = load_window(input, fields, options.start_time, options.end_time, options.max_jobs, header)
+    elif options.input_file == "-":
+        table = load_table(read_lines(sys.stdin), fields, header=header)
+    elif options.cache:
+        table = load_cached_table(options.input_file, fields, header, num_processes)
+    else:
+        table = load_table_parallel(options.input_file, fields, num_processes, header)
+
+    return table, header
 
+def read_input_header(options):
+    "returns the WorkloadHeader of the input file, or an empty one for stdin"
+    header = WorkloadHeader()
+    if options.input_file != "-":
+        read_header(options.input_file, header)
+    return header
+
+def _input_file_tables(file_name):
+    "the JobTable chunks of the input file, opened (and closed) by whoever iterates over them"
+    input_file = open_workload(file_name)
+    try:
+        for table in load_table_chunks(read_lines(input_file), JOB_FIELDS):
+            yield table
+    finally:
+        input_file.close()
+
+def read_ahead_jobs(options, header):
+    """
+    returns an iterator of the Jobs of the input file, parsed a chunk at a time
+    ahead of the simulation (see base/read_ahead.py). Files are opened and
+    parsed in a process if multiprocessing is available, stdin in a thread
+    (multiprocessing closes the process' stdin).
+    """
     if options.input_file == "-":
-        input_file = sys.stdin
+        tables, use_process = load_table_chunks(read_lines(sys.stdin), JOB_FIELDS), False
     else:
-        input_file = open(options.input_file)
+        tables = _input_file_tables(options.input_file)
+        try:
+            import multiprocessing
+            use_process = True
+        except ImportError:
+            use_process = False
+
+    if options.scale_processors:
+        tables = (transform(table,
+            from_num_processors = header.num_processors,
+            to_num_processors = options.num_processors,
+        ) for table in tables)
+    return jobs_of_tables(ReadAhead(tables, use_process=use_process), options.num_processors)
+
+def merged_input_job_inputs(options):
+    """
+    returns the JobInputs of all the input files merged by submit time, and
+    the largest MaxProcs in their headers. The headers are read with the jobs,
+    the merge reads the first job of every input before it yields one.
+    """
+    headers = []
+    job_inputs_iterators = []
+    for file_name in options.input_files:
+        header = WorkloadHeader()
+        headers.append(header)
+        if file_name == "-":
+            job_inputs_iterators.append(parse_lines(read_lines(sys.stdin), header))
+        else:
+            job_inputs_iterators.append(parse_lines(file_name, header))
+
+    job_inputs = merge_job_inputs(job_inputs_iterators)
+    try:
+        first_job_input = job_inputs.next()
+    except StopIteration:
+        first_job_input = None
+
+    num_processors = None
+    for header in headers:
+        if header.num_processors > num_processors:
+            num_processors = header.num_processors
 
-    if options.scheduler == "FcfsScheduler" or options.scheduler == "1":
-        scheduler = FcfsScheduler(options.num_processors)
+    if first_job_input is None:
+        return iter(()), num_processors
+    return chain([first_job_input], job_inputs), num_processors
 
-    elif options.scheduler == "ConservativeScheduler" or options.scheduler =="2":
-        scheduler = ConservativeScheduler(options.num_processors)
+def make_scheduler(name, num_processors):
+    "returns the scheduler of a --scheduler name or number, or None"
+    if name == "FcfsScheduler" or name == "1":
+        return FcfsScheduler(num_processors)
 
-    elif options.scheduler == "DoubleConservativeScheduler" or options.scheduler == "3":
-        scheduler = DoubleConservativeScheduler(options.num_processors)
+    elif name == "ConservativeScheduler" or name =="2":
+        return ConservativeScheduler(num_processors)
 
-    elif options.scheduler == "EasyBackfillScheduler" or options.scheduler == "4":
-        scheduler = EasyBackfillScheduler(options.num_processors)
+    elif name == "DoubleConservativeScheduler" or name == "3":
+        return DoubleConservativeScheduler(num_processors)
+
+    elif name == "EasyBackfillScheduler" or name == "4":
+        return EasyBackfillScheduler(num_processors)
         
-    elif options.scheduler == "DoubleEasyBackfillScheduler" or options.scheduler == "5":
-        scheduler = DoubleEasyBackfillScheduler(options.num_processors)
+    elif name == "DoubleEasyBackfillScheduler" or name == "5":
+        return DoubleEasyBackfillScheduler(num_processors)
 
-    elif options.scheduler == "GreedyEasyBackfillScheduler" or options.scheduler == "6":
-        scheduler = GreedyEasyBackfillScheduler(options.num_processors)
+    elif name == "GreedyEasyBackfillScheduler" or name == "6":
+        return GreedyEasyBackfillScheduler(num_processors)
 
-    elif options.scheduler == "EasyPlusPlusScheduler" or options.scheduler == "7":
-        scheduler = EasyPlusPlusScheduler(options.num_processors)
+    elif name == "EasyPlusPlusScheduler" or name == "7":
+        return EasyPlusPlusScheduler(num_processors)
         
-    elif options.scheduler == "ShrinkingEasyScheduler" or options.scheduler == "8":
-        scheduler = ShrinkingEasyScheduler(options.num_processors)
+    elif name == "ShrinkingEasyScheduler" or name == "8":
+        return ShrinkingEasyScheduler(num_processors)
 
-    elif options.scheduler == "LookAheadEasyBackFillScheduler" or options.scheduler == "9":
-        scheduler = LookAheadEasyBackFillScheduler(options.num_processors)
+    elif name == "LookAheadEasyBackFillScheduler" or name == "9":
+        return LookAheadEasyBackFillScheduler(num_processors)
 
-    elif options.scheduler == "EasySJBFScheduler" or options.scheduler == "10":
-        scheduler = EasySJBFScheduler(options.num_processors)
+    elif name == "EasySJBFScheduler" or name == "10":
+        return EasySJBFScheduler(num_processors)
 
-    elif options.scheduler == "HeadDoubleEasyScheduler" or options.scheduler == "11":
-        scheduler = HeadDoubleEasyScheduler(options.num_processors)
+    elif name == "HeadDoubleEasyScheduler" or name == "11":
+        return HeadDoubleEasyScheduler(num_processors)
         
-    elif options.scheduler == "TailDoubleEasyScheduler" or options.scheduler == "12":
-        scheduler = TailDoubleEasyScheduler(options.num_processors)
+    elif name == "TailDoubleEasyScheduler" or name == "12":
+        return TailDoubleEasyScheduler(num_processors)
 
-    elif options.scheduler == "OrigProbabilisticEasyScheduler" or options.scheduler == "13":
-        scheduler = OrigProbabilisticEasyScheduler(options.num_processors)    
+    elif name == "OrigProbabilisticEasyScheduler" or name == "13":
+        return OrigProbabilisticEasyScheduler(num_processors)    
 
-    elif options.scheduler == "ReverseEasyScheduler" or options.scheduler == "14":
-        scheduler = ReverseEasyScheduler(options.num_processors)
+    elif name == "ReverseEasyScheduler" or name == "14":
+        return ReverseEasyScheduler(num_processors)
         
-    elif options.scheduler == "PerfectEasyBackfillScheduler" or options.scheduler == "15":
-        scheduler = PerfectEasyBackfillScheduler(options.num_processors)
+    elif name == "PerfectEasyBackfillScheduler" or name == "15":
+        return PerfectEasyBackfillScheduler(num_processors)
         
-    elif options.scheduler == "DoublePerfectEasyBackfillScheduler" or options.scheduler == "16":
-        scheduler = DoublePerfectEasyBackfillScheduler(options.num_processors)
+    elif name == "DoublePerfectEasyBackfillScheduler" or name == "16":
+        return DoublePerfectEasyBackfillScheduler(num_processors)
 
-    elif options.scheduler == "AlphaEasyScheduler" or options.scheduler == "18":
-        scheduler = AlphaEasyScheduler(options.num_processors)
+    elif name == "AlphaEasyScheduler" or name == "18":
+        return AlphaEasyScheduler(num_processors)
 
-    elif options.scheduler == "CommonDistEasyPlusPlusScheduler" or options.scheduler == "28":
-        scheduler = CommonDistEasyPlusPlusScheduler(options.num_processors)
-        
+    elif name == "CommonDistEasyPlusPlusScheduler" or name == "28":
+        return CommonDistEasyPlusPlusScheduler(num_processors)
 
-    
+    return None
+
+def main():
+    options = parse_options()
+    dependencies = None
+    simulator = None
+
+    if options.resume is not None:
+        simulator, saved_options = load_checkpoint(options.resume)
+        saved_options.checkpoint = options.checkpoint
+        saved_options.checkpoint_interval = options.checkpoint_interval
+        options = saved_options
+
+    if simulator is not None and not simulator.stream_jobs:
+        jobs = None # all in the checkpoint
+    elif options.generate is not None:
+        generator = WorkloadGenerator(options.num_processors, options.seed)
+        if options.read_ahead:
+            jobs = jobs_of_tables(ReadAhead(generator.batches(options.generate), use_process=True), options.num_processors)
+        else:
+            jobs = generator.jobs(options.generate)
+    elif len(options.input_files) > 1:
+        job_inputs, num_processors = merged_input_job_inputs(options)
+        if options.num_processors is None:
+            if num_processors is None:
+                print "Missing num processors, and the input file headers have no MaxProcs"
+                return
+            options.num_processors = num_processors
+        jobs = _job_inputs_to_jobs(job_inputs, options.num_processors)
+        if options.read_ahead:
+            jobs = ReadAhead(jobs, batch_size=CHUNK_SIZE)
+    else:
+        if options.read_ahead:
+            header = read_input_header(options)
+        else:
+            table, header = load_input(options)
+
+            if not _is_windowed(options):
+                for message in header_mismatches(header, table):
+                    print >> sys.stderr, "Warning:", message
+
+        if options.num_processors is None:
+            if header.num_processors is None:
+                print "Missing num processors, and the input file header has no MaxProcs"
+                return
+            options.num_processors = header.num_processors
+
+        if options.scale_processors and header.num_processors is None:
+            print "Can't scale the processors, the input file header has no MaxProcs"
+            return
+
+        if options.read_ahead:
+            jobs = read_ahead_jobs(options, header)
+        else:
+            table = transform(table,
+                load_factor = options.load_factor,
+                from_num_processors = options.scale_processors and header.num_processors or None,
+                to_num_processors = options.num_processors,
+            )
+
+            if options.dependencies:
+                dependencies = table_dependencies(table)
+
+            jobs = table.jobs(options.num_processors)
+
+    if simulator is not None:
+        scheduler = simulator.scheduler
     else:
+        scheduler = make_scheduler(options.scheduler, options.num_processors)
+
+    what_if_schedulers = [make_scheduler(name, options.num_processors) for name in options.what_if]
+
+    if scheduler is None or None in what_if_schedulers:
         print "No such scheduler"
         return 
 
-    try:
-        print "...." 
-        run_simulator(
-                num_processors = options.num_processors, 
-                jobs = _job_inputs_to_jobs(parse_lines(input_file), options.num_processors),
-                scheduler = scheduler 
-            )
-        
-        print "Num of Processors: ", options.num_processors
-        print "Input file: ", options.input_file
-        print "Scheduler:", type(scheduler)
+    checkpointer = None
+    if options.checkpoint is not None:
+        checkpointer = Checkpointer(options.checkpoint, options.checkpoint_interval, getattr(signal, "SIGUSR1", None), context=options)
 
-    finally:
-        if input_file is not sys.stdin:
-            input_file.close()
+    print "...." 
+    try:
+        if simulator is not None:
+            resume_simulator(simulator, jobs, checkpointer)
+        elif options.fork_at is not None:
+            simulator = Simulator(jobs, options.num_processors, scheduler,
+                    dependencies = dependencies,
+                    heap_class = HEAP_CLASSES[options.event_queue],
+                    batch_events = options.batch_events,
+                    stream_jobs = options.stream_jobs,
+                )
+            reports = fork_simulator(simulator, options.fork_at, what_if_schedulers, options.batch_events)
+            for what_if_scheduler, report in zip(what_if_schedulers, reports):
+                print
+                print "From time %d, scheduler: %s" % (options.fork_at, type(what_if_scheduler))
+                if report is None:
+                    print "Failed, see the error above"
+                else:
+                    sys.stdout.write(report)
+        else:
+            run_simulator(
+                    num_processors = options.num_processors, 
+                    jobs = jobs,
+                    scheduler = scheduler,
+                    output_swf = options.output_swf,
+                    dependencies = dependencies,
+                    heap_class = HEAP_CLASSES[options.event_queue],
+                    batch_events = options.batch_events,
+                    stream_jobs = options.stream_jobs,
+                    checkpointer = checkpointer,
+                )
+    except UnsortedJobsError, e:
+        print >> sys.stderr, "Error: %s, run without --stream-jobs for an input that isn't sorted by submit time" % e
+        if options.output_swf is not None and os.path.exists(options.output_swf):
+            os.remove(options.output_swf) # half written
+        sys.exit(1)
+    
+    print "Num of Processors: ", options.num_processors
+    if options.generate is not None:
+        print "Synthetic jobs: %d, seed: %s" % (options.generate, options.seed)
+    else:
+        print "Input file: ", ", ".join(options.input_files)
+    if dependencies is not None:
+        print "Dependent jobs: ", len(dependencies)
+    print "Scheduler:", type(scheduler)
 
 
 if __name__ == "__main__" and not "time" in sys.modules:
@@ -1,4 +1,6 @@
 
+from base.prototype import JobSubmissionEvent, JobTerminationEvent
+
 def list_copy(my_list):
         result = []
         for i in my_list:
@@ -14,7 +16,14 @@ def list_print(my_list):
 class Scheduler(object):
     """
     Assumption: every handler returns a (possibly empty) collection of new events
+
+    handled_event_types are the types of the events the scheduler handles, a
+    scheduler that handles JobPredictionIsOverEvents (with
+    new_events_on_job_under_prediction) adds it. The simulator passes only
+    these events to it, and the other events aren't created.
     """
+    handled_event_types = (JobSubmissionEvent, JobTerminationEvent)
+
     def __init__(self, num_processors):
         self.num_processors = num_processors
 
@@ -24,6 +33,49 @@ class Scheduler(object):
     def new_events_on_job_termination(self, job, current_time):
         raise NotImplementedError()
 
+    def new_events_on_job_batch(self, submitted_jobs, terminated_jobs, current_time):
+        """
+        Called instead of the above, in the simulator's batching mode, with
+        all the jobs submitted and terminated at current_time. By default calls
+        them for every job, in the order of the events (submissions first), a
+        scheduler overrides it to schedule the waiting jobs only once.
+        """
+        result = []
+        for job in submitted_jobs:
+            result.extend(self.new_events_on_job_submission(job, current_time))
+        for job in terminated_jobs:
+            result.extend(self.new_events_on_job_termination(job, current_time))
+        return result
+
+    def adopt_running_jobs(self, jobs, current_time):
+        """
+        Called when the scheduler takes over a simulation in progress (see
+        Simulator.switch_scheduler), with the jobs running at current_time,
+        before the waiting jobs are submitted to it. By default assigns them
+        to self.cpu_snapshot, a scheduler that keeps other state on its
+        running jobs extends it.
+        """
+        for job in jobs:
+            self.cpu_snapshot.assignJob(job, job.start_to_run_at_time)
+        self.cpu_snapshot.archive_old_slices(current_time)
+
+    @classmethod
+    def batches_scheduling(cls):
+        """
+        true if new_events_on_job_batch schedules the batch at once, i.e. it's
+        overridden by the class that defines the single job handlers or by a
+        subclass of it. A subclass that overrides only a single job handler
+        (e.g. to set the predicted run times on submission) isn't batched.
+        """
+        def defining_class(name):
+            for klass in cls.__mro__:
+                if name in klass.__dict__:
+                    return klass
+        batch_class = defining_class("new_events_on_job_batch")
+        return batch_class is not Scheduler and \
+            issubclass(batch_class, defining_class("new_events_on_job_submission")) and \
+            issubclass(batch_class, defining_class("new_events_on_job_termination"))
+
 class CpuTimeSlice(object):
     """
     represents a "tentative feasible" snapshot of the cpu between the
@@ -23,6 +23,27 @@ class ConservativeScheduler(Scheduler):
         self.cpu_snapshot.delTailofJobFromCpuSlices(job)
         return self._reschedule_jobs(current_time)
 
+    def new_events_on_job_batch(self, submitted_jobs, terminated_jobs, current_time):
+        """ Deletes the tails of all the terminated jobs and reschedules the remaining
+        jobs once, then assigns the submitted jobs (which come last by submit time) """
+        self.cpu_snapshot.archive_old_slices(current_time)
+        for job in terminated_jobs:
+            self.unfinished_jobs_by_submit_time.remove(job)
+            self.cpu_snapshot.delTailofJobFromCpuSlices(job)
+        if terminated_jobs:
+            newEvents = self._reschedule_jobs(current_time)
+        else:
+            newEvents = []
+        for job in submitted_jobs:
+            self.unfinished_jobs_by_submit_time.append(job)
+            self.cpu_snapshot.assignJobEarliest(job, current_time)
+            newEvents.append( JobStartEvent(job.start_to_run_at_time, job) )
+        return newEvents
+
+    def adopt_running_jobs(self, jobs, current_time):
+        self.unfinished_jobs_by_submit_time.extend(jobs)
+        super(ConservativeScheduler, self).adopt_running_jobs(jobs, current_time)
+
     def _reschedule_jobs(self, current_time):
         newEvents = []
         for job in self.unfinished_jobs_by_submit_time:
@@ -1,5 +1,5 @@
 from common import Scheduler, CpuSnapshot, list_copy
-from base.prototype import JobStartEvent
+from base.prototype import JobStartEvent, JobPredictionIsOverEvent
 
 
 # shortest job first 
@@ -11,6 +11,7 @@ sjf_sort_key = (
 class  EasyPlusPlusScheduler(Scheduler):
     """ This algorithm implements the algorithm in the paper of Tsafrir, Etzion, Feitelson, june 2007?
     """
+    handled_event_types = Scheduler.handled_event_types + (JobPredictionIsOverEvent,)
     
     def __init__(self, num_processors):
         super(EasyPlusPlusScheduler, self).__init__(num_processors)
@@ -47,6 +48,13 @@ class  EasyPlusPlusScheduler(Scheduler):
         ]
 
 
+    def adopt_running_jobs(self, jobs, current_time):
+        for job in jobs:
+            self.user_run_time_prev.setdefault(job.user_id, None)
+            self.user_run_time_last.setdefault(job.user_id, None)
+        super(EasyPlusPlusScheduler, self).adopt_running_jobs(jobs, current_time)
+
+
     def new_events_on_job_under_prediction(self, job, current_time):
         assert job.predicted_run_time <= job.user_estimated_run_time
 
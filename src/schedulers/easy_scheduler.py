@@ -32,6 +32,18 @@ class EasyBackfillScheduler(Scheduler):
             for job in self._schedule_jobs(current_time)
         ]
 
+    def new_events_on_job_batch(self, submitted_jobs, terminated_jobs, current_time):
+        """ Deletes the tails of all the terminated jobs and adds all the submitted
+        jobs to the waiting list before scheduling, once for the whole batch """
+        self.cpu_snapshot.archive_old_slices(current_time)
+        for job in terminated_jobs:
+            self.cpu_snapshot.delTailofJobFromCpuSlices(job)
+        self.unscheduled_jobs.extend(submitted_jobs)
+        return [
+            JobStartEvent(current_time, job)
+            for job in self._schedule_jobs(current_time)
+        ]
+
     def _schedule_jobs(self, current_time):
         "Schedules jobs that can run right now, and returns them"
         jobs  = self._schedule_head_of_list(current_time)
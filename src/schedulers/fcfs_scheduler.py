@@ -24,6 +24,15 @@ class FcfsScheduler(Scheduler):
             for job in self._schedule_jobs(current_time)
         ]
 
+    def new_events_on_job_batch(self, submitted_jobs, terminated_jobs, current_time):
+        self.cpu_snapshot.archive_old_slices(current_time)
+        for job in terminated_jobs:
+            self.cpu_snapshot.delTailofJobFromCpuSlices(job)
+        self.waiting_queue_of_jobs.extend(submitted_jobs)
+        return [
+            JobStartEvent(current_time, job)
+            for job in self._schedule_jobs(current_time)
+        ]
 
     def _schedule_jobs(self, current_time):
         result = []
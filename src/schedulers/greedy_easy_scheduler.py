@@ -1,12 +1,28 @@
 from common import CpuSnapshot, list_copy
 from easy_scheduler import EasyBackfillScheduler
 
+# named functions rather than lambdas, so the scheduler can be pickled (see base/checkpoint.py)
+def reverse_submit_time_sort_key(job):
+    return -job.submit_time
+
+def submit_time_sort_key(job):
+    return job.submit_time
+
+def size_sort_key(job):
+    return job.num_required_processors
+
+def estimate_sort_key(job):
+    return job.user_estimated_run_time
+
+def area_sort_key(job):
+    return job.num_required_processors * job.user_estimated_run_time
+
 default_sort_key_functions = (
-    lambda job : -job.submit_time, # sort by reverse submission time
-    lambda job :  job.submit_time,
-    lambda job :  job.num_required_processors,
-    lambda job :  job.user_estimated_run_time,
-    lambda job :  job.num_required_processors * job.user_estimated_run_time,
+    reverse_submit_time_sort_key, # sort by reverse submission time
+    submit_time_sort_key,
+    size_sort_key,
+    estimate_sort_key,
+    area_sort_key,
 )
 
 def basic_score_function(list_of_jobs):
@@ -80,11 +96,14 @@ class  GreedyEasyBackfillScheduler(EasyBackfillScheduler):
         cpu_snapshot_with_job.assignJobEarliest(first_job, current_time + delay)
         tail =  list_copy(self.unscheduled_jobs[1:])
 
-        # get tail from best (score, tail) tuple
-        best_tail = max(
-            self._scored_tail(cpu_snapshot_with_job, sort_key_func, current_time, tail)
-            for sort_key_func in self.sort_key_functions
-        )[1]
+        # the tail of the best score, the first order wins a tie (comparing
+        # the tails would compare the jobs by their addresses, which differ
+        # from run to run, e.g. after resuming a checkpoint)
+        best_score = best_tail = None
+        for sort_key_func in self.sort_key_functions:
+            score, sorted_tail = self._scored_tail(cpu_snapshot_with_job, sort_key_func, current_time, tail)
+            if best_tail is None or score > best_score:
+                best_score, best_tail = score, sorted_tail
         
         return best_tail
 
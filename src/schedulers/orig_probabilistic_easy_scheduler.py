@@ -108,6 +108,23 @@ class  OrigProbabilisticEasyScheduler(Scheduler):
 
     def new_events_on_job_submission(self, job, current_time):
         # print "arrived:", job
+        self._add_job_to_distributions(job)
+        self.cpu_snapshot.archive_old_slices(current_time)
+        self.unscheduled_jobs.append(job)
+        return [
+            JobStartEvent(current_time, job)
+            for job in self._schedule_jobs(current_time)
+        ]
+
+
+    def adopt_running_jobs(self, jobs, current_time):
+        for job in jobs:
+            self._add_job_to_distributions(job)
+            self.currently_running_jobs.append(job)
+        super(OrigProbabilisticEasyScheduler, self).adopt_running_jobs(jobs, current_time)
+
+
+    def _add_job_to_distributions(self, job):
         rounded_up_estimated_time = _round_time_up(job.user_estimated_run_time)
 
         if  rounded_up_estimated_time > self.max_user_rounded_estimated_run_time:
@@ -121,13 +138,6 @@ class  OrigProbabilisticEasyScheduler(Scheduler):
         if  self.prev_max_user_rounded_estimated_run_time < self.max_user_rounded_estimated_run_time:
             for tmp_job in self.currently_running_jobs:
                 self.user_distribution[tmp_job.user_id].touch(2*self.max_user_rounded_estimated_run_time)
-              
-        self.cpu_snapshot.archive_old_slices(current_time)
-        self.unscheduled_jobs.append(job)
-        return [
-            JobStartEvent(current_time, job)
-            for job in self._schedule_jobs(current_time)
-        ]
 
 
     def new_events_on_job_termination(self, job, current_time):
@@ -1,9 +1,11 @@
 from common import CpuSnapshot
 from easy_scheduler import EasyBackfillScheduler
+from base.prototype import JobPredictionIsOverEvent
 
 class  ShrinkingEasyScheduler(EasyBackfillScheduler):
     """ This "toy" algorithm follows an the paper of Tsafrir, Etzion, Feitelson, june 2007
     """
+    handled_event_types = EasyBackfillScheduler.handled_event_types + (JobPredictionIsOverEvent,)
     
     def __init__(self, num_processors):
         super(ShrinkingEasyScheduler, self).__init__(num_processors)
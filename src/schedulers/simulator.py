@@ -1,60 +1,277 @@
 #!/usr/bin/env python2.4
 
-from base.prototype import JobSubmissionEvent, JobTerminationEvent, JobPredictionIsOverEvent
+from base.prototype import JobSubmissionEvent, JobTerminationEvent, JobPredictionIsOverEvent, JobStartEvent
 from base.prototype import ValidatingMachine
 from base.event_queue import EventQueue
+from base.simple_heap import Heap
+from base.swf_writer import SwfWriter
 from common import CpuSnapshot, list_print
 
-from easy_plus_plus_scheduler import EasyPlusPlusScheduler
-from shrinking_easy_scheduler import ShrinkingEasyScheduler
-
+import os
 import sys
+from array import array
+from collections import deque
+
+class UnsortedJobsError(ValueError):
+    "a streamed job is submitted before the job before it"
+
+class TerminatedJobs(object):
+    """
+    The fields of the terminated jobs the statistics need, in the order they
+    terminated (by finish time), in an array per field: 48 bytes per job
+    instead of its Job object. The times are doubles, like the times of the
+    jobs can be.
+    """
+    FIELDS = ("finish_time", "start_to_run_at_time", "submit_time", "actual_run_time",
+        "user_estimated_run_time", "num_required_processors")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('d'))
+
+    def append(self, job):
+        self.finish_time.append(job.finish_time)
+        self.start_to_run_at_time.append(job.start_to_run_at_time)
+        self.submit_time.append(job.submit_time)
+        self.actual_run_time.append(job.actual_run_time)
+        self.user_estimated_run_time.append(job.user_estimated_run_time)
+        self.num_required_processors.append(job.num_required_processors)
+
+    def __len__(self):
+        return len(self.finish_time)
+
+    def submitted_since(self, time):
+        "the jobs submitted at time or after it, as a new TerminatedJobs"
+        result = TerminatedJobs()
+        indices = [i for (i, submit_time) in enumerate(self.submit_time) if submit_time >= time]
+        for name in self.FIELDS:
+            column = getattr(self, name)
+            getattr(result, name).extend([column[i] for i in indices])
+        return result
 
 class Simulator(object):
     """
     Assumption 1: The simulation clock goes only forward. Specifically,
     an event on time t can only produce future events with time t' = t or t' > t.
-    Assumption 2: self.jobs holds every job that was introduced to the simulation.
+    Assumption 2: self.jobs holds every job that was introduced to the simulation
+    (unless the jobs are streamed, see below).
+
+    If stream_jobs is true, jobs is an iterator sorted by submit time (as the
+    SWF files are), and instead of queueing all the submissions up front the
+    simulator queues only the next one, and pulls the job after it from the
+    iterator when it's handled. The event queue then holds the events of the
+    queued and running jobs only, and the jobs aren't kept in self.jobs
+    (None), so the memory doesn't grow with the length of the trace but for
+    self.terminated_jobs, which keeps only the fields the statistics need
+    (see TerminatedJobs). A job submitted before the job before it raises
+    UnsortedJobsError.
+
+    If an SwfWriter is given, every job is written to it when it terminates.
+
+    If JobDependencies (see base/workload_dependencies.py) are given, the
+    dependent jobs are held until their predecessor terminates, and then
+    submitted after their think time instead of at their submit time.
+
+    When a scheduler reschedules a job whose start event is still queued, the
+    old start event is cancelled (see EventQueue.cancel_event). Most starts
+    are at the time of the event that triggered them, and are dispatched
+    without going through the queue when that keeps the order of the events.
+
+    heap_class is the event queue's heap implementation (see EventQueue).
+
+    If batch_events is true and the scheduler batches its scheduling (see
+    Scheduler.batches_scheduling), the submissions and terminations that share
+    a timestamp are handled as one batch: the scheduler is called once, after
+    the last of them, with new_events_on_job_batch(). The batch is treated as
+    simultaneous, so a job submitted at the same time as a termination can use
+    its processors, and the schedules can differ from the unbatched ones.
+
+    For what-if runs, run_until() stops the simulation at a time, and
+    switch_scheduler() hands it over to another scheduler from there (see
+    fork_simulator()).
     """
 
-    def __init__(self, jobs, num_processors, scheduler):
+    def __init__(self, jobs, num_processors, scheduler, swf_writer=None, dependencies=None, heap_class=Heap, batch_events=False, stream_jobs=False):
         self.num_processors = num_processors
-        self.jobs = jobs
-        self.terminated_jobs=[]
+        self.stream_jobs = stream_jobs
+        self.num_streamed_jobs = 0 # pulled from the stream so far
+        if stream_jobs:
+            self.jobs = None
+            self.job_stream = iter(jobs)
+        else:
+            self.jobs = jobs
+            self.job_stream = None
+        self.streamed_jobs = deque() # pulled from the stream and not held, not submitted yet
+        self.latest_streamed_submit_time = None
+        self.terminated_jobs = TerminatedJobs()
+        self.unfinished_jobs = set() # submitted and not terminated, waiting or running
         self.scheduler = scheduler
+        self.swf_writer = swf_writer
+        self.dependencies = dependencies
+        self.held_jobs = {} # number -> dependent job waiting for its predecessor
+        self.start_events = {} # job -> its latest start event, until it terminates
         self.time_of_last_job_submission = 0
-        self.event_queue = EventQueue()
+        self.event_queue = EventQueue(heap_class)
+        self.batch_events = batch_events and scheduler.batches_scheduling()
+        self.batch_submitted_jobs = []
+        self.batch_terminated_jobs = []
 
         self.machine = ValidatingMachine(num_processors=num_processors, event_queue=self.event_queue)
 
         self.event_queue.add_handler(JobSubmissionEvent, self.handle_submission_event)
         self.event_queue.add_handler(JobTerminationEvent, self.handle_termination_event)
 
-        if isinstance(scheduler, EasyPlusPlusScheduler) or isinstance(scheduler, ShrinkingEasyScheduler):
+        if JobPredictionIsOverEvent in scheduler.handled_event_types:
             self.event_queue.add_handler(JobPredictionIsOverEvent, self.handle_prediction_event)
             
-        for job in self.jobs:
-            self.event_queue.add_event( JobSubmissionEvent(job.submit_time, job) )
-        
+        if stream_jobs:
+            self.submit_next_streamed_job()
+        else:
+            for job in self.jobs:
+                if self.is_dependent(job):
+                    self.held_jobs[job.id] = job
+                    continue
+                self.event_queue.add_event( JobSubmissionEvent(job.submit_time, job) )
+
+    def read_streamed_job(self):
+        """
+        pulls the next job from the stream, and holds it if it's a dependent
+        job. Returns False at the end of the stream.
+        """
+        try:
+            job = self.job_stream.next()
+        except StopIteration:
+            return False
+        self.num_streamed_jobs += 1
+        if self.latest_streamed_submit_time is not None and job.submit_time < self.latest_streamed_submit_time:
+            raise UnsortedJobsError("job %s is submitted at %s, before the job before it (at %s)" % \
+                (job.id, job.submit_time, self.latest_streamed_submit_time))
+        self.latest_streamed_submit_time = job.submit_time
+        if self.is_dependent(job):
+            self.held_jobs[job.id] = job
+        else:
+            self.streamed_jobs.append(job)
+        return True
+
+    def submit_next_streamed_job(self):
+        "queues the submission of the next streamed job, if there's one"
+        while not self.streamed_jobs:
+            if not self.read_streamed_job():
+                return
+        job = self.streamed_jobs.popleft()
+        self.event_queue.add_event( JobSubmissionEvent(job.submit_time, job) )
+
+    def __getstate__(self):
+        """
+        for checkpoints (see base/checkpoint.py): the job stream is replaced
+        by num_streamed_jobs, and an iterator of jobs already queued isn't kept
+        """
+        state = self.__dict__.copy()
+        state["job_stream"] = None
+        if not isinstance(self.jobs, list):
+            state["jobs"] = None
+        return state
+
+    def resume_stream(self, jobs):
+        """
+        after a checkpoint is loaded, continues streaming the jobs from where
+        the checkpoint was saved. jobs must be the jobs the simulation started
+        with, from the first one.
+        """
+        assert self.stream_jobs
+        self.job_stream = iter(jobs)
+        for i in xrange(self.num_streamed_jobs):
+            self.job_stream.next()
+
+    def read_stream_to_end(self):
+        "pulls the rest of the job stream, e.g. before forking (the processes can't share an open input)"
+        if self.job_stream is not None:
+            while self.read_streamed_job():
+                pass
 
     def handle_submission_event(self, event):
         assert isinstance(event, JobSubmissionEvent)
         self.time_of_last_job_submission = event.timestamp
+        self.unfinished_jobs.add(event.job)
+        if self.job_stream is not None and not self.is_dependent(event.job):
+            # the next job of the stream, a dependent job isn't part of it
+            self.submit_next_streamed_job()
+        if self.batch_events:
+            self.batch_submitted_jobs.append(event.job)
+            self.end_batch_if_last(event.timestamp)
+            return
         newEvents = self.scheduler.new_events_on_job_submission(event.job, event.timestamp)
-        for event in newEvents:
-            self.event_queue.add_event(event)
+        self.add_scheduler_events(newEvents, event.timestamp)
 
     def handle_termination_event(self, event):
         assert isinstance(event, JobTerminationEvent)
-        newEvents = self.scheduler.new_events_on_job_termination(event.job, event.timestamp)
+        if not self.batch_events:
+            newEvents = self.scheduler.new_events_on_job_termination(event.job, event.timestamp)
         self.terminated_jobs.append(event.job)
-        for event in newEvents:
-            self.event_queue.add_event(event)
+        self.unfinished_jobs.remove(event.job)
+        del self.start_events[event.job]
+        if self.swf_writer is not None:
+            self.swf_writer.write_job(event.job)
+        if self.dependencies is not None:
+            self.submit_dependents(event.job, event.timestamp)
+        if self.batch_events:
+            self.batch_terminated_jobs.append(event.job)
+            self.end_batch_if_last(event.timestamp)
+            return
+        self.add_scheduler_events(newEvents, event.timestamp)
+
+    def end_batch_if_last(self, timestamp):
+        """
+        calls the scheduler with the batch, unless the next event is another
+        submission or termination at timestamp (including the submissions of
+        dependents just released, which are queued before the terminations)
+        """
+        next_event = self.event_queue.peek()
+        if next_event is not None and next_event.timestamp == timestamp and \
+                type(next_event) in (JobSubmissionEvent, JobTerminationEvent):
+            return
+        submitted_jobs, terminated_jobs = self.batch_submitted_jobs, self.batch_terminated_jobs
+        self.batch_submitted_jobs, self.batch_terminated_jobs = [], []
+        newEvents = self.scheduler.new_events_on_job_batch(submitted_jobs, terminated_jobs, timestamp)
+        self.add_scheduler_events(newEvents, timestamp)
+
+    def is_dependent(self, job):
+        return self.dependencies is not None and self.dependencies.is_dependent(job.id)
+
+    def submit_dependents(self, job, timestamp):
+        """
+        submits the held jobs that depend on the job that terminated at
+        timestamp. A streamed dependent job may not have been pulled yet (it's
+        logged after the termination), the stream is read ahead up to it.
+        """
+        for number, think_time in self.dependencies.release(job.id):
+            while number not in self.held_jobs and self.read_streamed_job():
+                pass
+            dependent = self.held_jobs.pop(number)
+            dependent.submit_time = timestamp + think_time
+            self.event_queue.add_event( JobSubmissionEvent(dependent.submit_time, dependent) )
 
     def handle_prediction_event(self, event):
         assert isinstance(event, JobPredictionIsOverEvent)
         newEvents = self.scheduler.new_events_on_job_under_prediction(event.job, event.timestamp)
-        for event in newEvents:
+        self.add_scheduler_events(newEvents, event.timestamp)
+
+    def add_scheduler_events(self, events, current_time):
+        """
+        queues the events, cancelling the start events they supersede. A job
+        start at current_time is dispatched to the machine right away if no
+        queued event comes before it (see EventQueue.dispatch_event), it's
+        called last by the handlers.
+        """
+        for event in events:
+            if type(event) is JobStartEvent:
+                previous = self.start_events.get(event.job)
+                if previous is not None:
+                    self.event_queue.cancel_event(previous)
+                self.start_events[event.job] = event
+                if event.timestamp == current_time:
+                    self.event_queue.dispatch_event(event)
+                    continue
             self.event_queue.add_event(event)
 
             
@@ -62,31 +279,220 @@ class Simulator(object):
         while not self.event_queue.is_empty:
             self.event_queue.advance()
 
-def run_simulator(num_processors, jobs, scheduler):
-    simulator = Simulator(jobs, num_processors, scheduler)
-    simulator.run()
+    def run_until(self, time):
+        "handles the events before time, the events at time and after it stay queued"
+        event_queue = self.event_queue
+        while True:
+            next_event = event_queue.peek()
+            if next_event is None or next_event.timestamp >= time:
+                return
+            event_queue.advance()
+
+    def switch_scheduler(self, scheduler, current_time, batch_events=False):
+        """
+        Hands the simulation over to scheduler at current_time, before its
+        events are handled (e.g. after run_until(current_time)). The new
+        scheduler adopts the running jobs (see Scheduler.adopt_running_jobs),
+        and the waiting jobs are submitted to it again at current_time, in
+        the order of their submission, their planned starts are cancelled.
+
+        The running jobs' predictions are kept only if the new scheduler
+        handles JobPredictionIsOverEvents, and are the estimates otherwise.
+        The state the old scheduler learned from the jobs before (e.g.
+        EASY++'s run times of the users) is lost.
+        """
+        assert not self.batch_submitted_jobs and not self.batch_terminated_jobs
+        event_queue = self.event_queue
+        running_jobs = sorted(self.machine.jobs, key=lambda job: (job.start_to_run_at_time, job.id))
+        waiting_jobs = sorted(self.unfinished_jobs.difference(self.machine.jobs), key=lambda job: (job.submit_time, job.id))
+
+        for job in waiting_jobs:
+            start_event = self.start_events.pop(job, None)
+            if start_event is not None:
+                event_queue.cancel_event(start_event)
+            job.start_to_run_at_time = -1
+            job.predicted_run_time = job.user_estimated_run_time
+
+        handles_predictions = JobPredictionIsOverEvent in scheduler.handled_event_types
+        prediction_events = dict(
+            (event.job, event) for event in event_queue.events if type(event) is JobPredictionIsOverEvent
+        )
+        for job in running_jobs:
+            prediction_event = prediction_events.get(job)
+            if not handles_predictions:
+                if prediction_event is not None:
+                    event_queue.cancel_event(prediction_event)
+                job.predicted_run_time = job.user_estimated_run_time
+            elif prediction_event is None and job.predicted_run_time < job.actual_run_time:
+                # predicted by a scheduler that didn't handle its end
+                if job.predicted_finish_time >= current_time:
+                    event_queue.add_event( JobPredictionIsOverEvent(job.predicted_finish_time, job) )
+                else:
+                    job.predicted_run_time = job.user_estimated_run_time
+
+        if handles_predictions and not event_queue.has_handler(JobPredictionIsOverEvent):
+            event_queue.add_handler(JobPredictionIsOverEvent, self.handle_prediction_event)
+        elif not handles_predictions and event_queue.has_handler(JobPredictionIsOverEvent):
+            event_queue.remove_handler(JobPredictionIsOverEvent, self.handle_prediction_event)
+
+        self.scheduler = scheduler
+        self.batch_events = batch_events and scheduler.batches_scheduling()
+        scheduler.adopt_running_jobs(running_jobs, current_time)
+        if self.batch_events:
+            newEvents = scheduler.new_events_on_job_batch(waiting_jobs, [], current_time)
+            self.add_scheduler_events(newEvents, current_time)
+        else:
+            for job in waiting_jobs:
+                newEvents = scheduler.new_events_on_job_submission(job, current_time)
+                self.add_scheduler_events(newEvents, current_time)
+
+    def run_with_checkpoints(self, checkpointer):
+        "like run(), and lets the Checkpointer (see base/checkpoint.py) save the simulator after every event"
+        while not self.event_queue.is_empty:
+            self.event_queue.advance()
+            checkpointer.event_handled(self)
+
+def run_simulator(num_processors, jobs, scheduler, output_swf=None, dependencies=None, heap_class=Heap, batch_events=False, stream_jobs=False, checkpointer=None):
+    """
+    If output_swf (a file name) is given, the simulated schedule is written
+    to it in the standard workload format, in the order the jobs terminated.
+    If JobDependencies are given, dependent jobs are submitted at their
+    predecessor's termination plus their think time (see Simulator).
+    heap_class is the event queue's heap implementation (see EventQueue).
+    If batch_events is true, the events sharing a timestamp are scheduled at
+    once, and if stream_jobs is true the jobs (sorted by submit time) are
+    pulled from their iterator as the simulation reaches them (see Simulator).
+    If a Checkpointer is given, the simulator is saved to checkpoints while it
+    runs, see resume_simulator().
+    """
+    if output_swf is None:
+        swf_writer = None
+    else:
+        swf_writer = SwfWriter(open(output_swf, "w"))
+        swf_writer.write_header([
+            "Note: simulated schedule, scheduler: %s" % type(scheduler).__name__,
+            "MaxProcs: %d" % num_processors,
+        ])
+
+    try:
+        simulator = Simulator(jobs, num_processors, scheduler, swf_writer, dependencies, heap_class, batch_events, stream_jobs)
+        _run(simulator, checkpointer)
+    finally:
+        if swf_writer is not None:
+            swf_writer.close()
+
     print_simulator_stats(simulator)
     return simulator
 
-def print_simulator_stats(simulator):
-    simulator.scheduler.cpu_snapshot._restore_old_slices()
-    # simulator.scheduler.cpu_snapshot.printCpuSlices()
-    print_statistics(simulator.terminated_jobs, simulator.time_of_last_job_submission)
+def resume_simulator(simulator, jobs=None, checkpointer=None):
+    """
+    Continues running a simulator loaded from a checkpoint (with
+    base.checkpoint.load_checkpoint) to the end, with the same results as
+    the run that saved it. If the simulator streams its jobs, jobs are the
+    jobs it started with (see Simulator.resume_stream).
+    """
+    if simulator.stream_jobs:
+        simulator.resume_stream(jobs)
+    try:
+        _run(simulator, checkpointer)
+    finally:
+        if simulator.swf_writer is not None:
+            simulator.swf_writer.close()
 
-# increasing order 
-by_finish_time_sort_key   = (
-    lambda job : job.finish_time
-)
+    print_simulator_stats(simulator)
+    return simulator
 
-# decreasing order   
-#sort by: bounded slow down == max(1, (float(wait_time + run_time)/ max(run_time, 10))) 
-by_bounded_slow_down_sort_key = (
-    lambda job : -max(1, (float(job.start_to_run_at_time - job.submit_time + job.actual_run_time)/max(job.actual_run_time, 10)))
-)
+def _run(simulator, checkpointer):
+    if checkpointer is None:
+        simulator.run()
+    else:
+        simulator.run_with_checkpoints(checkpointer)
+
+def fork_simulator(simulator, fork_time, schedulers, batch_events=False):
+    """
+    What-if runs: runs the simulator to fork_time, and then forks a child
+    process for every scheduler (other policies, or a policy with other
+    parameters), which takes the simulation over from there (see
+    Simulator.switch_scheduler) and runs it to the end. The common prefix is
+    simulated once, and the children share its state copy-on-write. The rest
+    of a job stream is read before forking.
+
+    Returns the statistics each child printed, of the jobs submitted at
+    fork_time or after it, in the order of the schedulers (None if a child
+    failed, its traceback goes to stderr). Needs os.fork (unix).
+    """
+    if simulator.swf_writer is not None:
+        raise ValueError("the forked simulations can't write to the same output file")
+    simulator.run_until(fork_time)
+    simulator.read_stream_to_end()
+
+    children = []
+    for scheduler in schedulers:
+        read_fd, write_fd = os.pipe()
+        sys.stdout.flush() # or the child prints it again
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _run_forked(simulator, fork_time, scheduler, batch_events, write_fd)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    reports = []
+    for pid, read_fd in children:
+        output = os.fdopen(read_fd)
+        report = output.read()
+        output.close()
+        pid, status = os.waitpid(pid, 0)
+        if status != 0:
+            report = None
+        reports.append(report)
+    return reports
+
+def _run_forked(simulator, fork_time, scheduler, batch_events, output_fd):
+    "the child of fork_simulator(), prints its statistics to output_fd and exits"
+    status = 1
+    try:
+        try:
+            sys.stdout = os.fdopen(output_fd, "w")
+            simulator.switch_scheduler(scheduler, fork_time, batch_events)
+            simulator.run()
+            print_simulator_stats(simulator, fork_time)
+            sys.stdout.flush()
+            status = 0
+        except:
+            import traceback
+            traceback.print_exc()
+    finally:
+        os._exit(status) # not the parent's cleanups
+
+def print_simulator_stats(simulator, submitted_since=None):
+    "the statistics of the terminated jobs, or of those submitted at submitted_since or after it"
+    simulator.scheduler.cpu_snapshot._restore_old_slices()
+    # simulator.scheduler.cpu_snapshot.printCpuSlices()
+    jobs = simulator.terminated_jobs
+    if submitted_since is not None:
+        jobs = jobs.submitted_since(submitted_since)
+    print_statistics(jobs, simulator.time_of_last_job_submission)
 
-    
 def print_statistics(jobs, time_of_last_job_submission):
+    "jobs is a TerminatedJobs, its rows are visited by index"
     assert jobs is not None, "Input file is probably empty."
+
+    finish_times = jobs.finish_time
+    start_times = jobs.start_to_run_at_time
+    submit_times = jobs.submit_time
+    run_times = jobs.actual_run_time
+    estimated_run_times = jobs.user_estimated_run_time
+    sizes = jobs.num_required_processors
+
+    # increasing order
+    def by_finish_time_sort_key(i):
+        return finish_times[i]
+
+    # decreasing order
+    #sort by: bounded slow down == max(1, (float(wait_time + run_time)/ max(run_time, 10)))
+    def by_bounded_slow_down_sort_key(i):
+        return -max(1, (float(start_times[i] - submit_times[i] + run_times[i])/max(run_times[i], 10)))
     
     sum_waits     = 0
     sum_run_times = 0
@@ -101,11 +507,11 @@ def print_statistics(jobs, time_of_last_job_submission):
     size = len(jobs)
     precent_of_size = int(size / 100)
     
-    for job in sorted(jobs, key=by_finish_time_sort_key):
+    for i in sorted(xrange(len(jobs)), key=by_finish_time_sort_key):
         
         tmp_counter += 1
 
-        if job.user_estimated_run_time == 1 and job.num_required_processors == 1: # ignore tiny jobs for the statistics
+        if estimated_run_times[i] == 1 and sizes[i] == 1: # ignore tiny jobs for the statistics
             size -= 1
             precent_of_size = int(size / 100)
             continue
@@ -113,14 +519,14 @@ def print_statistics(jobs, time_of_last_job_submission):
         if size >= 100 and tmp_counter <= precent_of_size:
             continue
         
-        if job.finish_time > time_of_last_job_submission:
+        if finish_times[i] > time_of_last_job_submission:
             break 
         
         counter += 1
         
-        wait_time = float(job.start_to_run_at_time - job.submit_time)
-        run_time  = float(job.actual_run_time)
-        estimated_run_time = float(job.user_estimated_run_time)
+        wait_time = float(start_times[i] - submit_times[i])
+        run_time  = float(run_times[i])
+        estimated_run_time = float(estimated_run_times[i])
 
 
         sum_waits += wait_time
@@ -136,9 +542,9 @@ def print_statistics(jobs, time_of_last_job_submission):
     sum_percentile_tail_slowdowns = 0.0
     percentile_counter = counter
     
-    for job in sorted(jobs, key=by_bounded_slow_down_sort_key):
-        wait_time = float(job.start_to_run_at_time - job.submit_time)
-        run_time  = float(job.actual_run_time)
+    for i in sorted(xrange(len(jobs)), key=by_bounded_slow_down_sort_key):
+        wait_time = float(start_times[i] - submit_times[i])
+        run_time  = float(run_times[i])
         sum_percentile_tail_slowdowns += float(wait_time + run_time) / run_time
         percentile_counter -= 1 # decreamenting the counter 
         if percentile_counter < (0.9 * counter):
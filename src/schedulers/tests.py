@@ -3,7 +3,7 @@
 import unittest
 import os
 
-from simulator import run_simulator
+from simulator import Simulator, run_simulator, resume_simulator, fork_simulator, print_simulator_stats, UnsortedJobsError
 from base.prototype import Job
 
 from fcfs_scheduler import FcfsScheduler
@@ -580,6 +580,285 @@ class test_Simulator(unittest.TestCase):
 
 
 
+    def test_greedy_score_tie(self):
+        from greedy_easy_scheduler import estimate_sort_key, submit_time_sort_key
+        jobs = [
+            Job(id=1, user_estimated_run_time=100, actual_run_time=100, num_required_processors=NUM_PROCESSORS, submit_time=0),
+            Job(id=2, user_estimated_run_time=30, actual_run_time=30, num_required_processors=1, submit_time=1),
+            Job(id=3, user_estimated_run_time=20, actual_run_time=20, num_required_processors=1, submit_time=2),
+            Job(id=4, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=3),
+        ]
+        for sort_key_functions, expected in (
+                ((estimate_sort_key, submit_time_sort_key), [4, 3, 2]),
+                ((submit_time_sort_key, estimate_sort_key), [2, 3, 4]),
+            ):
+            scheduler = GreedyEasyBackfillScheduler(NUM_PROCESSORS, sort_key_functions, lambda jobs: 0)
+            scheduler.unscheduled_jobs = list(jobs)
+            # every order scores the same, the first one wins
+            self.assertEqual(expected, [job.id for job in scheduler._reorder_jobs_in_approximate_best_order(0)])
+
+    def test_output_swf(self):
+        import tempfile, shutil
+        directory = tempfile.mkdtemp()
+        try:
+            output_swf = os.path.join(directory, "schedule.swf")
+            simulator = run_simulator(
+                num_processors = NUM_PROCESSORS,
+                jobs = parse_jobs_test_input(INPUT_FILE_DIR + "/basic_input.4"),
+                scheduler = EasyBackfillScheduler(NUM_PROCESSORS),
+                output_swf = output_swf,
+            )
+            records = [line.split() for line in open(output_swf) if not line.startswith(';')]
+            self.assertEqual(len(simulator.jobs), len(records))
+            jobs_by_id = dict((str(job.id), job) for job in simulator.jobs)
+            for fields in records:
+                job = jobs_by_id[fields[0]]
+                self.assertEqual(job.submit_time, int(fields[1]))
+                self.assertEqual(job.start_to_run_at_time - job.submit_time, int(fields[2]))
+                self.assertEqual(job.actual_run_time, int(fields[3]))
+            terminated = simulator.terminated_jobs
+            self.assertEqual([float(fields[1]) for fields in records], list(terminated.submit_time))
+            self.assertEqual([float(fields[1]) + float(fields[2]) for fields in records], list(terminated.start_to_run_at_time))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_dependencies(self):
+        from base.workload_dependencies import JobDependencies
+        jobs = [
+            Job(id=1, user_estimated_run_time=100, actual_run_time=50, num_required_processors=NUM_PROCESSORS, submit_time=0),
+            Job(id=2, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=0),
+            Job(id=3, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=5),
+        ]
+        dependencies = JobDependencies()
+        dependencies.add(2, 1, 20)
+        dependencies.add(3, 2, -1)
+        simulator = run_simulator(
+            num_processors = NUM_PROCESSORS,
+            jobs = jobs,
+            scheduler = FcfsScheduler(NUM_PROCESSORS),
+            dependencies = dependencies,
+        )
+        self.assertEqual([50, 80, 90], list(simulator.terminated_jobs.finish_time))
+        self.assertEqual(70, jobs[1].submit_time) # job 1's termination + think time
+        self.assertEqual(80, jobs[2].submit_time) # a missing think time is 0
+        self.assertEqual(90, jobs[2].finish_time)
+        self.assertEqual({}, simulator.held_jobs)
+
+    def test_stream_jobs(self):
+        for scheduler_class in (FcfsScheduler, EasyBackfillScheduler, EasyPlusPlusScheduler):
+            for i in range(10):
+                jobs = parse_jobs_test_input(INPUT_FILE_DIR + "/basic_input." + str(i))
+                simulator = run_simulator(
+                    num_processors = NUM_PROCESSORS,
+                    jobs = iter(jobs),
+                    scheduler = scheduler_class(NUM_PROCESSORS),
+                    stream_jobs = True,
+                )
+                self.failUnless(simulator.jobs is None)
+                self.assertEqual(len(jobs), len(simulator.terminated_jobs))
+                feasibility_check_of_cpu_snapshot(jobs, simulator.scheduler.cpu_snapshot)
+                for job in jobs:
+                    self.assertEqual(int(float(job.id)), job.finish_time, scheduler_class.__name__+" i="+str(i)+" "+str(job))
+
+    def test_terminated_jobs(self):
+        jobs = [
+            Job(id=1, user_estimated_run_time=20, actual_run_time=10, num_required_processors=NUM_PROCESSORS, submit_time=0),
+            Job(id=2, user_estimated_run_time=30, actual_run_time=30, num_required_processors=2, submit_time=5),
+        ]
+        simulator = run_simulator(num_processors=NUM_PROCESSORS, jobs=jobs, scheduler=FcfsScheduler(NUM_PROCESSORS))
+        terminated = simulator.terminated_jobs
+        self.assertEqual([10, 40], list(terminated.finish_time))
+        self.assertEqual([0, 10], list(terminated.start_to_run_at_time))
+        self.assertEqual([20, 30], list(terminated.user_estimated_run_time))
+        self.assertEqual([NUM_PROCESSORS, 2], list(terminated.num_required_processors))
+        since = terminated.submitted_since(5)
+        self.assertEqual(1, len(since))
+        self.assertEqual([5], list(since.submit_time))
+        self.assertEqual([30], list(since.actual_run_time))
+
+    def test_stream_unsorted_jobs(self):
+        jobs = [
+            Job(id=1, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=10),
+            Job(id=2, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=5),
+        ]
+        self.assertRaises(UnsortedJobsError, run_simulator,
+            num_processors=NUM_PROCESSORS, jobs=jobs, scheduler=FcfsScheduler(NUM_PROCESSORS), stream_jobs=True)
+
+    def test_stream_dependencies(self):
+        from base.workload_dependencies import JobDependencies
+        jobs = [
+            Job(id=1, user_estimated_run_time=100, actual_run_time=50, num_required_processors=NUM_PROCESSORS, submit_time=0),
+            Job(id=2, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=0),
+            Job(id=3, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=100),
+            Job(id=4, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=200),
+        ]
+        dependencies = JobDependencies()
+        dependencies.add(2, 1, 20)
+        dependencies.add(4, 2, 5) # released at 85, before it's read from the stream
+        simulator = run_simulator(
+            num_processors = NUM_PROCESSORS,
+            jobs = iter(jobs),
+            scheduler = FcfsScheduler(NUM_PROCESSORS),
+            dependencies = dependencies,
+            stream_jobs = True,
+        )
+        self.assertEqual([50, 80, 95, 110], list(simulator.terminated_jobs.finish_time)) # jobs 1, 2, 4 and 3
+        self.assertEqual([0, 70, 100, 85], [job.submit_time for job in jobs])
+        self.assertEqual({}, simulator.held_jobs)
+
+    def test_checkpoint_resume(self):
+        import tempfile, shutil
+        from base.checkpoint import Checkpointer, load_checkpoint
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, "checkpoint")
+            input_file = INPUT_FILE_DIR + "/basic_input.5"
+            for scheduler_class in (ConservativeScheduler, EasyPlusPlusScheduler, OrigProbabilisticEasyScheduler):
+                for stream_jobs in (False, True):
+                    simulator = run_simulator(
+                        num_processors = NUM_PROCESSORS,
+                        jobs = iter(parse_jobs_test_input(input_file)),
+                        scheduler = scheduler_class(NUM_PROCESSORS),
+                        stream_jobs = stream_jobs,
+                        checkpointer = Checkpointer(file_name, interval=5),
+                    )
+                    expected = zip(simulator.terminated_jobs.submit_time, simulator.terminated_jobs.start_to_run_at_time)
+
+                    simulator, context = load_checkpoint(file_name)
+                    self.failUnless(len(simulator.terminated_jobs) < len(expected))
+                    resume_simulator(simulator, iter(parse_jobs_test_input(input_file)))
+                    self.assertEqual(expected, zip(simulator.terminated_jobs.submit_time, simulator.terminated_jobs.start_to_run_at_time))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_switch_scheduler(self):
+        from base.prototype import JobPredictionIsOverEvent
+        scheduler_classes = (FcfsScheduler, ConservativeScheduler, EasyBackfillScheduler, EasyPlusPlusScheduler)
+        for i in range(10):
+            jobs = parse_jobs_test_input(INPUT_FILE_DIR + "/basic_input." + str(i))
+            switch_time = jobs[len(jobs) // 2].submit_time
+            for scheduler_class in scheduler_classes:
+                for new_scheduler_class in scheduler_classes:
+                    jobs = parse_jobs_test_input(INPUT_FILE_DIR + "/basic_input." + str(i))
+                    simulator = Simulator(jobs, NUM_PROCESSORS, scheduler_class(NUM_PROCESSORS))
+                    simulator.run_until(switch_time)
+                    for finish_time in simulator.terminated_jobs.finish_time:
+                        self.failUnless(finish_time < switch_time)
+                    simulator.switch_scheduler(new_scheduler_class(NUM_PROCESSORS), switch_time)
+                    self.assertEqual( JobPredictionIsOverEvent in new_scheduler_class.handled_event_types,
+                        simulator.event_queue.has_handler(JobPredictionIsOverEvent) )
+                    simulator.run()
+                    message = "%s -> %s i=%d" % (scheduler_class.__name__, new_scheduler_class.__name__, i)
+                    self.assertEqual(len(jobs), len(simulator.terminated_jobs), message)
+                    feasibility_check_of_cpu_snapshot(jobs, simulator.scheduler.cpu_snapshot)
+                    for job in jobs:
+                        self.assertEqual(int(float(job.id)), job.finish_time, message+" "+str(job))
+
+    def test_switch_scheduler_reschedules_waiting_jobs(self):
+        jobs = [
+            Job(id=1, user_estimated_run_time=100, actual_run_time=100, num_required_processors=NUM_PROCESSORS-1, submit_time=0),
+            Job(id=2, user_estimated_run_time=100, actual_run_time=100, num_required_processors=NUM_PROCESSORS, submit_time=10),
+            Job(id=3, user_estimated_run_time=10, actual_run_time=10, num_required_processors=1, submit_time=20),
+        ]
+        simulator = Simulator(jobs, NUM_PROCESSORS, FcfsScheduler(NUM_PROCESSORS))
+        simulator.run_until(50)
+        simulator.switch_scheduler(EasyBackfillScheduler(NUM_PROCESSORS), 50)
+        simulator.run()
+        self.assertEqual([60, 100, 200], list(simulator.terminated_jobs.finish_time)) # jobs 3, 1 and 2
+        self.assertEqual([0, 100, 50], [job.start_to_run_at_time for job in jobs]) # backfilled when EASY took over
+
+    def test_switch_scheduler_resets_predictions(self):
+        jobs = [
+            Job(id=1, user_estimated_run_time=1000, actual_run_time=100, num_required_processors=1, submit_time=0, user_id=1),
+            Job(id=2, user_estimated_run_time=1000, actual_run_time=100, num_required_processors=1, submit_time=0, user_id=1),
+            Job(id=3, user_estimated_run_time=1000, actual_run_time=80, num_required_processors=50, submit_time=300, user_id=1),
+            Job(id=4, user_estimated_run_time=100, actual_run_time=100, num_required_processors=100, submit_time=310, user_id=2),
+            Job(id=5, user_estimated_run_time=200, actual_run_time=200, num_required_processors=50, submit_time=310, user_id=2),
+        ]
+        simulator = Simulator(jobs, 100, EasyPlusPlusScheduler(100))
+        simulator.run_until(310)
+        self.assertEqual(100, jobs[2].predicted_run_time) # the average of the user's last two jobs
+        simulator.switch_scheduler(EasyBackfillScheduler(100), 310)
+        self.assertEqual(1000, jobs[2].predicted_run_time)
+        simulator.run()
+        self.assertEqual([510, 310], [job.start_to_run_at_time for job in jobs[3:]])
+
+    def test_fork_simulator(self):
+        import StringIO, sys
+        input_file = INPUT_FILE_DIR + "/basic_input.23"
+        jobs = parse_jobs_test_input(input_file)
+        fork_time = jobs[len(jobs) // 2].submit_time
+        simulator = Simulator(jobs, NUM_PROCESSORS, EasyBackfillScheduler(NUM_PROCESSORS))
+        simulator.run()
+        output = StringIO.StringIO()
+        sys.stdout = output
+        try:
+            print_simulator_stats(simulator, fork_time)
+        finally:
+            sys.stdout = sys.__stdout__
+
+        simulator = Simulator(iter(parse_jobs_test_input(input_file)), NUM_PROCESSORS, FcfsScheduler(NUM_PROCESSORS), stream_jobs=True)
+        reports = fork_simulator(simulator, fork_time, [EasyBackfillScheduler(NUM_PROCESSORS), ConservativeScheduler(NUM_PROCESSORS)])
+        self.assertEqual(2, len(reports))
+        self.assertEqual(output.getvalue(), reports[0])
+        self.failUnless("STATISTICS" in reports[1])
+        self.assertEqual([], [t for t in simulator.terminated_jobs.finish_time if t >= fork_time]) # the parent stopped
+
+    def test_handled_event_types(self):
+        from base.prototype import JobPredictionIsOverEvent
+        self.failIf(JobPredictionIsOverEvent in DoubleEasyBackfillScheduler.handled_event_types)
+        self.failUnless(JobPredictionIsOverEvent in EasyPlusPlusScheduler.handled_event_types)
+        self.failUnless(JobPredictionIsOverEvent in ShrinkingEasyScheduler.handled_event_types)
+        self.failUnless(JobPredictionIsOverEvent in AlphaEasyScheduler.handled_event_types)
+
+    def test_batches_scheduling(self):
+        self.failUnless(FcfsScheduler.batches_scheduling())
+        self.failUnless(ConservativeScheduler.batches_scheduling())
+        self.failUnless(EasyBackfillScheduler.batches_scheduling())
+        self.failUnless(EasySJBFScheduler.batches_scheduling()) # only changes the backfilling order
+        self.failIf(DoubleEasyBackfillScheduler.batches_scheduling()) # changes the submission
+        self.failIf(MauiScheduler.batches_scheduling())
+        self.failIf(EasyPlusPlusScheduler.batches_scheduling())
+
+    def test_batch_events(self):
+        for scheduler_class in (FcfsScheduler, ConservativeScheduler, EasyBackfillScheduler):
+            for i in range(10):
+                simulator = run_simulator(
+                    num_processors = NUM_PROCESSORS,
+                    jobs = parse_jobs_test_input(INPUT_FILE_DIR + "/basic_input." + str(i)),
+                    scheduler = scheduler_class(NUM_PROCESSORS),
+                    batch_events = True,
+                )
+                self.failUnless(simulator.batch_events)
+                feasibility_check_of_cpu_snapshot(simulator.jobs, simulator.scheduler.cpu_snapshot)
+                for job in simulator.jobs:
+                    self.assertEqual(int(float(job.id)), job.finish_time, scheduler_class.__name__+" i="+str(i)+" "+str(job))
+
+    def test_batch_events_calls_scheduler_once(self):
+        class BatchCountingScheduler(EasyBackfillScheduler):
+            def __init__(self, num_processors):
+                super(BatchCountingScheduler, self).__init__(num_processors)
+                self.batches = []
+            def new_events_on_job_batch(self, submitted_jobs, terminated_jobs, current_time):
+                self.batches.append((current_time, [job.id for job in submitted_jobs], [job.id for job in terminated_jobs]))
+                return super(BatchCountingScheduler, self).new_events_on_job_batch(submitted_jobs, terminated_jobs, current_time)
+
+        jobs = [
+            Job(id=1, user_estimated_run_time=10, actual_run_time=10, num_required_processors=NUM_PROCESSORS, submit_time=0),
+            Job(id=2, user_estimated_run_time=10, actual_run_time=10, num_required_processors=40, submit_time=0),
+            Job(id=3, user_estimated_run_time=10, actual_run_time=10, num_required_processors=60, submit_time=10),
+            Job(id=4, user_estimated_run_time=10, actual_run_time=5, num_required_processors=10, submit_time=10),
+        ]
+        scheduler = BatchCountingScheduler(NUM_PROCESSORS)
+        simulator = run_simulator(num_processors=NUM_PROCESSORS, jobs=jobs, scheduler=scheduler, batch_events=True)
+        self.assertEqual([
+                (0, [1, 2], []),
+                (10, [3, 4], [1]), # the termination is in the batch of the submissions
+                (20, [], [2, 3]),
+                (25, [], [4]),
+            ], scheduler.batches)
+        self.assertEqual([0, 10, 10, 20], [job.start_to_run_at_time for job in jobs])
+
 """
     def test_basic_probabilistic_nodes_easy(self): 
         for i in range(29):  